@@ -1,5 +1,7 @@
 CREATE EXTENSION IF NOT EXISTS postgis;
 CREATE EXTENSION IF NOT EXISTS postgis_sfcgal;
+-- Allows the text column relative_spatial_entry_iri in a GiST index along with the geometry.
+CREATE EXTENSION IF NOT EXISTS btree_gist;
 
 -- NOTE: PosgreSQL will create a geography_columns table which is not used here (will be empty) as we
 -- are not concerned with measuring distances between points on a sphere. The geometry_columns will list
@@ -9,6 +11,7 @@ CREATE EXTENSION IF NOT EXISTS postgis_sfcgal;
 SELECT version();
 SELECT postgis_version();
 
+DROP MATERIALIZED VIEW IF EXISTS sample_cell_type_search, sample_cell_type_summary;
 DROP TABLE IF EXISTS sample, dataset, sample_dataset;
 
 CREATE TABLE IF NOT EXISTS sample (
@@ -29,7 +32,12 @@ CREATE TABLE IF NOT EXISTS sample (
 -- http://www.bostongis.com/postgis_quickguide_1_4.bqg
 ALTER TABLE sample ADD COLUMN IF NOT EXISTS sample_geom geometry(POLYHEDRALSURFACEZ,0);
 ALTER TABLE sample ALTER COLUMN sample_geom SET NOT NULL;
-CREATE INDEX IF NOT EXISTS "geom_sample_index" ON sample USING GIST(sample_geom);
+-- N-D (rather than the default 2D) GiST indexes so that the 3D bounding box operator &&& used by the
+-- searches in SpatialManager can use them. Nearly all of the searches are within a single relative_spatial_entry_iri.
+-- Existing databases are brought up to date with db/migrations/001_nd_gist_indexes.sql
+CREATE INDEX IF NOT EXISTS "geom_sample_nd_index" ON sample USING GIST(sample_geom gist_geometry_ops_nd);
+CREATE INDEX IF NOT EXISTS "relative_spatial_entry_iri_geom_sample_nd_index" ON sample
+    USING GIST(relative_spatial_entry_iri, sample_geom gist_geometry_ops_nd);
 
 CREATE TABLE IF NOT EXISTS dataset (
     "id" SERIAL PRIMARY KEY,
@@ -43,6 +51,24 @@ CREATE TABLE IF NOT EXISTS sample_dataset (
     CONSTRAINT sample_dataset_pkey PRIMARY KEY (sample_uuid, dataset_uuid)
 );
 
+-- Placements returned by the spatial placement service, so that reindexing does not ask it again to place a
+-- rui_location that it has already placed. The 'placement_key' is a hash of the target iri and the rui_location
+-- (see SpatialPlacementManager). This is deliberately not dropped above so that it survives reloading the database;
+-- rows made by a different 'service_version' are ignored and removed.
+-- Existing databases are brought up to date with db/migrations/007_spatial_placement_cache.sql
+CREATE TABLE IF NOT EXISTS spatial_placement_cache (
+    "placement_key" text PRIMARY KEY,
+    "service_version" text NOT NULL,
+    "target_iri" text NOT NULL,
+    "placement" text NOT NULL,
+    "created_timestamp" TIMESTAMP NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS spatial_placement_cache_service_version_idx ON spatial_placement_cache (service_version);
+
+-- Advanced whenever the data returned by the searches changes, which tells every spatial-api worker
+-- that the search results it has cached are out of date (see SearchCacheManager).
+CREATE SEQUENCE IF NOT EXISTS data_generation_seq;
+
 -- Identify tissue samples that are registered in the spatial database by the types of cells contained within.
 
 -- These tables (cell_annotation_details, cell_marker, cell_annotation_details_marker) come from data found in the
@@ -83,6 +109,46 @@ CREATE TABLE IF NOT EXISTS cell_types (
     CONSTRAINT cell_types_sample_uuid_cell_annotation_details_id_key UNIQUE (sample_uuid, cell_annotation_details_id)
 );
 
+-- The samples whose cell_type_counts ingest-api has been asked to extract, but has not yet posted back
+-- (see CellTypeCountRequestManager). Existing databases are brought up to date with
+-- db/migrations/005_cell_type_count_request.sql
+CREATE TABLE IF NOT EXISTS cell_type_count_request (
+    "sample_uuid" text PRIMARY KEY,
+    "request_time" TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS cell_type_count_request_request_time_idx ON cell_type_count_request (request_time);
+
+-- The samples with each of their cell types, for the searches of samples having a cell type (see SpatialManager).
+-- It is refreshed (CONCURRENTLY, which needs the unique index) by CellTypeSearchManager after the samples or their
+-- cell types change. Existing databases are brought up to date with db/migrations/003_sample_cell_type_search.sql
+CREATE MATERIALIZED VIEW IF NOT EXISTS sample_cell_type_search AS
+    SELECT sample.id AS sample_id, sample.relative_spatial_entry_iri, sample.sample_hubmap_id, sample.sample_geom,
+        cell_types.cell_annotation_details_id, cell_annotation_details.cell_type_name, cell_types.cell_type_count
+    FROM sample
+    INNER JOIN cell_types ON sample.sample_uuid = cell_types.sample_uuid
+    INNER JOIN cell_annotation_details ON cell_annotation_details.id = cell_types.cell_annotation_details_id;
+CREATE UNIQUE INDEX IF NOT EXISTS "sample_cell_type_search_key" ON sample_cell_type_search
+    (sample_id, cell_annotation_details_id);
+CREATE INDEX IF NOT EXISTS "sample_cell_type_search_nd_index" ON sample_cell_type_search
+    USING GIST(cell_type_name, relative_spatial_entry_iri, sample_geom gist_geometry_ops_nd);
+
+-- A row for each sample with the ids of all of its cell types (for @> in the GIN index) and the count of each
+-- (keyed by the id), for the searches of samples having several cell types each with a minimum count.
+-- Refreshed along with sample_cell_type_search. Existing databases are brought up to date with
+-- db/migrations/004_sample_cell_type_summary.sql
+CREATE MATERIALIZED VIEW IF NOT EXISTS sample_cell_type_summary AS
+    SELECT sample.id AS sample_id, sample.relative_spatial_entry_iri, sample.sample_hubmap_id, sample.sample_geom,
+        array_agg(cell_types.cell_annotation_details_id ORDER BY cell_types.cell_annotation_details_id) AS cell_type_ids,
+        jsonb_object_agg(cell_types.cell_annotation_details_id::text, cell_types.cell_type_count) AS cell_type_counts
+    FROM sample
+    INNER JOIN cell_types ON sample.sample_uuid = cell_types.sample_uuid
+    GROUP BY sample.id;
+CREATE UNIQUE INDEX IF NOT EXISTS "sample_cell_type_summary_key" ON sample_cell_type_summary (sample_id);
+CREATE INDEX IF NOT EXISTS "sample_cell_type_summary_cell_type_ids_index" ON sample_cell_type_summary
+    USING GIN(cell_type_ids);
+CREATE INDEX IF NOT EXISTS "sample_cell_type_summary_nd_index" ON sample_cell_type_summary
+    USING GIST(relative_spatial_entry_iri, sample_geom gist_geometry_ops_nd);
+
 --
 -- Stored Procedures
 
@@ -155,6 +221,81 @@ BEGIN
 END
 $$;
 
+-- The bulk counterparts of the procedures above, which take parallel arrays and do the work with a statement or two
+-- rather than a row at a time. Existing databases are brought up to date with db/migrations/006_bulk_procedures.sql
+
+-- The ids of the P_markers (in the same order), adding those that are not already there.
+CREATE OR REPLACE PROCEDURE create_cell_markers_bulk_sp (
+    P_markers IN VARCHAR[],
+    P_marker_ids INOUT INT[]
+    )
+LANGUAGE plpgsql AS
+$$
+BEGIN
+    INSERT INTO cell_marker (marker) SELECT DISTINCT unnest(P_markers) ON CONFLICT DO NOTHING;
+    SELECT array_agg(cell_marker.id ORDER BY markers.ordinality) INTO P_marker_ids
+     FROM unnest(P_markers) WITH ORDINALITY AS markers(marker, ordinality)
+     INNER JOIN cell_marker ON cell_marker.marker = markers.marker;
+END
+$$;
+
+-- Add the cell_annotation_details (P_cell_type_names, P_obo_ontology_id_uris, P_ontology_ids) along with their markers.
+-- Since each has a different number of markers, these are given as a (P_link_cell_type_names, P_link_markers) pair
+-- for each. Those whose cell_type_name is already there are left as they are. P_inserted is how many were added.
+CREATE OR REPLACE PROCEDURE create_annotation_details_bulk_sp (
+    P_cell_type_names IN VARCHAR[],
+    P_obo_ontology_id_uris IN VARCHAR[],
+    P_ontology_ids IN VARCHAR[],
+    P_link_cell_type_names IN VARCHAR[],
+    P_link_markers IN VARCHAR[],
+    P_inserted INOUT INT
+    )
+LANGUAGE plpgsql AS
+$$
+DECLARE
+    inserted_ids INT[];
+BEGIN
+    INSERT INTO cell_marker (marker) SELECT DISTINCT unnest(P_link_markers) ON CONFLICT DO NOTHING;
+    WITH inserted AS (
+        INSERT INTO cell_annotation_details (cell_type_name, obo_ontology_id_uri, ontology_id)
+         SELECT * FROM unnest(P_cell_type_names, P_obo_ontology_id_uris, P_ontology_ids)
+         ON CONFLICT (cell_type_name) DO NOTHING
+         RETURNING id
+    ) SELECT array_agg(id) INTO inserted_ids FROM inserted;
+    INSERT INTO cell_annotation_details_marker (cell_annotation_details_id, cell_marker_id)
+     SELECT DISTINCT cell_annotation_details.id, cell_marker.id
+     FROM unnest(P_link_cell_type_names, P_link_markers) AS link(cell_type_name, marker)
+     INNER JOIN cell_annotation_details ON cell_annotation_details.cell_type_name = link.cell_type_name
+     INNER JOIN cell_marker ON cell_marker.marker = link.marker
+     WHERE cell_annotation_details.id = ANY(inserted_ids)
+     ON CONFLICT DO NOTHING;
+    P_inserted = coalesce(cardinality(inserted_ids), 0);
+END
+$$;
+
+-- Set the P_cell_type_counts of the P_cell_type_names of the sample, adding together those of a name given more than
+-- once. Names not in cell_annotation_details are ignored. P_changed is how many rows were added or changed.
+CREATE OR REPLACE PROCEDURE add_cell_type_counts_bulk_sp (
+    P_sample_uuid IN VARCHAR,
+    P_cell_type_names IN VARCHAR[],
+    P_cell_type_counts IN BIGINT[],
+    P_changed INOUT INT
+    )
+LANGUAGE plpgsql AS
+$$
+BEGIN
+    INSERT INTO cell_types (sample_uuid, cell_annotation_details_id, cell_type_count)
+     SELECT P_sample_uuid, cell_annotation_details.id, sum(counts.cell_type_count)
+     FROM unnest(P_cell_type_names, P_cell_type_counts) AS counts(cell_type_name, cell_type_count)
+     INNER JOIN cell_annotation_details ON cell_annotation_details.cell_type_name = counts.cell_type_name
+     GROUP BY cell_annotation_details.id
+     ON CONFLICT ON CONSTRAINT cell_types_sample_uuid_cell_annotation_details_id_key DO UPDATE
+     SET cell_type_count = EXCLUDED.cell_type_count
+     WHERE cell_types.cell_type_count <> EXCLUDED.cell_type_count;
+    GET DIAGNOSTICS P_changed = ROW_COUNT;
+END
+$$;
+
 --CREATE OR REPLACE PROCEDURE add_sample_sp (
 --    P_organ_uuid IN VARCHAR,
 --    P_organ_code IN VARCHAR,
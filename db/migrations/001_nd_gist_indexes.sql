@@ -0,0 +1,16 @@
+-- Replace the 2D GiST index on sample.sample_geom with the N-D GiST indexes now created by db/initdb.d/initdb.sql.
+-- The indexes are built CONCURRENTLY so the searches keep working while this runs, so it must not be run
+-- in a transaction (psql -f runs each statement on its own by default).
+-- If a CREATE INDEX CONCURRENTLY fails it leaves an INVALID index behind; DROP it before running this again.
+-- $ psql -h HOST -p PORT -d DATABASE_NAME -U DATABASE_USER -f db/migrations/001_nd_gist_indexes.sql
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "geom_sample_nd_index" ON sample
+    USING GIST(sample_geom gist_geometry_ops_nd);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS "relative_spatial_entry_iri_geom_sample_nd_index" ON sample
+    USING GIST(relative_spatial_entry_iri, sample_geom gist_geometry_ops_nd);
+
+DROP INDEX CONCURRENTLY IF EXISTS "geom_sample_index";
+
+ANALYZE sample;
@@ -0,0 +1,4 @@
+-- The sequence that the spatial-api workers use to tell each other that their cached search results are out of date.
+-- $ psql -h HOST -p PORT -d DATABASE_NAME -U DATABASE_USER -f db/migrations/002_data_generation_seq.sql
+
+CREATE SEQUENCE IF NOT EXISTS data_generation_seq;
@@ -0,0 +1,15 @@
+-- The materialized view of the samples with each of their cell types that the cell_type searches use.
+-- $ psql -h HOST -p PORT -d DATABASE_NAME -U DATABASE_USER -f db/migrations/003_sample_cell_type_search.sql
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS sample_cell_type_search AS
+    SELECT sample.id AS sample_id, sample.relative_spatial_entry_iri, sample.sample_hubmap_id, sample.sample_geom,
+        cell_types.cell_annotation_details_id, cell_annotation_details.cell_type_name, cell_types.cell_type_count
+    FROM sample
+    INNER JOIN cell_types ON sample.sample_uuid = cell_types.sample_uuid
+    INNER JOIN cell_annotation_details ON cell_annotation_details.id = cell_types.cell_annotation_details_id;
+CREATE UNIQUE INDEX IF NOT EXISTS "sample_cell_type_search_key" ON sample_cell_type_search
+    (sample_id, cell_annotation_details_id);
+CREATE INDEX IF NOT EXISTS "sample_cell_type_search_nd_index" ON sample_cell_type_search
+    USING GIST(cell_type_name, relative_spatial_entry_iri, sample_geom gist_geometry_ops_nd);
@@ -0,0 +1,18 @@
+-- The materialized view of each sample with all of its cell types (and their counts) that the searches for
+-- samples having several cell types use.
+-- $ psql -h HOST -p PORT -d DATABASE_NAME -U DATABASE_USER -f db/migrations/004_sample_cell_type_summary.sql
+
+CREATE EXTENSION IF NOT EXISTS btree_gist;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS sample_cell_type_summary AS
+    SELECT sample.id AS sample_id, sample.relative_spatial_entry_iri, sample.sample_hubmap_id, sample.sample_geom,
+        array_agg(cell_types.cell_annotation_details_id ORDER BY cell_types.cell_annotation_details_id) AS cell_type_ids,
+        jsonb_object_agg(cell_types.cell_annotation_details_id::text, cell_types.cell_type_count) AS cell_type_counts
+    FROM sample
+    INNER JOIN cell_types ON sample.sample_uuid = cell_types.sample_uuid
+    GROUP BY sample.id;
+CREATE UNIQUE INDEX IF NOT EXISTS "sample_cell_type_summary_key" ON sample_cell_type_summary (sample_id);
+CREATE INDEX IF NOT EXISTS "sample_cell_type_summary_cell_type_ids_index" ON sample_cell_type_summary
+    USING GIN(cell_type_ids);
+CREATE INDEX IF NOT EXISTS "sample_cell_type_summary_nd_index" ON sample_cell_type_summary
+    USING GIST(relative_spatial_entry_iri, sample_geom gist_geometry_ops_nd);
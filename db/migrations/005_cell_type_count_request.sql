@@ -0,0 +1,8 @@
+-- The cell_type_count extractions asked of ingest-api that it has not yet posted back, shared by every worker.
+-- $ psql -h HOST -p PORT -d DATABASE_NAME -U DATABASE_USER -f db/migrations/005_cell_type_count_request.sql
+
+CREATE TABLE IF NOT EXISTS cell_type_count_request (
+    "sample_uuid" text PRIMARY KEY,
+    "request_time" TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS cell_type_count_request_request_time_idx ON cell_type_count_request (request_time);
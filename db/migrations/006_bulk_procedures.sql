@@ -0,0 +1,74 @@
+-- The procedures that add annotation details, markers, and cell type counts from parallel arrays in bulk.
+-- $ psql -h HOST -p PORT -d DATABASE_NAME -U DATABASE_USER -f db/migrations/006_bulk_procedures.sql
+
+-- The ids of the P_markers (in the same order), adding those that are not already there.
+CREATE OR REPLACE PROCEDURE create_cell_markers_bulk_sp (
+    P_markers IN VARCHAR[],
+    P_marker_ids INOUT INT[]
+    )
+LANGUAGE plpgsql AS
+$$
+BEGIN
+    INSERT INTO cell_marker (marker) SELECT DISTINCT unnest(P_markers) ON CONFLICT DO NOTHING;
+    SELECT array_agg(cell_marker.id ORDER BY markers.ordinality) INTO P_marker_ids
+     FROM unnest(P_markers) WITH ORDINALITY AS markers(marker, ordinality)
+     INNER JOIN cell_marker ON cell_marker.marker = markers.marker;
+END
+$$;
+
+-- Add the cell_annotation_details (P_cell_type_names, P_obo_ontology_id_uris, P_ontology_ids) along with their markers.
+-- Since each has a different number of markers, these are given as a (P_link_cell_type_names, P_link_markers) pair
+-- for each. Those whose cell_type_name is already there are left as they are. P_inserted is how many were added.
+CREATE OR REPLACE PROCEDURE create_annotation_details_bulk_sp (
+    P_cell_type_names IN VARCHAR[],
+    P_obo_ontology_id_uris IN VARCHAR[],
+    P_ontology_ids IN VARCHAR[],
+    P_link_cell_type_names IN VARCHAR[],
+    P_link_markers IN VARCHAR[],
+    P_inserted INOUT INT
+    )
+LANGUAGE plpgsql AS
+$$
+DECLARE
+    inserted_ids INT[];
+BEGIN
+    INSERT INTO cell_marker (marker) SELECT DISTINCT unnest(P_link_markers) ON CONFLICT DO NOTHING;
+    WITH inserted AS (
+        INSERT INTO cell_annotation_details (cell_type_name, obo_ontology_id_uri, ontology_id)
+         SELECT * FROM unnest(P_cell_type_names, P_obo_ontology_id_uris, P_ontology_ids)
+         ON CONFLICT (cell_type_name) DO NOTHING
+         RETURNING id
+    ) SELECT array_agg(id) INTO inserted_ids FROM inserted;
+    INSERT INTO cell_annotation_details_marker (cell_annotation_details_id, cell_marker_id)
+     SELECT DISTINCT cell_annotation_details.id, cell_marker.id
+     FROM unnest(P_link_cell_type_names, P_link_markers) AS link(cell_type_name, marker)
+     INNER JOIN cell_annotation_details ON cell_annotation_details.cell_type_name = link.cell_type_name
+     INNER JOIN cell_marker ON cell_marker.marker = link.marker
+     WHERE cell_annotation_details.id = ANY(inserted_ids)
+     ON CONFLICT DO NOTHING;
+    P_inserted = coalesce(cardinality(inserted_ids), 0);
+END
+$$;
+
+-- Set the P_cell_type_counts of the P_cell_type_names of the sample, adding together those of a name given more than
+-- once. Names not in cell_annotation_details are ignored. P_changed is how many rows were added or changed.
+CREATE OR REPLACE PROCEDURE add_cell_type_counts_bulk_sp (
+    P_sample_uuid IN VARCHAR,
+    P_cell_type_names IN VARCHAR[],
+    P_cell_type_counts IN BIGINT[],
+    P_changed INOUT INT
+    )
+LANGUAGE plpgsql AS
+$$
+BEGIN
+    INSERT INTO cell_types (sample_uuid, cell_annotation_details_id, cell_type_count)
+     SELECT P_sample_uuid, cell_annotation_details.id, sum(counts.cell_type_count)
+     FROM unnest(P_cell_type_names, P_cell_type_counts) AS counts(cell_type_name, cell_type_count)
+     INNER JOIN cell_annotation_details ON cell_annotation_details.cell_type_name = counts.cell_type_name
+     GROUP BY cell_annotation_details.id
+     ON CONFLICT ON CONSTRAINT cell_types_sample_uuid_cell_annotation_details_id_key DO UPDATE
+     SET cell_type_count = EXCLUDED.cell_type_count
+     WHERE cell_types.cell_type_count <> EXCLUDED.cell_type_count;
+    GET DIAGNOSTICS P_changed = ROW_COUNT;
+END
+$$;
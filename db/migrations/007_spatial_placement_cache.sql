@@ -0,0 +1,11 @@
+-- The placements returned by the spatial placement service, kept so that reindexing does not ask it again.
+-- $ psql -h HOST -p PORT -d DATABASE_NAME -U DATABASE_USER -f db/migrations/007_spatial_placement_cache.sql
+
+CREATE TABLE IF NOT EXISTS spatial_placement_cache (
+    "placement_key" text PRIMARY KEY,
+    "service_version" text NOT NULL,
+    "target_iri" text NOT NULL,
+    "placement" text NOT NULL,
+    "created_timestamp" TIMESTAMP NOT NULL DEFAULT now()
+);
+CREATE INDEX IF NOT EXISTS spatial_placement_cache_service_version_idx ON spatial_placement_cache (service_version);
@@ -16,11 +16,12 @@ DATABASE_NAME=
 BEARER_TOKEN=
 INCREMENTAL_REINDEX=0
 RECREATE_DATABASE_TABLES=0
+MIGRATE_DATABASE=0
 VERBOSE=
 
 usage()
 {
-  echo "Usage: $0 [-H SCHEME_HOST_PORT] [-D DATABASE_HOST_PORT] [-U DATABASE_USER] [-t BEARER_TOKEN] [-i] [-r] [-v] [-h]"
+  echo "Usage: $0 [-H SCHEME_HOST_PORT] [-D DATABASE_HOST_PORT] [-U DATABASE_USER] [-t BEARER_TOKEN] [-i] [-r] [-m] [-v] [-h]"
   echo " -H Scheme, host, and port of spatial-api server (${SCHEME_HOST_PORT})"
   echo " -D HOST:PORT Database Host and Port separated by a colon ':' (${DATABASE_HOST_PORT})"
   echo " -U DATABASE_USER Look in the resources/app.properties file for the [postgresql] Username"
@@ -28,6 +29,7 @@ usage()
   echo " -t BEARER_TOKEN (see text below)"
   echo " -i Incremental Reindex samples that are older than last processed"
   echo " -r Delete and then recreate Databases Tables from 'db/initdb.d/initdb.sql'"
+  echo " -m Apply the 'db/migrations/*.sql' to the existing Database Tables and exit"
   echo " -v Verbose"
   echo " -h Help"
   echo
@@ -38,7 +40,7 @@ usage()
   exit 2
 }
 
-while getopts 'H:D:U:d:t:irvh' arg; do
+while getopts 'H:D:U:d:t:irmvh' arg; do
   case $arg in
     H) SCHEME_HOST_PORT=$OPTARG ;;
     D) DATABASE_HOST_PORT=$OPTARG ;;
@@ -47,6 +49,7 @@ while getopts 'H:D:U:d:t:irvh' arg; do
     t) BEARER_TOKEN=$OPTARG ;;
     i) INCREMENTAL_REINDEX=1 ;;
     r) RECREATE_DATABASE_TABLES=1 ;;
+    m) MIGRATE_DATABASE=1 ;;
     v) VERBOSE='--verbose' ;;
     h|?) usage ;;
   esac
@@ -60,6 +63,7 @@ echo "db: host:port: ${DATABASE_HOST_PORT}; user: ${DATABASE_USER}; name ${DATAB
 echo "Bearer Token: ${BEARER_TOKEN}"
 echo "Incremental Reindex: ${INCREMENTAL_REINDEX}"
 echo "Recreate database tables: ${RECREATE_DATABASE_TABLES}"
+echo "Migrate database tables: ${MIGRATE_DATABASE}"
 echo
 
 IFS=':'; arr_db_host_port=($DATABASE_HOST_PORT); unset IFS;
@@ -81,6 +85,19 @@ if [[ $RECREATE_DATABASE_TABLES -eq 1 ]] && [[ $INCREMENTAL_REINDEX -eq 1 ]]; th
   exit 1
 fi
 
+if [[ $MIGRATE_DATABASE -eq 1 ]]; then
+  echo
+  echo ">>> Migrating database tables; dbhost: ${db_host}; db_port: ${db_port}"
+  echo
+  for migration in db/migrations/*.sql; do
+    echo ">>> Applying ${migration}..."
+    psql -v ON_ERROR_STOP=1 -h ${db_host} -p ${db_port} -d $DATABASE_NAME -U $DATABASE_USER -f ${migration}
+  done
+  echo
+  echo "Done!"
+  exit 0
+fi
+
 if [[ $INCREMENTAL_REINDEX -eq 1 ]]; then
   echo
   echo ">>> Extract cell_type_counts for modified samples..."
@@ -40,10 +40,32 @@ curl $VERBOSE --request POST \
   }'
 echo
 
+echo
+echo ">>> Testing spatialapi endpoint search_hubmap_point batch..."
+echo
+
+curl $VERBOSE --request POST \
+ --url ${SCHEME_HOST_PORT}/point-search/batch \
+ --header 'Content-Type: application/json' \
+ --data '[
+  {"target": "VHMale", "radius": 270, "x": 10, "y": 10, "z": 10},
+  {"target": "VHFemale", "radius": 100, "x": 23, "y": 18, "z": 5}
+  ]'
+echo
+
 echo
 echo ">>> These should fail validation..."
 echo
 
+curl $VERBOSE --request POST \
+ --url ${SCHEME_HOST_PORT}/point-search/batch \
+ --header 'Content-Type: application/json' \
+ --data '[
+  {"target": "VHMale", "radius": 270, "x": 10, "y": 10, "z": 10},
+  {"target": "VHBird", "radius": 100, "x": 23, "y": 18, "z": 5}
+  ]'
+echo
+
 curl $VERBOSE --request POST \
  --url ${SCHEME_HOST_PORT}/point-search \
  --header 'Content-Type: application/json' \
@@ -1,10 +1,11 @@
 from flask import Flask, jsonify, g
 import logging
 import time
-import configparser
 
 from hubmap_commons.hm_auth import AuthHelper
 
+from spatialapi.manager.managers import Managers, read_config
+from spatialapi.routes.nearest_search import nearest_search_blueprint
 from spatialapi.routes.point_search import point_search_blueprint
 from spatialapi.routes.rebuild_annotation_details import rebuild_annotation_details_blueprint
 from spatialapi.routes.samples_cell_type_counts import samples_cell_type_counts_blueprint
@@ -24,6 +25,7 @@ def create_app(testing=False):
     # app.config.from_pyfile('app.cfg')
     app.debug = True  # Enable reloader and debugger
 
+    app.register_blueprint(nearest_search_blueprint)
     app.register_blueprint(point_search_blueprint)
     app.register_blueprint(rebuild_annotation_details_blueprint)
     app.register_blueprint(samples_cell_type_counts_blueprint)
@@ -48,9 +50,8 @@ def create_app(testing=False):
 
     @app.teardown_appcontext
     def close_db(error): # pylint: disable=unused-argument
-        if 'spatial_manager' in g:
-            logger.info(f"Closing SpatialManager db connections")
-            g.spatial_manager.close()
+        # The managers live as long as the worker, but a request must not keep a pooled connection...
+        app.extensions['spatialapi'].release()
 
     @app.errorhandler(400)
     def http_bad_request(e):
@@ -68,10 +69,9 @@ def create_app(testing=False):
     def http_internal_server_error(e):
         return jsonify(error=str(e)), 500
 
-    config = configparser.ConfigParser()
-    app_properties: str = 'resources/app.properties'
-    logger.info(f'Reading properties file: {app_properties}')
-    config.read(app_properties)
+    # Read the configuration once; the managers built from it are created lazily on first use and then reused.
+    config = read_config()
+    app.extensions['spatialapi'] = Managers(config)
     app_config = config['app']
     try:
         if AuthHelper.isInitialized() is False:
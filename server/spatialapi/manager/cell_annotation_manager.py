@@ -4,13 +4,55 @@ import requests
 from bs4 import BeautifulSoup
 import re
 from urllib import parse
-import psycopg2
-from typing import List
+import threading
+from typing import Dict, Iterable, List
 
-from spatialapi.manager.postgresql_manager import PostgresqlManager
+from spatialapi.manager.postgresql_manager import PostgresqlManager, ontology_id_of_obo_ontology_id_uri
 
 logger = logging.getLogger(__name__)
 
+# The (summary, first row label) of each of the Azimuth annotation tables, most detailed first.
+AZIMUTH_ANNOTATION_TABLES: List[tuple] = [
+    (r'^.*annotation\.l3.*$', 'Afferent / Efferent Arteriole Endothelial'),
+    (r'^.*annotation\.l2.*$', 'Afferent / Efferent Arteriole Endothelial'),
+    (r'^.*annotation\.l1.*$', 'Ascending Thin Limb')
+]
+
+# The id of each cell_annotation_details cell_type_name known to this process, loaded the first time it's needed.
+# Since the rows are only ever added (and never renumbered), an entry never goes stale; names that are not here are
+# looked for again (which finds those added by another process), and it is emptied when load_annotation_details()
+# rebuilds the tables.
+cell_annotation_details_id_cache: Dict[str, int] = None
+cell_annotation_details_id_lock = threading.Lock()
+
+
+def cell_annotation_details_ids(cursor, cell_type_names: Iterable[str]) -> Dict[str, int]:
+    """The ids of those of the cell_type_names that are in cell_annotation_details (using the cursor if it must look)."""
+    global cell_annotation_details_id_cache
+    with cell_annotation_details_id_lock:
+        if cell_annotation_details_id_cache is None:
+            cursor.execute('SELECT cell_type_name, id FROM cell_annotation_details;')
+            cell_annotation_details_id_cache = {row[0]: row[1] for row in cursor.fetchall()}
+            logger.info(f'cell_annotation_details_ids: loaded {len(cell_annotation_details_id_cache)} names')
+        ids: Dict[str, int] = cell_annotation_details_id_cache
+        missing: List[str] = list({name for name in cell_type_names if name not in ids})
+    if len(missing) > 0:
+        cursor.execute('SELECT cell_type_name, id FROM cell_annotation_details WHERE cell_type_name = ANY(%s);',
+                       (missing,))
+        found: Dict[str, int] = {row[0]: row[1] for row in cursor.fetchall()}
+        if len(found) > 0:
+            with cell_annotation_details_id_lock:
+                # Replaced rather than changed, so that the copy being read above is never changed under it...
+                ids = {**(cell_annotation_details_id_cache or {}), **found}
+                cell_annotation_details_id_cache = ids
+    return {name: ids[name] for name in cell_type_names if name in ids}
+
+
+def invalidate_cell_annotation_details_ids() -> None:
+    global cell_annotation_details_id_cache
+    with cell_annotation_details_id_lock:
+        cell_annotation_details_id_cache = None
+
 
 class CellAnnotationManager(object):
 
@@ -26,16 +68,22 @@ class CellAnnotationManager(object):
         logger.info(f'CellAnnotationManager: Closing')
         self.postgresql_manager.close()
 
-    def find_rows_in_azimuth_uri_table(self, summary_re: re, first_label_entry: str):
+    def fetch_azimuth_details(self) -> list:
+        """Download and parse the Azimuth page, returning its <details> (one for each annotation table)."""
         html_text: str = requests.get(self.azimuth_uri).text
         bs_object = BeautifulSoup(html_text, 'html.parser')
-        details = bs_object \
+        return bs_object \
             .find("body") \
             .find("main", attrs={"id": "content"}) \
             .find("div", attrs={"class": "container"}) \
             .find("section", attrs={"class": "main-content"}) \
             .find("div", attrs={"class": "section"}) \
             .find_all("details")
+
+    def find_rows_in_azimuth_uri_table(self, summary_re: re, first_label_entry: str, details: list = None):
+        # The page is only downloaded when the details already fetched from it are not given...
+        if details is None:
+            details = self.fetch_azimuth_details()
         for detail in details:
             summary: str = detail.find("summary", string=re.compile(summary_re))
             if summary is not None:
@@ -45,9 +93,9 @@ class CellAnnotationManager(object):
                 if rows[0].select('td:nth-of-type(1)')[0].string.strip() == first_label_entry:
                     return rows
 
-    def load_annotation_details_from_azimuth_uri_table(self, url_table_summary: re, first_label_entry: str):
-        rows = self.find_rows_in_azimuth_uri_table(url_table_summary, first_label_entry)
-        #import pdb; pdb.set_trace()
+    def annotation_details_of_rows(self, rows) -> List[tuple]:
+        """The (cell_type_name, obo_ontology_id_uri, ontology_id, markers) of each of the rows of an Azimuth table."""
+        details: List[tuple] = []
         for row in rows:
             cell_type_name: str = row.select('td:nth-of-type(1)')[0].string.strip()
             try:
@@ -56,27 +104,37 @@ class CellAnnotationManager(object):
                 obo_ontology_id_uri: str = 'None'
             markers: List[str] = row.select('td:nth-of-type(3)')[0].string.strip().split(',')
             markers_stripped: List[str] = [s.strip() for s in markers]
-            try:
-                id: int = self.postgresql_manager.create_annotation_details(
-                    cell_type_name, obo_ontology_id_uri, markers_stripped
-                )
-                logger.info(f"cell_annotation_details: {id}")
-            except psycopg2.errors.UniqueViolation as e:
-                logger.info(f"create_annotation_details {e}")
+            details.append((cell_type_name, obo_ontology_id_uri,
+                            ontology_id_of_obo_ontology_id_uri(obo_ontology_id_uri), markers_stripped))
+        return details
+
+    def azimuth_annotation_details(self) -> List[tuple]:
+        """The annotation details of all three levels of the Azimuth tables (from a single download of the page).
+        Where a cell_type_name appears at more than one level, the first (most detailed) is the one kept.
+        """
+        details: list = self.fetch_azimuth_details()
+        annotation_details: Dict[str, tuple] = {}
+        for url_table_summary, first_label_entry in AZIMUTH_ANNOTATION_TABLES:
+            rows = self.find_rows_in_azimuth_uri_table(url_table_summary, first_label_entry, details)
+            for annotation_detail in self.annotation_details_of_rows(rows):
+                annotation_details.setdefault(annotation_detail[0], annotation_detail)
+        return list(annotation_details.values())
 
     def load_annotation_details(self):
-        self.load_annotation_details_from_azimuth_uri_table(r'^.*annotation\.l3.*$', 'Afferent / Efferent Arteriole Endothelial')
-        self.load_annotation_details_from_azimuth_uri_table(r'^.*annotation\.l2.*$', 'Afferent / Efferent Arteriole Endothelial')
-        self.load_annotation_details_from_azimuth_uri_table(r'^.*annotation\.l1.*$', 'Ascending Thin Limb')
-
-    def check_annotation_details_from_azimuth_uri_table(self, url_table_summary: re):
-        rows = self.find_rows_in_azimuth_uri_table(url_table_summary)
+        annotation_details: List[tuple] = self.azimuth_annotation_details()
+        inserted: int = self.postgresql_manager.create_annotation_details_bulk(annotation_details)
+        logger.info(f"load_annotation_details: {inserted} of {len(annotation_details)} cell_annotation_details added")
+        invalidate_cell_annotation_details_ids()
+
+    def check_annotation_details_from_azimuth_uri_table(self, url_table_summary: re, first_label_entry: str,
+                                                        details: list = None):
+        rows = self.find_rows_in_azimuth_uri_table(url_table_summary, first_label_entry, details)
         for row in rows:
             cell_type_name: str = row.select('td:nth-of-type(1)')[0].string.strip()
             obo_ontology_id_uri: str = row.select('td:nth-of-type(2)')[0].find('a').get("href")
             markers: List[str] = row.select('td:nth-of-type(3)')[0].string.strip().split(',')
             markers_stripped: List[str] = [s.strip() for s in markers]
-            data: List = manager.postgresql_manager.dump_anotation_detail_of_cell_type_name(cell_type_name)
+            data: List = self.postgresql_manager.dump_anotation_detail_of_cell_type_name(cell_type_name)
             if data[0] != cell_type_name:
                 logger.error(f"The cell_type_names do not match web: {cell_type_name}, db: {data[0]}")
             if data[1] != obo_ontology_id_uri:
@@ -86,9 +144,9 @@ class CellAnnotationManager(object):
         logger.info(f'Done! check_annotation_details {len(rows)} processed')
 
     def check_annotation_details(self):
-        self.check_annotation_details_from_azimuth_uri_table(r'^.*annotation\.l3.*$')
-        self.check_annotation_details_from_azimuth_uri_table(r'^.*annotation\.l2.*$')
-        self.check_annotation_details_from_azimuth_uri_table(r'^.*annotation\.l1.*$')
+        details: list = self.fetch_azimuth_details()
+        for url_table_summary, first_label_entry in AZIMUTH_ANNOTATION_TABLES:
+            self.check_annotation_details_from_azimuth_uri_table(url_table_summary, first_label_entry, details)
 
 
 if __name__ == '__main__':
@@ -1,75 +1,24 @@
 import logging
-from datetime import datetime, timedelta
-from typing import List
+from typing import Dict, List, Tuple
+import queue
 import threading
 import time
+import json
+import os
 from psycopg2 import DatabaseError
 from psycopg2.errors import UniqueViolation, NotNullViolation
 
+from spatialapi.manager.cell_annotation_manager import cell_annotation_details_ids
+from spatialapi.manager.cell_type_count_request_manager import CellTypeCountRequestManager
 from spatialapi.manager.ingest_api_manager import IngestApiManager
+from spatialapi.manager.manager_owner import ManagerOwner
 from spatialapi.manager.neo4j_manager import Neo4jManager
-from spatialapi.manager.postgresql_manager import PostgresqlManager
+from spatialapi.manager.postgresql_manager import PostgresqlManager, PreparedStatement
+from spatialapi.manager.cell_type_search_manager import CellTypeSearchManager
+from spatialapi.manager.search_cache_manager import SearchCacheManager
 
 logger = logging.getLogger(__name__)
 
-cell_type_count_manager_request_log: List[dict] = []
-lock = threading.Lock()
-REQUEST_TIMEOUT_HOURS = 2
-
-
-def request_log_add(sample_uuid: str) -> None:
-    lock.acquire()
-    try:
-        cell_type_count_manager_request_log.append({'sample_uuid': sample_uuid, 'request_time': datetime.now()})
-    finally:
-        lock.release()
-
-
-def request_log_delete(sample_uuid: str) -> datetime:
-    request_time = None
-    lock.acquire()
-    try:
-        for sample_log_entry in cell_type_count_manager_request_log.copy():
-            if sample_log_entry.get('sample_uuid') == sample_uuid:
-                cell_type_count_manager_request_log.remove(sample_log_entry)
-                request_time = sample_log_entry.get('request_time')
-    finally:
-        lock.release()
-    return request_time
-
-
-def request_log_length() -> int:
-    lock.acquire()
-    try:
-        log_len: int = len(cell_type_count_manager_request_log)
-    finally:
-        lock.release()
-    return log_len
-
-
-def log_check_timeouts_thread(lock, cell_type_count_manager_request_log) -> None:
-    while True:
-        logger.info(f'cell_type_count_manager_request_log length: {request_log_length()}')
-        time.sleep(60*5)
-        lock.acquire()
-        try:
-            for sample_log_entry in cell_type_count_manager_request_log.copy():
-                if sample_log_entry.get('request_time') + timedelta(hours=REQUEST_TIMEOUT_HOURS) > datetime.now():
-                    logger.error('Ingest-api cell_type_count request for sample_uuid '
-                                 f'{sample_log_entry.get("sample_uuid")} has not returned data in '
-                                 f'{REQUEST_TIMEOUT_HOURS} hours')
-                    cell_type_count_manager_request_log.remove(sample_log_entry)
-        finally:
-            lock.release()
-
-
-threading.Thread(target=log_check_timeouts_thread,
-                 args=[lock, cell_type_count_manager_request_log],
-                 name='Thread to check for timeouts')\
-    .start()
-# This thread will run forever, so we don't need a handle on it to .join()
-
-
 # Austin Hartman November 8, 2022 10:41 AM
 # The ‘annotation details’ marker tables can be found within the azimuth website repo here:
 # https://github.com/satijalab/azimuth_website/tree/master/static/csv. However, the annotations
@@ -97,13 +46,63 @@ threading.Thread(target=log_check_timeouts_thread,
 # Austin Hartman 2:16 PM
 # Yeah exactly. A_L stands for azimuth label, the keys in the old file, and Label contains the ASCT+B label which are the values in the old file
 
-def load_cell_type_mapping() -> dict:
+# The mapping is pinned to this commit of the azimuth-annotate repo, so a copy saved for it never goes out of date.
+CELL_TYPE_MAPPING_COMMIT: str = "2e4017d727373f43c2e617100a9b88b7985dd475"
+
+# The mapping is loaded once per process and then served from here...
+cell_type_mapping_cache: dict = {}
+cell_type_mapping_lock = threading.Lock()
+
+# The cell_type_counts posted back by ingest-api that are waiting to be saved (see
+# CellTypeCountManager.enqueue_cell_type_counts) as (sample_uuid, cell_type_counts, time enqueued), the
+# (one per process) thread that saves them, and the metrics of both...
+cell_type_count_queue: queue.Queue = queue.Queue()
+cell_type_count_queue_thread_lock = threading.Lock()
+cell_type_count_queue_thread: threading.Thread = None
+cell_type_count_queue_metrics_lock = threading.Lock()
+cell_type_count_queue_metrics: dict = {
+    'enqueued': 0,
+    'saved': 0,
+    'failed': 0,
+    'coalesced': 0,
+    'batches': 0,
+    'batch_size_max': 0,
+    'latency_seconds_total': 0.0,
+    'latency_seconds_max': 0.0
+}
+
+
+def cell_type_count_queue_stats() -> dict:
+    with cell_type_count_queue_metrics_lock:
+        metrics: dict = dict(cell_type_count_queue_metrics)
+    finished: int = metrics['saved'] + metrics['failed']
+    return {
+        'depth': cell_type_count_queue.qsize(),
+        'enqueued': metrics['enqueued'],
+        'saved': metrics['saved'],
+        'failed': metrics['failed'],
+        # Replaced by counts posted later for the same sample before they were saved...
+        'coalesced': metrics['coalesced'],
+        'batches': metrics['batches'],
+        'batch_size_mean': round(finished / metrics['batches'], 3) if metrics['batches'] > 0 else None,
+        'batch_size_max': metrics['batch_size_max'],
+        # From when the counts were enqueued until they were committed (or failed)...
+        'latency_seconds_mean': round(metrics['latency_seconds_total'] / finished, 3) if finished > 0 else None,
+        'latency_seconds_max': round(metrics['latency_seconds_max'], 3)
+    }
+
+
+# The cell type names already in the UnknownFile (read when it is opened), so that each is only written once...
+unknown_cell_type_names: set = None
+unknown_cell_type_names_lock = threading.Lock()
+
+
+def download_cell_type_mapping() -> dict:
     from urllib.request import urlopen
-    import json
     from bs4 import BeautifulSoup
     # TODO: The original file was deprecated and moved. For now we are using the old file in it's new lcation and make a card to change this over
     #url_str: str = "https://raw.githubusercontent.com/hubmapconsortium/azimuth-annotate/main/data/kidney.json"
-    url_str: str = "https://raw.githubusercontent.com/hubmapconsortium/azimuth-annotate/2e4017d727373f43c2e617100a9b88b7985dd475/data/kidney.json"
+    url_str: str = f"https://raw.githubusercontent.com/hubmapconsortium/azimuth-annotate/{CELL_TYPE_MAPPING_COMMIT}/data/kidney.json"
     mapping: dict = {}
     url = urlopen(url_str)
     content = url.read()
@@ -117,12 +116,79 @@ def load_cell_type_mapping() -> dict:
     return mapping
 
 
-class CellTypeCountManager(object):
-
-    def __init__(self, config):
-        self.ingest_api_manager = IngestApiManager(config)
-        self.neo4j_manager = Neo4jManager(config)
-        self.postgresql_manager = PostgresqlManager(config)
+def cell_type_mapping_cache_file_name(cache_dir: str) -> str:
+    return os.path.join(cache_dir, f'cell_type_mapping_{CELL_TYPE_MAPPING_COMMIT}.json')
+
+
+def read_cell_type_mapping_cache_file(cache_file_name: str) -> dict:
+    with open(cache_file_name, 'r') as fp:
+        return json.load(fp)
+
+
+def write_cell_type_mapping_cache_file(cache_file_name: str, mapping: dict) -> None:
+    # Write then rename so that another worker never reads a partially written file...
+    tmp_file_name: str = f'{cache_file_name}.{os.getpid()}.tmp'
+    with open(tmp_file_name, 'w') as fp:
+        json.dump(mapping, fp, indent=1, sort_keys=True)
+    os.replace(tmp_file_name, cache_file_name)
+
+
+def load_cell_type_mapping(cache_dir: str = 'resources', ttl_hours: float = 0, refresh: bool = False) -> dict:
+    """Return the cell type name mapping, downloading it only when there is no usable copy.
+    The copy held in memory is used first, then the copy saved in 'cache_dir'. Either is considered stale once it
+    is older than 'ttl_hours' (0 means never). When 'refresh' is set the mapping is always downloaded again.
+    If the download fails, a saved copy (even a stale one) is used so that this still works offline.
+    """
+    ttl_seconds: float = ttl_hours * 60 * 60
+    cache_file_name: str = cell_type_mapping_cache_file_name(cache_dir)
+    with cell_type_mapping_lock:
+        mapping: dict = cell_type_mapping_cache.get('mapping')
+        if not refresh and mapping is not None and \
+                (ttl_seconds <= 0 or time.time() - cell_type_mapping_cache['loaded_time'] < ttl_seconds):
+            return mapping
+
+        cache_file_exists: bool = os.path.isfile(cache_file_name)
+        if not refresh and cache_file_exists and \
+                (ttl_seconds <= 0 or time.time() - os.path.getmtime(cache_file_name) < ttl_seconds):
+            logger.info(f'load_cell_type_mapping: reading {cache_file_name}')
+            mapping = read_cell_type_mapping_cache_file(cache_file_name)
+        else:
+            try:
+                logger.info(f'load_cell_type_mapping: downloading mapping for commit {CELL_TYPE_MAPPING_COMMIT}')
+                mapping = download_cell_type_mapping()
+                try:
+                    write_cell_type_mapping_cache_file(cache_file_name, mapping)
+                except OSError as e:
+                    logger.error(f'load_cell_type_mapping: unable to save {cache_file_name}: {e}')
+            except Exception as e:
+                if not cache_file_exists:
+                    raise
+                logger.error(f'load_cell_type_mapping: download failed ({e.__class__.__name__}: {e});'
+                             f' using {cache_file_name}')
+                mapping = read_cell_type_mapping_cache_file(cache_file_name)
+
+        cell_type_mapping_cache['mapping'] = mapping
+        cell_type_mapping_cache['loaded_time'] = time.time()
+        return mapping
+
+
+class CellTypeCountManager(ManagerOwner):
+
+    def __init__(self, config,
+                 ingest_api_manager: IngestApiManager = None,
+                 neo4j_manager: Neo4jManager = None,
+                 postgresql_manager: PostgresqlManager = None,
+                 search_cache_manager: SearchCacheManager = None,
+                 cell_type_search_manager: CellTypeSearchManager = None,
+                 cell_type_count_request_manager: CellTypeCountRequestManager = None):
+        self.ingest_api_manager = self.shared_or_own(ingest_api_manager, lambda: IngestApiManager(config))
+        self.neo4j_manager = self.shared_or_own(neo4j_manager, lambda: Neo4jManager(config))
+        self.postgresql_manager = self.shared_or_own(postgresql_manager, lambda: PostgresqlManager(config))
+        self.search_cache_manager = self.shared_or_own(search_cache_manager, lambda: SearchCacheManager(config))
+        self.cell_type_search_manager = self.shared_or_own(
+            cell_type_search_manager, lambda: CellTypeSearchManager(config, self.search_cache_manager))
+        self.cell_type_count_request_manager = \
+            self.shared_or_own(cell_type_count_request_manager, lambda: CellTypeCountRequestManager(config))
 
         celltypecount_config = config['celltypecount']
 
@@ -131,21 +197,68 @@ class CellTypeCountManager(object):
         # cell_type_name_mapping_file_fp = open(cell_type_name_mapping_file_name, "r")
         # self.cell_type_name_mapping = json.load(cell_type_name_mapping_file_fp)
         # cell_type_name_mapping_file_fp.close()
-        self.cell_type_name_mapping = load_cell_type_mapping()
+        self.mapping_cache_dir: str = celltypecount_config.get('MappingCacheDir', fallback='resources')
+        self.mapping_cache_ttl_hours: float = celltypecount_config.getfloat('MappingCacheTtlHours', fallback=0)
+        self.queue_batch_size: int = celltypecount_config.getint('QueueBatchSize', fallback=100)
+        self.queue_batch_wait_seconds: float = celltypecount_config.getfloat('QueueBatchWaitSeconds', fallback=1)
+        # Load (or download) it now so that the first callback doesn't pay for it...
+        load_cell_type_mapping(self.mapping_cache_dir, self.mapping_cache_ttl_hours)
+
+        self.create_prepared_statements()
 
         unknown_cell_type_name_file: str = celltypecount_config.get('UnknownFile')
+        global unknown_cell_type_names
+        with unknown_cell_type_names_lock:
+            if unknown_cell_type_names is None:
+                unknown_cell_type_names = set()
+                if os.path.isfile(unknown_cell_type_name_file):
+                    with open(unknown_cell_type_name_file, 'r') as fp:
+                        unknown_cell_type_names = {line.rstrip('\n') for line in fp}
         logger.debug(f"Opening for append '{unknown_cell_type_name_file}'")
         self.unknown_cell_type_name_fp = open(unknown_cell_type_name_file, "a")
 
+    def create_prepared_statements(self) -> None:
+        # Make the cell_types of the sample ($1) those with the ids ($2) and counts ($3) given, changing only the rows
+        # that differ, and return how many were removed and how many were added or changed...
+        self.cell_type_counts_upsert_statement = PreparedStatement(
+            'cell_type_counts_upsert',
+            "WITH counts AS ("
+            "SELECT * FROM unnest($2, $3) AS counts(cell_annotation_details_id, cell_type_count)"
+            "), removed AS ("
+            "DELETE FROM cell_types WHERE sample_uuid = $1 AND NOT (cell_annotation_details_id = ANY($2)) RETURNING 1"
+            "), changed AS ("
+            "INSERT INTO cell_types (sample_uuid, cell_annotation_details_id, cell_type_count)"
+            " SELECT $1, cell_annotation_details_id, cell_type_count FROM counts"
+            " ON CONFLICT ON CONSTRAINT cell_types_sample_uuid_cell_annotation_details_id_key DO UPDATE"
+            " SET cell_type_count = EXCLUDED.cell_type_count"
+            " WHERE cell_types.cell_type_count <> EXCLUDED.cell_type_count"
+            " RETURNING 1"
+            ")"
+            " SELECT (SELECT count(*) FROM removed), (SELECT count(*) FROM changed)",
+            ['text', 'int[]', 'bigint[]'])
+
+    @property
+    def cell_type_name_mapping(self) -> dict:
+        return load_cell_type_mapping(self.mapping_cache_dir, self.mapping_cache_ttl_hours)
+
+    def refresh_cell_type_name_mapping(self) -> None:
+        load_cell_type_mapping(self.mapping_cache_dir, self.mapping_cache_ttl_hours, refresh=True)
+
     def close(self):
         logger.info(f'CellTypeCountManager: Closing')
-        self.ingest_api_manager.close()
-        self.neo4j_manager.close()
-        self.postgresql_manager.close()
+        self.close_owned_managers()
         self.unknown_cell_type_name_fp.close()
 
-    def save_unknown_cell_type_name(self, cell_type_name) -> None:
-        self.unknown_cell_type_name_fp.writelines(f'{cell_type_name}\n')
+    def save_unknown_cell_type_names(self, cell_type_names: List[str]) -> None:
+        """Record those of the cell_type_names that have not been already, with a single write."""
+        with unknown_cell_type_names_lock:
+            new_names: List[str] = sorted(set(cell_type_names) - unknown_cell_type_names)
+            if len(new_names) == 0:
+                return
+            unknown_cell_type_names.update(new_names)
+            self.unknown_cell_type_name_fp.write(''.join(f'{name}\n' for name in new_names))
+            # The manager lives as long as the worker, so don't leave names sitting in the buffer...
+            self.unknown_cell_type_name_fp.flush()
 
     def map_cell_type_name(self, cell_type_name):
         if cell_type_name in self.cell_type_name_mapping:
@@ -176,12 +289,20 @@ class CellTypeCountManager(object):
             return
         datasets: dict = neo4j_sample_datasets.get(sample_uuid)
         ds_uuids: List[str] = list(datasets.keys())
-        self.ingest_api_manager.begin_extract_cell_count_from_secondary_analysis_files(
-            bearer_token, sample_uuid, ds_uuids
-        )
+        # Recorded before ingest-api is asked, so that its callback (which may come at once) always finds it...
+        self.cell_type_count_request_manager.add(sample_uuid)
+        try:
+            self.ingest_api_manager.begin_extract_cell_count_from_secondary_analysis_files(
+                bearer_token, sample_uuid, ds_uuids
+            )
+        except Exception:
+            logger.error(f'begin_extract_cell_type_counts_for_sample_uuid: sample_uuid:{sample_uuid} not requested')
+            self.cell_type_count_request_manager.remove(sample_uuid)
+            raise
         logger.info('begin_extract_cell_type_counts_for_sample_uuid: '
                     f'sample_uuid:{sample_uuid} found {len(ds_uuids)} '
                     f'datasets: {", ".join(ds_uuids)}')
+        cursor = None
         try:
             cursor = self.postgresql_manager.new_cursor()
             for ds_uuid, ds_ts in datasets.items():
@@ -206,54 +327,127 @@ class CellTypeCountManager(object):
         finally:
             if cursor is not None:
                 cursor.close()
-        request_log_add(sample_uuid)
 
-    # https://www.oracletutorial.com/python-oracle/transactions/
-    def sample_extracted_cell_type_counts_from_secondary_analysis_files(self,
-                                                                        sample_uuid: str,
-                                                                        cell_type_counts: dict) -> None:
-        logger.info('sample_extracted_cell_type_counts_from_secondary_analysis_files; '
-                    f'sample_uuid: {sample_uuid} cell_type_counts: {cell_type_counts}')
-        verified_cell_type: dict = {}
-        try:
-            cursor = self.postgresql_manager.new_cursor()
-            if cell_type_counts is not None:
-                for cell_type_name, cell_type_count in cell_type_counts.items():
-                    if cell_type_name not in self.cell_type_name_mapping:
-                        cursor.execute("SELECT * FROM cell_annotation_details WHERE cell_type_name = %(cell_type_name)s",
-                                       {'cell_type_name': cell_type_name})
-                        if cursor.fetchone() is None:
-                            logger.error(f"cell_type_name '{cell_type_name}'"
-                                         " not found in 'cell_annotation_details' table")
-                            self.save_unknown_cell_type_name(cell_type_name)
-                        else:
-                            verified_cell_type[cell_type_name] = cell_type_count
-                    else:
-                        verified_cell_type[cell_type_name] = cell_type_count
-        finally:
-            if cursor is not None:
-                cursor.close()
+    def verify_cell_type_counts(self, cursor, cell_type_counts: dict) -> Dict[int, int]:
+        """The counts keyed by cell_annotation_details id of the cell types (after mapping their names) that are
+        known, with those of names mapping to the same cell type added together. The unknown names are saved.
+        """
+        mapping: dict = self.cell_type_name_mapping
+        mapped_names: Dict[str, str] = {name: mapping.get(name, name) for name in cell_type_counts.keys()}
+        ids: Dict[str, int] = cell_annotation_details_ids(cursor, set(mapped_names.values()))
+        counts: Dict[int, int] = {}
+        unknown_names: List[str] = []
+        for name, cell_type_count in cell_type_counts.items():
+            cell_annotation_details_id: int = ids.get(mapped_names[name])
+            if cell_annotation_details_id is None:
+                unknown_names.append(name)
+                continue
+            counts[cell_annotation_details_id] = counts.get(cell_annotation_details_id, 0) + int(cell_type_count)
+        if len(unknown_names) > 0:
+            logger.error(f"cell_type_names {unknown_names} not found in 'cell_annotation_details' table")
+            self.save_unknown_cell_type_names(unknown_names)
+        return counts
+
+    def write_cell_type_counts(self, cursor, sample_uuid: str, counts: Dict[int, int]) -> Tuple[int, int]:
+        """Make the cell_types of the sample the counts (from verify_cell_type_counts()).
+        Returns how many rows were removed, and how many were added or changed.
+        """
+        self.postgresql_manager.execute_prepared(cursor, self.cell_type_counts_upsert_statement,
+                                                 (sample_uuid, list(counts.keys()), list(counts.values())))
+        removed, changed = cursor.fetchone()
+        return removed, changed
+
+    def enqueue_cell_type_counts(self, sample_uuid: str, cell_type_counts: dict) -> None:
+        """Save the cell_type_counts that ingest-api has posted back for the sample in the background, along with
+        any others that arrive at about the same time (see save_queued_cell_type_counts).
+        """
+        global cell_type_count_queue_thread
+        cell_type_count_queue.put((sample_uuid, cell_type_counts, time.time()))
+        with cell_type_count_queue_metrics_lock:
+            cell_type_count_queue_metrics['enqueued'] += 1
+        with cell_type_count_queue_thread_lock:
+            if cell_type_count_queue_thread is None or not cell_type_count_queue_thread.is_alive():
+                cell_type_count_queue_thread = threading.Thread(target=self.save_queued_cell_type_counts,
+                                                                name='Cell Type Count Queue Thread')
+                cell_type_count_queue_thread.daemon = True
+                cell_type_count_queue_thread.start()
+
+    def save_queued_cell_type_counts(self) -> None:
+        while True:
+            batch: List[tuple] = [cell_type_count_queue.get()]
+            # Let the rest of a burst of callbacks (e.g. from a reindex) arrive, so that they share the transaction...
+            deadline: float = time.time() + self.queue_batch_wait_seconds
+            while len(batch) < self.queue_batch_size:
+                try:
+                    batch.append(cell_type_count_queue.get(timeout=max(deadline - time.time(), 0)))
+                except queue.Empty:
+                    break
+            try:
+                self.save_cell_type_counts(batch)
+            except Exception as e:
+                logger.error(f'save_queued_cell_type_counts: {e.__class__.__name__}: {e}')
+            finally:
+                self.postgresql_manager.release()
 
+    # https://www.oracletutorial.com/python-oracle/transactions/
+    def save_cell_type_counts(self, batch: List[tuple]) -> None:
+        """Save the cell_type_counts of each (sample_uuid, cell_type_counts, time enqueued) in a single transaction.
+        Should that fail, each sample is tried again in its own.
+        """
+        # Only the last counts posted for a sample are saved, but the wait is from when the first was...
+        samples: Dict[str, tuple] = {}
+        for sample_uuid, cell_type_counts, enqueued_time in batch:
+            samples[sample_uuid] = (cell_type_counts, samples.get(sample_uuid, (None, enqueued_time))[1])
+        if len(samples) < len(batch):
+            with cell_type_count_queue_metrics_lock:
+                cell_type_count_queue_metrics['coalesced'] += len(batch) - len(samples)
+        saved: bool = False
+        removed: int = 0
+        changed: int = 0
+        cursor = None
         try:
             cursor = self.postgresql_manager.new_cursor()
-
-            cursor.execute("DELETE FROM cell_types WHERE sample_uuid = %(sample_uuid)s",
-                           {'sample_uuid': sample_uuid})
-
-            if verified_cell_type is not None:
-                for cell_type_name, cell_type_count in verified_cell_type.items():
-                    cursor.execute('CALL add_cell_type_count_sp(%s, %s, %s)',
-                                   (sample_uuid, self.map_cell_type_name(cell_type_name), cell_type_count))
-
+            for sample_uuid, (cell_type_counts, _) in samples.items():
+                counts: Dict[int, int] = \
+                    self.verify_cell_type_counts(cursor, cell_type_counts if cell_type_counts is not None else {})
+                sample_removed, sample_changed = self.write_cell_type_counts(cursor, sample_uuid, counts)
+                removed += sample_removed
+                changed += sample_changed
             self.postgresql_manager.commit()
-            logger.info("finish_update_sample_uuid committed!")
+            saved = True
+            logger.info(f"save_cell_type_counts committed {len(samples)} samples!"
+                        f" {removed} cell types removed; {changed} added or changed")
         except (Exception, DatabaseError, UniqueViolation, NotNullViolation) as e:
             self.postgresql_manager.rollback()
             logger.error(f'Exception Type causing rollback: {e.__class__.__name__}: {e}')
         finally:
             if cursor is not None:
                 cursor.close()
-        request_log_delete(sample_uuid)
+        if not saved and len(samples) > 1:
+            for sample_uuid, (cell_type_counts, enqueued_time) in samples.items():
+                self.save_cell_type_counts([(sample_uuid, cell_type_counts, enqueued_time)])
+            return
+
+        if saved and (removed > 0 or changed > 0):
+            # The cell_type_name searches of these samples may return something else once the view is refreshed...
+            self.cell_type_search_manager.request_refresh()
+        self.cell_type_count_request_manager.remove_all(list(samples.keys()))
+        latencies: List[float] = [time.time() - enqueued_time for _, enqueued_time in samples.values()]
+        with cell_type_count_queue_metrics_lock:
+            cell_type_count_queue_metrics['saved' if saved else 'failed'] += len(samples)
+            cell_type_count_queue_metrics['batches'] += 1
+            cell_type_count_queue_metrics['batch_size_max'] = \
+                max(cell_type_count_queue_metrics['batch_size_max'], len(samples))
+            cell_type_count_queue_metrics['latency_seconds_total'] += sum(latencies)
+            cell_type_count_queue_metrics['latency_seconds_max'] = \
+                max([cell_type_count_queue_metrics['latency_seconds_max']] + latencies)
+
+    def sample_extracted_cell_type_counts_from_secondary_analysis_files(self,
+                                                                        sample_uuid: str,
+                                                                        cell_type_counts: dict) -> None:
+        logger.info('sample_extracted_cell_type_counts_from_secondary_analysis_files; '
+                    f'sample_uuid: {sample_uuid} cell_type_counts: {cell_type_counts}')
+        self.save_cell_type_counts([(sample_uuid, cell_type_counts, time.time())])
 
 
 if __name__ == '__main__':
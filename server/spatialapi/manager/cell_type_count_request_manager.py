@@ -0,0 +1,166 @@
+import logging
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List
+import psycopg2
+
+from spatialapi.manager.postgresql_manager import PostgresqlManager
+
+logger = logging.getLogger(__name__)
+
+# The (one per process) thread that reports the requests that have timed out.
+sweep_thread_lock = threading.Lock()
+sweep_thread: threading.Thread = None
+# The session advisory lock that the sweeping process holds, and the connection that it holds it on...
+SWEEP_LOCK_KEY: int = 2022005
+sweep_lock_conn = None
+
+
+class CellTypeCountRequestManager(object):
+    """The cell_type_count extractions that ingest-api has been asked for, but which it has not yet posted back
+    (see CellTypeCountManager). These are kept in the cell_type_count_request table
+    (db/migrations/005_cell_type_count_request.sql) so that every (uwsgi worker) process sees the same requests,
+    whichever of them made the request and whichever receives the counts.
+    Those not answered within RequestTimeoutHours are reported (and removed) by a sweep every RequestSweepSeconds.
+    Only the process holding the SWEEP_LOCK_KEY advisory lock sweeps. The others try to take it every
+    RequestSweepSeconds, so another takes over when that process (and with it the lock's connection) goes away.
+    """
+
+    def __init__(self, config):
+        self.table: str = 'cell_type_count_request'
+        self.timeout_hours: float = config.getfloat('celltypecount', 'RequestTimeoutHours', fallback=2)
+        self.sweep_seconds: float = config.getfloat('celltypecount', 'RequestSweepSeconds', fallback=300)
+        logger.info(f'CellTypeCountRequestManager: RequestTimeoutHours: {self.timeout_hours};'
+                    f' RequestSweepSeconds: {self.sweep_seconds}')
+        self.postgresql_manager = PostgresqlManager(config)
+        self.start_sweep()
+
+    def close(self) -> None:
+        logger.info(f'CellTypeCountRequestManager: Closing')
+        self.postgresql_manager.close()
+
+    def execute(self, sql: str, vars: tuple = None) -> list:
+        """Execute and commit the sql returning its rows, or None on failure."""
+        try:
+            with self.postgresql_manager.connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute(sql, vars)
+                    rows: list = cursor.fetchall() if cursor.description is not None else []
+                    conn.commit()
+                    return rows
+                except (Exception, psycopg2.DatabaseError):
+                    conn.rollback()
+                    raise
+                finally:
+                    cursor.close()
+        except (Exception, psycopg2.DatabaseError) as e:
+            logger.error(f'CellTypeCountRequestManager: Exception Type: {e.__class__.__name__}: {e}')
+            return None
+
+    def add(self, sample_uuid: str) -> None:
+        """Call before asking ingest-api for the cell_type_counts of the sample (and remove() it should that fail)."""
+        self.execute(f"INSERT INTO {self.table} (sample_uuid) VALUES (%s)"
+                     " ON CONFLICT (sample_uuid) DO UPDATE SET request_time = EXCLUDED.request_time;",
+                     (sample_uuid,))
+
+    def remove(self, sample_uuid: str) -> datetime:
+        """Call when ingest-api has posted back the cell_type_counts of the sample.
+        Returns when they were asked for, or None if they weren't (or the request had timed out).
+        """
+        return self.remove_all([sample_uuid]).get(sample_uuid)
+
+    def remove_all(self, sample_uuids: List[str]) -> Dict[str, datetime]:
+        """As remove() for each of the samples, with a single statement. Returns when those that were asked for were."""
+        rows: list = self.execute(f"DELETE FROM {self.table} WHERE sample_uuid = ANY(%s)"
+                                  " RETURNING sample_uuid, request_time;",
+                                  (list(sample_uuids),))
+        request_times: Dict[str, datetime] = {row[0]: row[1] for row in rows} if rows is not None else {}
+        for sample_uuid in sample_uuids:
+            request_time: datetime = request_times.get(sample_uuid)
+            if request_time is None:
+                logger.info(f'CellTypeCountRequestManager: no request pending for sample_uuid {sample_uuid}')
+            else:
+                logger.info(f'CellTypeCountRequestManager: sample_uuid {sample_uuid} answered in'
+                            f' {datetime.now(request_time.tzinfo) - request_time}')
+        return request_times
+
+    def pending(self) -> List[dict]:
+        """The requests not yet answered, oldest first."""
+        rows: list = self.execute(f"SELECT sample_uuid, request_time, EXTRACT(EPOCH FROM now() - request_time)"
+                                  f" FROM {self.table} ORDER BY request_time;")
+        if rows is None:
+            return None
+        return [{'sample_uuid': row[0], 'request_time': row[1].isoformat(), 'age_seconds': round(float(row[2]), 3)}
+                for row in rows]
+
+    def count(self) -> int:
+        rows: list = self.execute(f"SELECT count(*) FROM {self.table};")
+        return rows[0][0] if rows is not None else None
+
+    def remove_timed_out(self) -> List[str]:
+        """Remove the requests made more than RequestTimeoutHours ago, returning their sample_uuids."""
+        rows: list = self.execute(f"DELETE FROM {self.table}"
+                                  " WHERE request_time < now() - make_interval(secs => %s)"
+                                  " RETURNING sample_uuid;",
+                                  (self.timeout_hours * 60 * 60,))
+        if rows is None:
+            return []
+        return [row[0] for row in rows]
+
+    def start_sweep(self) -> None:
+        global sweep_thread
+        with sweep_thread_lock:
+            if sweep_thread is None or not sweep_thread.is_alive():
+                sweep_thread = threading.Thread(target=self.sweep, name='Cell Type Count Request Timeout Thread')
+                sweep_thread.daemon = True
+                sweep_thread.start()
+
+    def is_sweeper(self) -> bool:
+        """Whether this process holds the sweep lock (taking it if it is free)."""
+        global sweep_lock_conn
+        conn = sweep_lock_conn
+        try:
+            # Asked again even when it's held, which also finds out if the connection (and so the lock) has been lost...
+            if conn is None:
+                conn = self.postgresql_manager.pool.getconn()
+            cursor = conn.cursor()
+            try:
+                cursor.execute('SELECT pg_try_advisory_lock(%s);', (SWEEP_LOCK_KEY,))
+                locked: bool = cursor.fetchone()[0]
+                conn.commit()
+            finally:
+                cursor.close()
+        except (Exception, psycopg2.DatabaseError) as e:
+            logger.error(f'CellTypeCountRequestManager: sweep lock failed: {e.__class__.__name__}: {e}')
+            locked = False
+        if not locked:
+            if conn is None:
+                # The pool had none to give (or the database is down), so there's nothing to put back...
+                return False
+            if sweep_lock_conn is not None:
+                # Closed rather than pooled, so that no other borrower ends up holding the lock...
+                sweep_lock_conn = None
+                conn.close()
+            self.postgresql_manager.pool.putconn(conn)
+            return False
+        if sweep_lock_conn is None:
+            # The lock belongs to the session, so the connection is kept (out of the pool) for as long as it's held...
+            logger.info(f'CellTypeCountRequestManager: this process is now the sweeper')
+            sweep_lock_conn = conn
+        return True
+
+    def sweep(self) -> None:
+        while True:
+            time.sleep(self.sweep_seconds)
+            # Nothing is allowed to end the thread, as it is only started when the manager is made...
+            try:
+                if not self.is_sweeper():
+                    continue
+                logger.info(f'CellTypeCountRequestManager: {self.count()} requests pending')
+                for sample_uuid in self.remove_timed_out():
+                    logger.error(f'Ingest-api cell_type_count request for sample_uuid {sample_uuid}'
+                                 f' has not returned data in {self.timeout_hours} hours')
+            except Exception as e:
+                logger.error(f'CellTypeCountRequestManager: sweep failed: {e.__class__.__name__}: {e}')
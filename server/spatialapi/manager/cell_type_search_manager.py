@@ -0,0 +1,79 @@
+import logging
+import threading
+import time
+import psycopg2
+
+from spatialapi.manager.postgresql_manager import PostgresqlManager
+from spatialapi.manager.search_cache_manager import SearchCacheManager
+
+logger = logging.getLogger(__name__)
+
+# Set when a refresh is wanted, and the (one per process) thread that then makes it.
+refresh_wanted = threading.Event()
+refresh_thread_lock = threading.Lock()
+refresh_thread: threading.Thread = None
+
+
+class CellTypeSearchManager(object):
+    """Keeps the materialized views of the samples and their cell types that the cell_type searches use
+    (see db/migrations/003_sample_cell_type_search.sql and 004_sample_cell_type_summary.sql) up to date.
+    A refresh is asked for whenever the samples or their cell types change, and these are made in the background,
+    no more often than every RefreshDelaySeconds, and CONCURRENTLY so that the searches are not blocked while it is.
+    Since the cell_type searches may then return something else, the data generation is advanced after each.
+    """
+
+    def __init__(self, config, search_cache_manager: SearchCacheManager):
+        # A row for each cell type of each sample...
+        self.view: str = f"{config['spatial'].get('Table')}_cell_type_search"
+        # A row for each sample with all of its cell types (and their counts)...
+        self.summary_view: str = f"{config['spatial'].get('Table')}_cell_type_summary"
+        self.refresh_delay_seconds: float = config.getfloat('cellTypeSearch', 'RefreshDelaySeconds', fallback=5)
+        logger.info(f'CellTypeSearchManager: Views: {self.view}, {self.summary_view};'
+                    f' RefreshDelaySeconds: {self.refresh_delay_seconds}')
+        self.postgresql_manager = PostgresqlManager(config)
+        self.search_cache_manager = search_cache_manager
+
+    def close(self) -> None:
+        logger.info(f'CellTypeSearchManager: Closing')
+        self.postgresql_manager.close()
+
+    def request_refresh(self) -> None:
+        """Call after committing a change to the samples or their cell types."""
+        global refresh_thread
+        refresh_wanted.set()
+        with refresh_thread_lock:
+            if refresh_thread is None or not refresh_thread.is_alive():
+                refresh_thread = threading.Thread(target=self.refresh_when_wanted, name='Cell Type Search Refresh Thread')
+                refresh_thread.daemon = True
+                refresh_thread.start()
+
+    def refresh_when_wanted(self) -> None:
+        while True:
+            refresh_wanted.wait()
+            # Let the rest of a burst of changes (e.g. a reindex) arrive, so that they share the refresh...
+            time.sleep(self.refresh_delay_seconds)
+            # Cleared before rather than after, so a change made during the refresh gets another...
+            refresh_wanted.clear()
+            self.refresh()
+
+    def refresh(self) -> bool:
+        start_time: float = time.time()
+        try:
+            with self.postgresql_manager.connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    for view in (self.view, self.summary_view):
+                        cursor.execute(f'REFRESH MATERIALIZED VIEW CONCURRENTLY {view};')
+                    conn.commit()
+                except (Exception, psycopg2.DatabaseError):
+                    conn.rollback()
+                    raise
+                finally:
+                    cursor.close()
+        except (Exception, psycopg2.DatabaseError) as e:
+            logger.error(f'CellTypeSearchManager: refresh failed: {e.__class__.__name__}: {e}')
+            return False
+        logger.info(f'CellTypeSearchManager: refreshed {self.view} and {self.summary_view}'
+                    f' in {time.time() - start_time:.3f} seconds')
+        self.search_cache_manager.bump_generation()
+        return True
@@ -1,6 +1,7 @@
 import logging
 import requests
 import json
+import threading
 from typing import List
 from flask import abort
 
@@ -16,6 +17,16 @@ class IngestApiManager(object):
         self.ingest_api_url: str = ingest_api_config.get('Url').rstrip('/')
 
         logger.info(f"IngestApiManager IngestApiUrl: '{self.ingest_api_url}'")
+        # A requests.Session per thread so that repeated calls reuse the (keep-alive) connection...
+        self.local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        session: requests.Session = getattr(self.local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            self.local.session = session
+        return session
 
     def close(self) -> None:
         logger.info(f'IngestApiManager: Closing')
@@ -48,7 +59,7 @@ class IngestApiManager(object):
         }
         request_json = json.dumps(request)
         logger.info(f"begin_extract_cell_count_from_secondary_analysis_files; headers: {headers} request: {request_json}")
-        response: str = requests.post(ingest_uri, headers=headers, json=request)
+        response: str = self.session.post(ingest_uri, headers=headers, json=request)
         if response.status_code == 202:
             logger.info(f"begin_extract_cell_count_from_secondary_analysis_files: url: {ingest_uri} with ds_uuids:{','.join(str(i) for i in ds_uuids)} status 202")
         else:
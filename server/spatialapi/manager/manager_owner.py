@@ -0,0 +1,26 @@
+import logging
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+
+class ManagerOwner(object):
+    """A manager that is built from other managers. In the service these are shared by the whole (uwsgi worker)
+    process and are given to it by Managers, which closes them. Otherwise (e.g. in the command line tools) it
+    makes its own, and closes those (and only those) with close_owned_managers().
+    """
+
+    def shared_or_own(self, manager, create: Callable):
+        """The shared manager if one is given, otherwise a new one from create() owned by this one."""
+        if manager is not None:
+            return manager
+        if not hasattr(self, 'owned_managers'):
+            self.owned_managers: List = []
+        manager = create()
+        self.owned_managers.append(manager)
+        return manager
+
+    def close_owned_managers(self) -> None:
+        for manager in getattr(self, 'owned_managers', []):
+            manager.close()
+        self.owned_managers = []
@@ -0,0 +1,140 @@
+import logging
+import threading
+import configparser
+from flask import current_app
+
+from spatialapi.manager.cell_annotation_manager import CellAnnotationManager
+from spatialapi.manager.cell_type_count_manager import CellTypeCountManager
+from spatialapi.manager.cell_type_count_request_manager import CellTypeCountRequestManager
+from spatialapi.manager.cell_type_search_manager import CellTypeSearchManager
+from spatialapi.manager.ingest_api_manager import IngestApiManager
+from spatialapi.manager.neo4j_manager import Neo4jManager
+from spatialapi.manager.postgresql_manager import PostgresqlManager
+from spatialapi.manager.sample_load_manager import SampleLoadManager
+from spatialapi.manager.sample_reindex_manager import SampleReindexManager
+from spatialapi.manager.search_cache_manager import SearchCacheManager
+from spatialapi.manager.spatial_index_manager import SpatialIndexManager
+from spatialapi.manager.spatial_manager import SpatialManager
+from spatialapi.manager.spatial_placement_manager import SpatialPlacementManager
+
+logger = logging.getLogger(__name__)
+
+APP_PROPERTIES: str = 'resources/app.properties'
+
+# The (properties of Managers naming the) shared managers that each manager is built from, which are given to it as
+# the keyword arguments of the same names, so that each is only made once per process...
+MANAGER_DEPENDENCIES: dict = {
+    CellTypeCountManager: ['ingest_api_manager', 'neo4j_manager', 'postgresql_manager', 'search_cache_manager',
+                           'cell_type_search_manager', 'cell_type_count_request_manager'],
+    CellTypeSearchManager: ['search_cache_manager'],
+    SampleLoadManager: ['neo4j_manager', 'postgresql_manager', 'spatial_manager'],
+    SampleReindexManager: ['sample_load_manager', 'cell_type_count_manager'],
+    SpatialIndexManager: ['search_cache_manager'],
+    SpatialManager: ['neo4j_manager', 'postgresql_manager', 'spatial_placement_manager', 'search_cache_manager',
+                     'spatial_index_manager', 'cell_type_search_manager']
+}
+
+
+def read_config(app_properties: str = APP_PROPERTIES) -> configparser.ConfigParser:
+    config = configparser.ConfigParser()
+    logger.info(f'Reading properties file: {app_properties}')
+    config.read(app_properties)
+    return config
+
+
+class Managers(object):
+    """The managers used by the routes of one (uwsgi worker) process.
+    Each is created the first time it is asked for and then kept for the life of the process,
+    so that requests don't pay to re-read the configuration and rebuild connections.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        # Reentrant, since making a manager gets the managers that it's made from...
+        self.lock = threading.RLock()
+        self.instances: dict = {}
+
+    def get(self, manager_class):
+        with self.lock:
+            manager = self.instances.get(manager_class)
+            if manager is None:
+                logger.info(f'Managers: Creating {manager_class.__name__}')
+                dependencies: dict = {name: getattr(self, name) for name in MANAGER_DEPENDENCIES.get(manager_class, [])}
+                manager = manager_class(self.config, **dependencies)
+                self.instances[manager_class] = manager
+            return manager
+
+    @property
+    def cell_annotation_manager(self) -> CellAnnotationManager:
+        return self.get(CellAnnotationManager)
+
+    @property
+    def cell_type_count_manager(self) -> CellTypeCountManager:
+        return self.get(CellTypeCountManager)
+
+    @property
+    def cell_type_count_request_manager(self) -> CellTypeCountRequestManager:
+        return self.get(CellTypeCountRequestManager)
+
+    @property
+    def cell_type_search_manager(self) -> CellTypeSearchManager:
+        return self.get(CellTypeSearchManager)
+
+    @property
+    def ingest_api_manager(self) -> IngestApiManager:
+        return self.get(IngestApiManager)
+
+    @property
+    def neo4j_manager(self) -> Neo4jManager:
+        return self.get(Neo4jManager)
+
+    @property
+    def postgresql_manager(self) -> PostgresqlManager:
+        return self.get(PostgresqlManager)
+
+    @property
+    def sample_load_manager(self) -> SampleLoadManager:
+        return self.get(SampleLoadManager)
+
+    @property
+    def sample_reindex_manager(self) -> SampleReindexManager:
+        return self.get(SampleReindexManager)
+
+    @property
+    def search_cache_manager(self) -> SearchCacheManager:
+        return self.get(SearchCacheManager)
+
+    @property
+    def spatial_index_manager(self) -> SpatialIndexManager:
+        return self.get(SpatialIndexManager)
+
+    @property
+    def spatial_manager(self) -> SpatialManager:
+        return self.get(SpatialManager)
+
+    @property
+    def spatial_placement_manager(self) -> SpatialPlacementManager:
+        return self.get(SpatialPlacementManager)
+
+    def release(self) -> None:
+        """Give back any PostgreSQL connection that the calling thread is still holding."""
+        with self.lock:
+            if len(self.instances) == 0:
+                return
+        # The held connection belongs to the thread, so any PostgresqlManager on the same pool can release it.
+        try:
+            self.postgresql_manager.release()
+        except Exception as e:
+            logger.error(f'Managers: release failed: {e.__class__.__name__}: {e}')
+
+    def close(self) -> None:
+        with self.lock:
+            instances: list = list(self.instances.values())
+            self.instances = {}
+        # Those made from others were made after them, so are closed before them...
+        for manager in reversed(instances):
+            manager.close()
+
+
+def get_managers() -> Managers:
+    return current_app.extensions['spatialapi']
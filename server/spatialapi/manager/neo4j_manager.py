@@ -1,6 +1,7 @@
 import neo4j
 import logging
 import json
+import threading
 from ast import literal_eval
 from typing import List
 
@@ -31,15 +32,28 @@ class Neo4jManager(object):
         username: str = neo4j_config.get('Username')
         password: str = neo4j_config.get('Password')
         logger.info(f'Neo4jManager: Username: {username} Server: {server}')
-        # Could throw: neo4j.exceptions.ServiceUnavailable
-        self.driver = neo4j.GraphDatabase.driver(server, auth=(username, password))
+        self.server = server
+        self.auth = (username, password)
+        # The driver is only created when something actually queries Neo4J...
+        self._driver = None
+        self.driver_lock = threading.Lock()
+
+    @property
+    def driver(self):
+        with self.driver_lock:
+            if self._driver is None:
+                logger.info(f'Neo4jManager: Creating driver for {self.server}')
+                # Could throw: neo4j.exceptions.ServiceUnavailable
+                self._driver = neo4j.GraphDatabase.driver(self.server, auth=self.auth)
+            return self._driver
 
     # https://neo4j.com/docs/api/python-driver/current/api.html
     def close(self) -> None:
-        if self.driver is not None:
-            logger.info(f'Neo4jManager: Closing connection to Neo4J')
-            self.driver.close()
-            self.driver = None
+        with self.driver_lock:
+            if self._driver is not None:
+                logger.info(f'Neo4jManager: Closing connection to Neo4J')
+                self._driver.close()
+                self._driver = None
 
     def search_organ_donor_data_for_grouping_concept_preferred_term(self,
                                                                     organ_donor_data_list: List[dict],
@@ -1,11 +1,204 @@
 import psycopg2
-from typing import List
+import psycopg2.extensions
+import psycopg2.pool
+from psycopg2.extras import execute_batch
+from contextlib import contextmanager
+from typing import Iterator, List
+import re
+import threading
 import logging
+import time
+import os
 
 logger = logging.getLogger(__name__)
 
 
+def ontology_id_of_obo_ontology_id_uri(obo_ontology_id_uri: str) -> str:
+    """The end of the uri with its underscores turned into spaces (e.g. '.../CL_1001096' is 'CL 1001096')."""
+    return obo_ontology_id_uri.rsplit('/', 1)[-1].replace('_', ' ')
+
+
+class PostgresqlPoolTimeout(Exception):
+    pass
+
+
+class PreparingConnection(psycopg2.extensions.connection):
+    """A connection that remembers the names of the statements PREPAREd in its session,
+    so that each is only prepared once for the life of the connection.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared_statements: set = set()
+
+
+class PreparedStatement(object):
+    """A statement with $1 ... $n parameters (of the PostgreSQL 'types' given) that is PREPAREd once on each
+    connection and then run with EXECUTE, so that the server parses and plans it once rather than on every use.
+    """
+
+    def __init__(self, name: str, sql: str, types: List[str]):
+        self.name = name
+        self.sql = sql
+        self.types = types
+        if len(types) == 0:
+            self.prepare_sql = f"PREPARE {name} AS {sql}"
+            self.execute_sql = f"EXECUTE {name}"
+        else:
+            self.prepare_sql = f"PREPARE {name} ({', '.join(types)}) AS {sql}"
+            self.execute_sql = f"EXECUTE {name} ({', '.join(['%s'] * len(types))})"
+        # A (server side) named cursor can't be DECLAREd for an EXECUTE, so it is given the statement itself
+        # with the $n parameters replaced by (typed) psycopg2 placeholders, see cursor_vars().
+        self.cursor_sql = re.sub(r'\$(\d+)', lambda m: f'%(p{m.group(1)})s::{types[int(m.group(1)) - 1]}',
+                                 sql.replace('%', '%%'))
+
+    def cursor_vars(self, vars: tuple) -> dict:
+        return {f'p{i + 1}': value for i, value in enumerate(vars)}
+
+
+class PostgresqlConnectionPool(object):
+    """A thread safe pool of connections to PostgreSQL shared by everything in one (uwsgi worker) process.
+    Callers borrow a connection with getconn() and MUST hand it back with putconn().
+    Unlike psycopg2's ThreadedConnectionPool, getconn() waits (up to checkout_timeout seconds) for a
+    connection to be returned rather than failing when all maxconn connections are in use.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, checkout_timeout: float, health_check_idle_seconds: float,
+                 connection: dict):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.checkout_timeout = checkout_timeout
+        self.health_check_idle_seconds = health_check_idle_seconds
+        self.pool = psycopg2.pool.ThreadedConnectionPool(minconn, maxconn, connection_factory=PreparingConnection,
+                                                          **connection)
+        # The connection (if any) that each thread is holding for a multi statement transaction...
+        self.local = threading.local()
+        self.available = threading.BoundedSemaphore(maxconn)
+        self.lock = threading.Lock()
+        # The time at which a connection was last returned to the pool (keyed by id(conn))...
+        self.last_returned: dict = {}
+        self.in_use: int = 0
+        self.checkouts: int = 0
+        self.checkout_timeouts: int = 0
+        self.discarded: int = 0
+        self.wait_seconds: float = 0.0
+
+    def is_healthy(self, conn) -> bool:
+        if conn.closed != 0:
+            return False
+        last_returned: float = self.last_returned.get(id(conn))
+        if last_returned is None or time.time() - last_returned < self.health_check_idle_seconds:
+            return True
+        # The connection has been sitting in the pool for a while, the server may have dropped it...
+        try:
+            cursor = conn.cursor()
+            try:
+                cursor.execute('SELECT 1;')
+            finally:
+                cursor.close()
+            conn.rollback()
+            return True
+        except (Exception, psycopg2.DatabaseError) as e:
+            logger.warning(f'PostgresqlConnectionPool: discarding unhealthy connection: {e.__class__.__name__}: {e}')
+            return False
+
+    def getconn(self):
+        start_time: float = time.time()
+        if not self.available.acquire(timeout=self.checkout_timeout):
+            with self.lock:
+                self.checkout_timeouts += 1
+            raise PostgresqlPoolTimeout(f'No PostgreSQL connection became available in {self.checkout_timeout} seconds')
+        try:
+            # Bounded so that a database which is down raises rather than looping forever...
+            for _ in range(self.maxconn + 1):
+                conn = self.pool.getconn()
+                if self.is_healthy(conn):
+                    break
+                self.last_returned.pop(id(conn), None)
+                self.pool.putconn(conn, close=True)
+                with self.lock:
+                    self.discarded += 1
+            else:
+                raise psycopg2.OperationalError('Unable to obtain a healthy PostgreSQL connection')
+        except Exception:
+            self.available.release()
+            raise
+        with self.lock:
+            self.in_use += 1
+            self.checkouts += 1
+            self.wait_seconds += time.time() - start_time
+        return conn
+
+    def putconn(self, conn) -> None:
+        close: bool = conn.closed != 0
+        if not close and conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            # Don't hand the next borrower a connection in the middle of someone else's transaction...
+            try:
+                conn.rollback()
+            except (Exception, psycopg2.DatabaseError):
+                close = True
+        if close:
+            self.last_returned.pop(id(conn), None)
+            with self.lock:
+                self.discarded += 1
+        else:
+            self.last_returned[id(conn)] = time.time()
+        try:
+            self.pool.putconn(conn, close=close)
+        finally:
+            with self.lock:
+                self.in_use -= 1
+            self.available.release()
+
+    def closeall(self) -> None:
+        self.pool.closeall()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'min_connections': self.minconn,
+                'max_connections': self.maxconn,
+                'in_use': self.in_use,
+                'idle': len(self.pool._pool),
+                'checkouts': self.checkouts,
+                'checkout_timeouts': self.checkout_timeouts,
+                'discarded': self.discarded,
+                'average_checkout_wait_msec':
+                    round(self.wait_seconds / self.checkouts * 1000.0, 3) if self.checkouts > 0 else 0.0
+            }
+
+
+# One pool per database per process. The pid is part of the key so that a process forked
+# after a pool was created (e.g. the uwsgi master forking workers) builds its own.
+connection_pools: dict = {}
+connection_pools_lock = threading.Lock()
+
+
+def get_connection_pool(postgresql_config, connection: dict) -> PostgresqlConnectionPool:
+    key: tuple = (os.getpid(),) + tuple(sorted(connection.items()))
+    with connection_pools_lock:
+        connection_pool: PostgresqlConnectionPool = connection_pools.get(key)
+        if connection_pool is None:
+            minconn: int = postgresql_config.getint('PoolMinConnections', fallback=1)
+            maxconn: int = postgresql_config.getint('PoolMaxConnections', fallback=8)
+            logger.info(f'PostgresqlManager: Creating connection pool for pid {os.getpid()};'
+                        f' min: {minconn} max: {maxconn}')
+            connection_pool = PostgresqlConnectionPool(
+                minconn, maxconn,
+                postgresql_config.getfloat('PoolCheckoutTimeout', fallback=30.0),
+                postgresql_config.getfloat('PoolHealthCheckIdleSeconds', fallback=30.0),
+                connection)
+            connection_pools[key] = connection_pool
+        return connection_pool
+
+
 class PostgresqlManager(object):
+    """Connections are borrowed from the process wide pool for the duration of a single select/insert.
+    A connection used through new_cursor() stays with the calling thread until commit(), rollback(),
+    or close() hands it back, so that multi statement transactions see a single connection.
+    The held connection belongs to the thread (not the manager) so every PostgresqlManager used by that
+    thread works within the same transaction, and instances can be shared between threads.
+    """
 
     def __init__(self, config):
         postgresql_config = config['postgresql']
@@ -20,67 +213,146 @@ class PostgresqlManager(object):
         if len(host_port) > 1:
             connection['port'] = host_port[1]
         logger.info(f"PostgresqlManager: Username: {postgresql_config.get('Username')} Server: {postgresql_config.get('Server')}")
-        self.conn = psycopg2.connect(**connection)
+        self.pool: PostgresqlConnectionPool = get_connection_pool(postgresql_config, connection)
+        # Rows fetched from the server at a time by the iter_*() methods...
+        self.stream_itersize: int = postgresql_config.getint('StreamItersize', fallback=2000)
+
+    @property
+    def conn(self):
+        """The connection held by the calling thread, borrowed from the pool if it does not have one."""
+        conn = getattr(self.pool.local, 'conn', None)
+        if conn is None:
+            conn = self.pool.getconn()
+            self.pool.local.conn = conn
+        return conn
+
+    def release(self) -> None:
+        """Return the connection held by the calling thread (if any) to the pool."""
+        conn = getattr(self.pool.local, 'conn', None)
+        if conn is not None:
+            self.pool.local.conn = None
+            self.pool.putconn(conn)
+
+    @contextmanager
+    def connection(self):
+        """Use the connection held by the calling thread, otherwise borrow one just for the block."""
+        conn = getattr(self.pool.local, 'conn', None)
+        if conn is not None:
+            yield conn
+            return
+        conn = self.pool.getconn()
+        try:
+            yield conn
+        finally:
+            self.pool.putconn(conn)
 
     def close(self) -> None:
-        if self.conn is not None:
-            logger.info(f'PostgresqlManager: Closing connection to PostgreSQL')
-            self.conn.close()
-            self.conn = None
+        # The pool itself lives as long as the process, so this just gives back anything borrowed.
+        self.release()
+
+    def pool_stats(self) -> dict:
+        return self.pool.stats()
+
+    def check_connection(self) -> bool:
+        try:
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute('SELECT 1;')
+                    cursor.fetchone()
+                finally:
+                    cursor.close()
+            return True
+        except (Exception, psycopg2.DatabaseError) as e:
+            logger.error(f'PostgresqlManager: connection check failed: {e.__class__.__name__}: {e}')
+            return False
 
     def new_cursor(self):
         return self.conn.cursor()
 
     def commit(self) -> None:
-        self.conn.commit()
+        try:
+            self.conn.commit()
+        finally:
+            self.release()
 
     def rollback(self) -> None:
-        self.conn.rollback()
+        conn = getattr(self.pool.local, 'conn', None)
+        if conn is None:
+            return
+        try:
+            conn.rollback()
+        finally:
+            self.release()
+
+    # Prepared statements belong to the session, so they outlive any transaction (even one rolled back)
+    # and are only lost with the connection, which the pool replaces with a new PreparingConnection.
+    def prepare(self, cursor, statement: PreparedStatement) -> None:
+        prepared_statements: set = cursor.connection.prepared_statements
+        if statement.name not in prepared_statements:
+            cursor.execute(statement.prepare_sql)
+            prepared_statements.add(statement.name)
+
+    def execute_prepared(self, cursor, statement: PreparedStatement, vars: tuple = ()) -> None:
+        self.prepare(cursor, statement)
+        cursor.execute(statement.execute_sql, vars)
+
+    def execute_prepared_batch(self, cursor, statement: PreparedStatement, vars_list: List[tuple],
+                               page_size: int = 100) -> None:
+        """EXECUTE the statement once for each of the vars, 'page_size' of them per round trip to the server."""
+        self.prepare(cursor, statement)
+        execute_batch(cursor, statement.execute_sql, vars_list, page_size=page_size)
 
     def insert(self, sql: str) -> int:
         id: int = None
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute(sql)
-            self.conn.commit()
-            # get the generated id back
-            id = cursor.fetchone()[0]
-        except (Exception, psycopg2.DatabaseError, psycopg2.errors.UniqueViolation) as e:
-            self.conn.rollback()
-            logger.error(f'Exception Type causing rollback: {e.__class__.__name__}: {e}')
-        finally:
-            if cursor is not None:
-                cursor.close()
+        cursor = None
+        with self.connection() as conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute(sql)
+                # get the generated id back
+                id = cursor.fetchone()[0]
+                conn.commit()
+            except (Exception, psycopg2.DatabaseError, psycopg2.errors.UniqueViolation) as e:
+                conn.rollback()
+                logger.error(f'Exception Type causing rollback: {e.__class__.__name__}: {e}')
+            finally:
+                if cursor is not None:
+                    cursor.close()
         return id
 
     def get_cell_marker_id(self, marker: str) -> int:
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute('CALL get_cell_marker_sp(%s, %s)', (marker, '0'))
-            self.conn.commit()
-            results = cursor.fetchone()
-            logger.info(f'get_cell_marker_id({marker}); results: {results}')
-        except (Exception, psycopg2.DatabaseError, psycopg2.errors.UniqueViolation) as e:
-            self.conn.rollback()
-            logger.error(f'Exception Type causing rollback: {e.__class__.__name__}: {e}')
-        finally:
-            if cursor is not None:
-                cursor.close()
+        cursor = None
+        with self.connection() as conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute('CALL get_cell_marker_sp(%s, %s)', (marker, '0'))
+                results = cursor.fetchone()
+                conn.commit()
+                logger.info(f'get_cell_marker_id({marker}); results: {results}')
+            except (Exception, psycopg2.DatabaseError, psycopg2.errors.UniqueViolation) as e:
+                conn.rollback()
+                logger.error(f'Exception Type causing rollback: {e.__class__.__name__}: {e}')
+            finally:
+                if cursor is not None:
+                    cursor.close()
         return results[0]
 
     def create_cell_markers(self, markers: List[str]) -> int:
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute('CALL create_cell_markers_sp(%s, %s)', (markers, []))
-            self.conn.commit()
-            results = cursor.fetchone()
-            logger.info(f'create_cell_markers({markers}); results: {results}')
-        except (Exception, psycopg2.DatabaseError, psycopg2.errors.UniqueViolation) as e:
-            self.conn.rollback()
-            logger.error(f'Exception Type causing rollback: {e.__class__.__name__}: {e}')
-        finally:
-            if cursor is not None:
-                cursor.close()
+        cursor = None
+        with self.connection() as conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute('CALL create_cell_markers_sp(%s, %s)', (markers, []))
+                results = cursor.fetchone()
+                conn.commit()
+                logger.info(f'create_cell_markers({markers}); results: {results}')
+            except (Exception, psycopg2.DatabaseError, psycopg2.errors.UniqueViolation) as e:
+                conn.rollback()
+                logger.error(f'Exception Type causing rollback: {e.__class__.__name__}: {e}')
+            finally:
+                if cursor is not None:
+                    cursor.close()
         return results[0]
 
     def create_annotation_details(self,
@@ -88,24 +360,98 @@ class PostgresqlManager(object):
                                   obo_ontology_id_uri: str,
                                   markers: List[str]
                                   ) -> int:
-        ontology_id: str = obo_ontology_id_uri.rsplit('/', 1)[-1]
-        logger.info(f'obo_ontology_id_uri end {ontology_id}')
-        ontology_id = ontology_id.replace('_', ' ')
+        ontology_id: str = ontology_id_of_obo_ontology_id_uri(obo_ontology_id_uri)
         logger.info(f'ontology_id: {ontology_id}')
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute('CALL create_annotation_details_sp(%s, %s, %s, %s, %s)',
-                           (cell_type_name, obo_ontology_id_uri, ontology_id, markers, 0))
-            self.conn.commit()
-            results = cursor.fetchone()
-        except (Exception, psycopg2.DatabaseError, psycopg2.errors.UniqueViolation) as e:
-            self.conn.rollback()
-            logger.error(f'Exception Type causing rollback: {e.__class__.__name__}: {e}')
-            #abort(json_error(f'Request Body: the attribute hubmap_id has no rui_location data', HTTPStatus.CONFLICT))
-            raise e
-        finally:
-            if cursor is not None:
-                cursor.close()
+        cursor = None
+        with self.connection() as conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute('CALL create_annotation_details_sp(%s, %s, %s, %s, %s)',
+                               (cell_type_name, obo_ontology_id_uri, ontology_id, markers, 0))
+                results = cursor.fetchone()
+                conn.commit()
+            except (Exception, psycopg2.DatabaseError, psycopg2.errors.UniqueViolation) as e:
+                conn.rollback()
+                logger.error(f'Exception Type causing rollback: {e.__class__.__name__}: {e}')
+                #abort(json_error(f'Request Body: the attribute hubmap_id has no rui_location data', HTTPStatus.CONFLICT))
+                raise e
+            finally:
+                if cursor is not None:
+                    cursor.close()
+        return results[0]
+
+    def create_cell_markers_bulk(self, markers: List[str]) -> List[int]:
+        """The ids of the markers (in the same order), adding those that are not already there with a single call."""
+        cursor = None
+        with self.connection() as conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute('CALL create_cell_markers_bulk_sp(%s::varchar[], %s::int[])', (markers, []))
+                results = cursor.fetchone()
+                conn.commit()
+                logger.info(f'create_cell_markers_bulk: {len(markers)} markers')
+            except (Exception, psycopg2.DatabaseError) as e:
+                conn.rollback()
+                logger.error(f'Exception Type causing rollback: {e.__class__.__name__}: {e}')
+                raise e
+            finally:
+                if cursor is not None:
+                    cursor.close()
+        return results[0] if results[0] is not None else []
+
+    def insert_annotation_details(self, cursor, details: List[tuple]) -> int:
+        """Insert the (cell_type_name, obo_ontology_id_uri, ontology_id, markers) of each of the details, with their
+        markers and the links to them, using the cursor (without committing). Details whose cell_type_name is already
+        in cell_annotation_details are left as they are. Returns how many were inserted.
+        """
+        # The markers are flattened into a (cell_type_name, marker) pair for each link...
+        cursor.execute('CALL create_annotation_details_bulk_sp('
+                       '%s::varchar[], %s::varchar[], %s::varchar[], %s::varchar[], %s::varchar[], %s)',
+                       ([detail[0] for detail in details], [detail[1] for detail in details],
+                        [detail[2] for detail in details],
+                        [detail[0] for detail in details for _ in detail[3]],
+                        [marker for detail in details for marker in detail[3]],
+                        0))
+        return cursor.fetchone()[0]
+
+    def create_annotation_details_bulk(self, details: List[tuple]) -> int:
+        """As insert_annotation_details() in a transaction of its own. Returns how many were inserted."""
+        cursor = None
+        with self.connection() as conn:
+            try:
+                cursor = conn.cursor()
+                inserted: int = self.insert_annotation_details(cursor, details)
+                conn.commit()
+                logger.info(f'create_annotation_details_bulk: {inserted} of {len(details)} inserted')
+            except (Exception, psycopg2.DatabaseError) as e:
+                conn.rollback()
+                logger.error(f'Exception Type causing rollback: {e.__class__.__name__}: {e}')
+                raise e
+            finally:
+                if cursor is not None:
+                    cursor.close()
+        return inserted
+
+    def add_cell_type_counts(self, sample_uuid: str, cell_type_names: List[str], cell_type_counts: List[int]) -> int:
+        """Set the counts of the cell types (by name) of the sample with a single call, adding together those of a
+        name given more than once and ignoring unknown names. Returns how many rows were added or changed.
+        """
+        cursor = None
+        with self.connection() as conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute('CALL add_cell_type_counts_bulk_sp(%s, %s::varchar[], %s::bigint[], %s)',
+                               (sample_uuid, cell_type_names, cell_type_counts, 0))
+                results = cursor.fetchone()
+                conn.commit()
+                logger.info(f'add_cell_type_counts({sample_uuid}): {results[0]} of {len(cell_type_names)} changed')
+            except (Exception, psycopg2.DatabaseError) as e:
+                conn.rollback()
+                logger.error(f'Exception Type causing rollback: {e.__class__.__name__}: {e}')
+                raise e
+            finally:
+                if cursor is not None:
+                    cursor.close()
         return results[0]
 
     def dump_anotation_detail_of_cell_type_name(self, cell_type_name: str) -> List:
@@ -116,58 +462,137 @@ class PostgresqlManager(object):
             " LEFT JOIN cell_marker AS cm ON cadm.cell_marker_id = cm.id" \
             " WHERE cad.cell_type_name = %(cell_type_name)s" \
             " GROUP BY cad.cell_type_name, cad.obo_ontology_id_uri, cad.ontology_id"
-        try:
-            cursor = self.conn.cursor()
-            cursor.execute(sql, {
-                'cell_type_name': cell_type_name
-            })
-            data = cursor.fetchall()
-            logger.info(f'Returned {len(data)} rows')
-        except (Exception, psycopg2.DatabaseError, psycopg2.errors.UniqueViolation) as e:
-            self.conn.rollback()
-            logger.error(f'Exception Type causing rollback: {e.__class__.__name__}: {e}')
-        finally:
-            if cursor is not None:
-                cursor.close()
+        cursor = None
+        with self.connection() as conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute(sql, {
+                    'cell_type_name': cell_type_name
+                })
+                data = cursor.fetchall()
+                logger.info(f'Returned {len(data)} rows')
+            except (Exception, psycopg2.DatabaseError, psycopg2.errors.UniqueViolation) as e:
+                conn.rollback()
+                logger.error(f'Exception Type causing rollback: {e.__class__.__name__}: {e}')
+            finally:
+                if cursor is not None:
+                    cursor.close()
         return data[0]
 
     def select(self, query: str, vars=None) -> List[int]:
         data: List[int] = None
-        try:
-            cursor = self.conn.cursor()
-            # https://www.psycopg.org/docs/usage.html#query-parameters
-            cursor.execute(query, vars)
-            all: list = cursor.fetchall()
-            #import pdb; pdb.set_trace();
-            data = [row[0] for row in all]
-            logger.info(f'Returned {len(data)} rows')
-        except (Exception, psycopg2.DatabaseError) as e:
-            logger.error(f'Exception Type: {e.__class__.__name__}: {e}')
-        finally:
-            if cursor is not None:
-                cursor.close()
+        cursor = None
+        with self.connection() as conn:
+            try:
+                cursor = conn.cursor()
+                # https://www.psycopg.org/docs/usage.html#query-parameters
+                cursor.execute(query, vars)
+                all: list = cursor.fetchall()
+                #import pdb; pdb.set_trace();
+                data = [row[0] for row in all]
+                logger.info(f'Returned {len(data)} rows')
+            except (Exception, psycopg2.DatabaseError) as e:
+                logger.error(f'Exception Type: {e.__class__.__name__}: {e}')
+            finally:
+                if cursor is not None:
+                    cursor.close()
         return data
 
-    def select_all(self, query: str, vars=None) -> list:
+    # Like select() but for a PreparedStatement.
+    def select_prepared(self, statement: PreparedStatement, vars: tuple = ()) -> List:
+        data: List = None
+        cursor = None
+        with self.connection() as conn:
+            try:
+                cursor = conn.cursor()
+                self.execute_prepared(cursor, statement, vars)
+                data = [row[0] for row in cursor.fetchall()]
+                logger.info(f'Returned {len(data)} rows')
+            except (Exception, psycopg2.DatabaseError) as e:
+                logger.error(f'Exception Type: {e.__class__.__name__}: {e}')
+            finally:
+                if cursor is not None:
+                    cursor.close()
+        return data
+
+    # Like select_all() but for a PreparedStatement.
+    def select_all_prepared(self, statement: PreparedStatement, vars: tuple = ()) -> list:
         all: list = None
+        cursor = None
+        with self.connection() as conn:
+            try:
+                cursor = conn.cursor()
+                self.execute_prepared(cursor, statement, vars)
+                all = cursor.fetchall()
+                logger.info(f'Returned {len(all)} rows')
+            except (Exception, psycopg2.DatabaseError) as e:
+                logger.error(f'Exception Type: {e.__class__.__name__}: {e}')
+            finally:
+                if cursor is not None:
+                    cursor.close()
+        return all
+
+    def iter_select(self, query: str, vars=None, itersize: int = None) -> Iterator[tuple]:
+        """Yield the rows of the query from a named (server side) cursor, 'itersize' rows being fetched at a time,
+        so that all of them are never held in memory at once. The connection is borrowed (apart from any that the
+        thread holds) until the rows are exhausted or the generator is closed.
+        """
+        conn = self.pool.getconn()
+        cursor = None
         try:
-            cursor = self.conn.cursor()
+            cursor = conn.cursor(name='iter_select')
+            cursor.itersize = itersize if itersize is not None else self.stream_itersize
             cursor.execute(query, vars)
-            all: list = cursor.fetchall()
-            logger.info(f'Returned {len(all)} rows')
-        except (Exception, psycopg2.DatabaseError) as e:
-            logger.error(f'Exception Type: {e.__class__.__name__}: {e}')
+            for row in cursor:
+                yield row
         finally:
-            if cursor is not None:
-                cursor.close()
+            try:
+                if cursor is not None:
+                    cursor.close()
+            except (Exception, psycopg2.DatabaseError) as e:
+                logger.error(f'iter_select: closing the cursor: {e.__class__.__name__}: {e}')
+            self.pool.putconn(conn)
+
+    def iter_prepared(self, statement: PreparedStatement, vars: tuple = (), itersize: int = None) -> Iterator[tuple]:
+        return self.iter_select(statement.cursor_sql, statement.cursor_vars(vars), itersize)
+
+    def explain_prepared(self, statement: PreparedStatement, vars: tuple = (), analyze: bool = False) -> List[str]:
+        """The lines of the query plan that EXECUTE of the statement uses."""
+        explain: str = 'EXPLAIN (ANALYZE, BUFFERS) ' if analyze else 'EXPLAIN '
+        cursor = None
+        with self.connection() as conn:
+            try:
+                cursor = conn.cursor()
+                self.prepare(cursor, statement)
+                cursor.execute(explain + statement.execute_sql, vars)
+                return [row[0] for row in cursor.fetchall()]
+            finally:
+                if cursor is not None:
+                    cursor.close()
+
+    def select_all(self, query: str, vars=None) -> list:
+        all: list = None
+        cursor = None
+        with self.connection() as conn:
+            try:
+                cursor = conn.cursor()
+                cursor.execute(query, vars)
+                all: list = cursor.fetchall()
+                logger.info(f'Returned {len(all)} rows')
+            except (Exception, psycopg2.DatabaseError) as e:
+                logger.error(f'Exception Type: {e.__class__.__name__}: {e}')
+            finally:
+                if cursor is not None:
+                    cursor.close()
         return all
 
     def execute(self, sql: str):
         logger.info('Erasing the database...')
+        cursor = None
         try:
             cursor = self.conn.cursor()
             cursor.execute(sql)
         finally:
             if cursor is not None:
                 cursor.close()
-            logger.info('Database erasure is completed...')
\ No newline at end of file
+            logger.info('Database erasure is completed...')
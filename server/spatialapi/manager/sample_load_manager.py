@@ -1,7 +1,9 @@
 import logging
+from typing import List
 from psycopg2 import DatabaseError
 from psycopg2.errors import UniqueViolation, NotNullViolation
 
+from spatialapi.manager.manager_owner import ManagerOwner
 from spatialapi.manager.neo4j_manager import Neo4jManager
 from spatialapi.manager.postgresql_manager import PostgresqlManager
 from spatialapi.manager.spatial_manager import SpatialManager
@@ -10,51 +12,92 @@ from spatialapi.manager.spatial_placement_manager import SpatialPlacementExcepti
 logger = logging.getLogger(__name__)
 
 
-class SampleLoadManager(object):
+class SampleLoadManager(ManagerOwner):
 
-    def __init__(self, config):
-        self.neo4j_manager = Neo4jManager(config)
-        self.postgresql_manager = PostgresqlManager(config)
-        self.spatial_manager = SpatialManager(config)
+    def __init__(self, config,
+                 neo4j_manager: Neo4jManager = None,
+                 postgresql_manager: PostgresqlManager = None,
+                 spatial_manager: SpatialManager = None):
+        self.neo4j_manager = self.shared_or_own(neo4j_manager, lambda: Neo4jManager(config))
+        self.postgresql_manager = self.shared_or_own(postgresql_manager, lambda: PostgresqlManager(config))
+        self.spatial_manager = self.shared_or_own(spatial_manager, lambda: SpatialManager(config))
+
+        spatial_config = config['spatial']
+        self.batch_size: int = spatial_config.getint('UpsertBatchSize', fallback=100)
 
     def close(self):
         logger.info(f'SampleLoadManager: Closing')
-        self.neo4j_manager.close()
-        self.postgresql_manager.close()
-        self.spatial_manager.close()
+        self.close_owned_managers()
+
+    def create_sample_rows(self, rec: dict) -> List[tuple]:
+        """The 'sample' table rows for the rec, one placed relative to the organ and
+        (if the placement service can place it) one placed relative to the body.
+        """
+        rows: List[tuple] = [self.spatial_manager.create_sample_rec_values(rec['organ']['code'], rec)]
+        # NOTE: This needs to be run on prod because of interaction with Indiana code...
+        try:
+            rows.append(self.spatial_manager.create_sample_rec_values_placement_relative_to_body(rec))
+        except SpatialPlacementException:
+            logger.error(f'An error occurred while determining placing the sample rui location within the body.')
+        return rows
+
+    def upsert_sample_rows(self, cursor, sample_uuids: List[str], rows: List[tuple]) -> None:
+        self.postgresql_manager.execute_prepared(cursor, self.spatial_manager.cell_types_delete_statement,
+                                                 (sample_uuids,))
+        self.postgresql_manager.execute_prepared(cursor, self.spatial_manager.sample_delete_statement,
+                                                 (sample_uuids,))
+        if len(rows) == 0:
+            return
+        # One EXECUTE of the prepared upsert per row, all of them sent to the server together...
+        values: List[tuple] = self.spatial_manager.create_sample_rows_values(rows)
+        self.postgresql_manager.execute_prepared_batch(cursor, self.spatial_manager.sample_upsert_statement,
+                                                       values, page_size=len(values))
 
     # NOTE: This does not handle cell_type_counts
-    def insert_sample_data(self, rec: dict) -> None:
+    def insert_sample_data(self, rec: dict) -> bool:
         try:
-            cursor = self.postgresql_manager.new_cursor()
-            sample_uuid: str = rec['sample']['uuid']
-
-            # This also deletes the rows in 'cell_types' that contain 'sample_uuid' because
-            # of the REFERENCES sample (sample_uuid) ON DELETE CASCADE
-            delete_existing_cell_type_data: str =\
-                f"DELETE FROM cell_types WHERE sample_uuid='{sample_uuid}';"
-            cursor.execute(delete_existing_cell_type_data)
-            delete_existing_sample_data: str =\
-                f"DELETE FROM sample WHERE sample_uuid='{sample_uuid}';"
-            cursor.execute(delete_existing_sample_data)
-
-            sql_upsert_placement_relative_to_organ_code: str = \
-                self.spatial_manager.create_sample_rec_sql_upsert(rec['organ']['code'], rec)
-            cursor.execute(sql_upsert_placement_relative_to_organ_code)
-
-            # NOTE: This needs to be run on prod because of interaction with Indiana code...
-            try:
-                sql_upsert_placement_relative_to_body: str = \
-                    self.spatial_manager.create_sample_rec_sql_upsert_placement_relative_to_body(rec)
-                cursor.execute(sql_upsert_placement_relative_to_body)
-            except SpatialPlacementException:
-                logger.error(f'An error occurred while determining placing the sample rui location within the body.')
+            rows: List[tuple] = self.create_sample_rows(rec)
+        except Exception as e:
+            logger.error(f'insert_sample_data: skipping rec: {e.__class__.__name__}: {e}')
+            return False
+        return self.insert_sample_rows([rec['sample']['uuid']], rows)
 
+    def insert_sample_rows(self, sample_uuids: List[str], rows: List[tuple]) -> bool:
+        """Replace the samples with the rows in a single transaction."""
+        cursor = None
+        try:
+            cursor = self.postgresql_manager.new_cursor()
+            self.upsert_sample_rows(cursor, sample_uuids, rows)
             self.postgresql_manager.commit()
-            logger.info("All work committed!")
+            logger.info(f"All work committed for {len(sample_uuids)} samples!")
         except (Exception, DatabaseError, UniqueViolation, NotNullViolation) as e:
             self.postgresql_manager.rollback()
             logger.error(f'Exception Type causing rollback: {e.__class__.__name__}: {e}')
+            return False
         finally:
             if cursor is not None:
                 cursor.close()
+        self.samples_written(sample_uuids)
+        return True
+
+    def samples_written(self, sample_uuids: List[str]) -> None:
+        """Tell the caches, index and views that the samples have changed. Since the samples are already committed,
+        a failure here is only logged (the caches then catch up within their TtlSeconds).
+        """
+        try:
+            generation: int = self.spatial_manager.search_cache_manager.bump_generation()
+            self.spatial_manager.spatial_index_manager.update_samples(sample_uuids, generation)
+            self.spatial_manager.cell_type_search_manager.request_refresh()
+        except Exception as e:
+            logger.error(f'samples_written: {e.__class__.__name__}: {e}')
+
+    def insert_sample_rows_batch(self, rec_rows: dict) -> List[str]:
+        """Write the rows of many samples ({sample_uuid: rows from create_sample_rows()}) in one transaction.
+        If that fails, fall back to a transaction per sample. Returns the sample_uuids that were written.
+        """
+        rows: List[tuple] = [row for sample_rows in rec_rows.values() for row in sample_rows]
+        if self.insert_sample_rows(list(rec_rows.keys()), rows):
+            return list(rec_rows.keys())
+        logger.error(f'insert_sample_rows_batch: retrying the {len(rec_rows)} samples of the batch one at a time')
+        return [sample_uuid for sample_uuid, sample_rows in rec_rows.items()
+                if self.insert_sample_rows([sample_uuid], sample_rows)]
@@ -0,0 +1,155 @@
+import logging
+import queue
+import threading
+import time
+from typing import Iterable, List
+
+from spatialapi.manager.cell_type_count_manager import CellTypeCountManager
+from spatialapi.manager.manager_owner import ManagerOwner
+from spatialapi.manager.sample_load_manager import SampleLoadManager
+
+logger = logging.getLogger(__name__)
+
+# Put on a stage's queue (once per worker) to tell its workers that nothing more is coming...
+END_OF_STAGE = object()
+
+
+class SampleReindexManager(ManagerOwner):
+    """Reindexes samples through three stages joined by bounded queues, each stage with its own workers:
+    placement (building the 'sample' rows, which calls the remote placement service),
+    PostGIS writes (batched upserts through SampleLoadManager), and
+    ingest-api (asking it to begin extracting the cell type counts of the samples that were written).
+    The managers, and so the pooled connections and HTTP sessions, are shared by all of the records.
+    """
+
+    def __init__(self, config,
+                 sample_load_manager: SampleLoadManager = None,
+                 cell_type_count_manager: CellTypeCountManager = None):
+        self.sample_load_manager = self.shared_or_own(sample_load_manager, lambda: SampleLoadManager(config))
+        self.cell_type_count_manager = \
+            self.shared_or_own(cell_type_count_manager, lambda: CellTypeCountManager(config))
+
+        self.placement_workers: int = config.getint('reindex', 'PlacementWorkers', fallback=4)
+        self.write_workers: int = config.getint('reindex', 'WriteWorkers', fallback=2)
+        self.ingest_workers: int = config.getint('reindex', 'IngestWorkers', fallback=2)
+        self.queue_size: int = config.getint('reindex', 'QueueSize', fallback=200)
+        self.batch_size: int = self.sample_load_manager.batch_size
+        logger.info(f'SampleReindexManager: placement workers: {self.placement_workers};'
+                    f' write workers: {self.write_workers}; ingest workers: {self.ingest_workers};'
+                    f' queue size: {self.queue_size}; batch size: {self.batch_size}')
+
+        self.stats_lock = threading.Lock()
+
+    def close(self):
+        logger.info(f'SampleReindexManager: Closing')
+        self.close_owned_managers()
+
+    def count(self, stats: dict, key: str, n: int = 1) -> None:
+        with self.stats_lock:
+            stats[key] += n
+
+    def placement_worker(self, in_queue: queue.Queue, out_queue: queue.Queue, stats: dict) -> None:
+        while True:
+            rec = in_queue.get()
+            if rec is END_OF_STAGE:
+                return
+            try:
+                sample_uuid: str = rec['sample']['uuid']
+                out_queue.put((sample_uuid, self.sample_load_manager.create_sample_rows(rec)))
+                self.count(stats, 'placed')
+            except Exception as e:
+                self.count(stats, 'placement_errors')
+                logger.error(f'placement_worker: Exception Type: {e.__class__.__name__}: {e}')
+
+    def write_worker(self, in_queue: queue.Queue, out_queue: queue.Queue, stats: dict) -> None:
+        done: bool = False
+        while not done:
+            # Wait for one, then take whatever else is already waiting (up to a batch) to write together...
+            rec_rows: dict = {}
+            item = in_queue.get()
+            while item is not END_OF_STAGE:
+                sample_uuid, rows = item
+                rec_rows[sample_uuid] = rows
+                if len(rec_rows) >= self.batch_size:
+                    break
+                try:
+                    item = in_queue.get_nowait()
+                except queue.Empty:
+                    break
+            done = item is END_OF_STAGE
+            if len(rec_rows) == 0:
+                continue
+            try:
+                written: List[str] = self.sample_load_manager.insert_sample_rows_batch(rec_rows)
+                self.count(stats, 'written', len(written))
+                self.count(stats, 'write_errors', len(rec_rows) - len(written))
+                for sample_uuid in written:
+                    out_queue.put(sample_uuid)
+            except Exception as e:
+                self.count(stats, 'write_errors', len(rec_rows))
+                logger.error(f'write_worker: Exception Type: {e.__class__.__name__}: {e}')
+        self.sample_load_manager.postgresql_manager.release()
+
+    def ingest_worker(self, in_queue: queue.Queue, bearer_token: str, stats: dict) -> None:
+        while True:
+            sample_uuid = in_queue.get()
+            if sample_uuid is END_OF_STAGE:
+                break
+            try:
+                # Tells Ingest-api to begin processing cell_type_count data...
+                self.cell_type_count_manager.begin_extract_cell_type_counts_for_sample_uuid(bearer_token, sample_uuid)
+                self.count(stats, 'ingest_requested')
+            except Exception as e:
+                # This includes the HTTPException from abort() when ingest-api refuses the request.
+                self.count(stats, 'ingest_errors')
+                logger.error(f'ingest_worker: sample_uuid: {sample_uuid}; Exception Type: {e.__class__.__name__}: {e}')
+        self.cell_type_count_manager.postgresql_manager.release()
+
+    def start_stage(self, name: str, workers: int, target, args: list) -> List[threading.Thread]:
+        threads: List[threading.Thread] = []
+        for i in range(workers):
+            thread = threading.Thread(target=target, args=args, name=f'Reindex {name} {i}')
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        return threads
+
+    def finish_stage(self, threads: List[threading.Thread], next_queue: queue.Queue, next_workers: int) -> None:
+        for thread in threads:
+            thread.join()
+        for _ in range(next_workers):
+            next_queue.put(END_OF_STAGE)
+
+    def reindex(self, recs: Iterable[dict], bearer_token: str) -> dict:
+        """Run the recs through the pipeline, returning once all of the stages have finished."""
+        start_time: float = time.time()
+        stats: dict = {
+            'recs': 0, 'placed': 0, 'placement_errors': 0, 'written': 0, 'write_errors': 0,
+            'ingest_requested': 0, 'ingest_errors': 0
+        }
+        placement_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        write_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+        ingest_queue: queue.Queue = queue.Queue(maxsize=self.queue_size)
+
+        placement_threads = self.start_stage('placement', self.placement_workers, self.placement_worker,
+                                             [placement_queue, write_queue, stats])
+        write_threads = self.start_stage('write', self.write_workers, self.write_worker,
+                                         [write_queue, ingest_queue, stats])
+        ingest_threads = self.start_stage('ingest', self.ingest_workers, self.ingest_worker,
+                                          [ingest_queue, bearer_token, stats])
+
+        # Blocks when the placement workers fall behind, so the recs never pile up in memory...
+        for rec in recs:
+            placement_queue.put(rec)
+            stats['recs'] += 1
+        for _ in range(self.placement_workers):
+            placement_queue.put(END_OF_STAGE)
+
+        self.finish_stage(placement_threads, write_queue, self.write_workers)
+        self.finish_stage(write_threads, ingest_queue, self.ingest_workers)
+        for thread in ingest_threads:
+            thread.join()
+
+        stats['seconds'] = round(time.time() - start_time, 3)
+        logger.info(f'SampleReindexManager: reindex finished: {stats}')
+        return stats
@@ -0,0 +1,128 @@
+import logging
+import threading
+import time
+import psycopg2
+
+from spatialapi.manager.postgresql_manager import PostgresqlManager
+from spatialapi.utils.lru_cache import LruCache
+
+logger = logging.getLogger(__name__)
+
+# The search results most recently used by this process, keyed by (data generation, search, parameters)...
+search_lru: LruCache = None
+search_lru_lock = threading.Lock()
+# The things that the searches look up first (e.g. the rui_location of a hubmap_id), keyed the same way.
+# Unlike the search results, these are cached when they are not found (None) too.
+lookup_lru: LruCache = None
+
+# The data generation is the 'data_generation_seq' sequence, which is advanced whenever the searchable data changes.
+# Since the writes may be made by another (uwsgi worker) process, each process reads it again every
+# GenerationCheckSeconds; until then it uses the last value read (or the one it set itself).
+generation_lock = threading.Lock()
+generation: int = None
+generation_checked_time: float = 0.0
+
+
+class SearchCacheManager(object):
+    """An LRU/TTL cache of the results of the SpatialManager searches.
+    Entries are keyed on the data generation, so once the data changes they are never hit again.
+    """
+
+    def __init__(self, config):
+        self.size: int = config.getint('searchCache', 'Size', fallback=10000)
+        self.ttl_seconds: float = config.getfloat('searchCache', 'TtlSeconds', fallback=300)
+        self.generation_check_seconds: float = config.getfloat('searchCache', 'GenerationCheckSeconds', fallback=5)
+        self.lookup_size: int = config.getint('searchCache', 'LookupSize', fallback=10000)
+        logger.info(f'SearchCacheManager: Size: {self.size}; TtlSeconds: {self.ttl_seconds};'
+                    f' GenerationCheckSeconds: {self.generation_check_seconds}; LookupSize: {self.lookup_size}')
+
+        global search_lru, lookup_lru
+        with search_lru_lock:
+            if search_lru is None:
+                search_lru = LruCache(self.size, self.ttl_seconds)
+            if lookup_lru is None:
+                lookup_lru = LruCache(self.lookup_size, self.ttl_seconds)
+        self.postgresql_manager = PostgresqlManager(config)
+
+    def close(self) -> None:
+        logger.info(f'SearchCacheManager: Closing')
+        self.postgresql_manager.close()
+
+    def select_generation(self) -> int:
+        # Until nextval() is first called the sequence reads its start value (1), which the first bump also returns...
+        rows: list = self.postgresql_manager.select_all(
+            'SELECT CASE WHEN is_called THEN last_value ELSE 0 END FROM data_generation_seq;')
+        if rows is None or len(rows) == 0:
+            return None
+        return rows[0][0]
+
+    def current_generation(self) -> int:
+        """The data generation, or None if it is not known (in which case nothing is cached)."""
+        global generation, generation_checked_time
+        with generation_lock:
+            if time.time() - generation_checked_time < self.generation_check_seconds:
+                return generation
+        selected_generation: int = self.select_generation()
+        with generation_lock:
+            if selected_generation != generation:
+                logger.info(f'SearchCacheManager: data generation changed from {generation} to {selected_generation}')
+                search_lru.clear()
+                lookup_lru.clear()
+            generation = selected_generation
+            generation_checked_time = time.time()
+            return generation
+
+    def bump_generation(self) -> int:
+        """Call after committing a change to the data that the searches return. Returns the new generation."""
+        global generation, generation_checked_time
+        try:
+            with self.postgresql_manager.connection() as conn:
+                cursor = conn.cursor()
+                try:
+                    cursor.execute("SELECT nextval('data_generation_seq');")
+                    new_generation: int = cursor.fetchone()[0]
+                finally:
+                    cursor.close()
+        except (Exception, psycopg2.DatabaseError) as e:
+            # Other processes will still see the change within the TtlSeconds...
+            logger.error(f'SearchCacheManager: bump_generation failed: {e.__class__.__name__}: {e}')
+            new_generation = None
+        with generation_lock:
+            search_lru.clear()
+            lookup_lru.clear()
+            generation = new_generation
+            generation_checked_time = time.time()
+        return new_generation
+
+    def search(self, key: tuple, find):
+        """The cached result for the key, otherwise the result of find() (which is cached unless it is None)."""
+        search_generation: int = self.current_generation()
+        if search_generation is None:
+            return find()
+        results = search_lru.get((search_generation,) + key)
+        if results is not LruCache.MISSING:
+            return list(results)
+        results = find()
+        if results is not None:
+            search_lru.put((search_generation,) + key, tuple(results))
+        return results
+
+    def lookup(self, key: tuple, find):
+        """The cached result for the key, otherwise the result of find() which is cached even if it is None
+        (nothing found). Since it is not copied, the result must not be changed.
+        """
+        lookup_generation: int = self.current_generation()
+        if lookup_generation is None:
+            return find()
+        result = lookup_lru.get((lookup_generation,) + key)
+        if result is LruCache.MISSING:
+            result = find()
+            lookup_lru.put((lookup_generation,) + key, result)
+        return result
+
+    def stats(self) -> dict:
+        stats: dict = search_lru.stats()
+        stats['lookup'] = lookup_lru.stats()
+        with generation_lock:
+            stats['generation'] = generation
+        return stats
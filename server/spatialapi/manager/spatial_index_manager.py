@@ -0,0 +1,193 @@
+import logging
+import threading
+import json
+from typing import Dict, List
+
+from spatialapi.manager.postgresql_manager import PostgresqlManager
+from spatialapi.manager.search_cache_manager import SearchCacheManager
+from spatialapi.utils.sample_spatial_index import SampleSpatialIndex
+
+logger = logging.getLogger(__name__)
+
+# The samples of each target ({relative_spatial_entry_iri: {sample_uuid: (id, sample_hubmap_id, rui_location)}}),
+# and their SampleSpatialIndex, as of the data generation 'index_generation' (see SearchCacheManager).
+# These are shared by the whole (uwsgi worker) process, and are replaced rather than changed.
+index_lock = threading.Lock()
+index_samples: Dict[str, dict] = {}
+indexes: Dict[str, SampleSpatialIndex] = {}
+index_generation: int = None
+loading: bool = False
+
+# Held while the indexes are being (re)built, so that only one is ever being built at a time.
+build_lock = threading.Lock()
+# The samples written by this process at data generations after the next one the indexes need ({generation:
+# sample_uuids}), e.g. when batches written together finish out of order. Held with build_lock.
+pending_updates: Dict[int, List[str]] = {}
+
+
+class SpatialIndexManager(object):
+    """An in process index of the sample geometries for the radius searches, see SampleSpatialIndex.
+    It is only used while it is current (of the same data generation as the database), and until then the
+    searches go to PostGIS. When this process writes samples it rereads only those, and changes only their cells in
+    the grids of their targets (see SampleSpatialIndex.updated()), one data generation after another. Otherwise
+    (another process having changed the data) all of the samples are read again in the background.
+    """
+
+    def __init__(self, config, search_cache_manager: SearchCacheManager):
+        self.enabled: bool = config.getboolean('spatialIndex', 'Enabled', fallback=False)
+        self.table: str = config['spatial'].get('Table')
+        logger.info(f'SpatialIndexManager: Enabled: {self.enabled}')
+        self.search_cache_manager = search_cache_manager
+        self.postgresql_manager = PostgresqlManager(config)
+        if self.enabled:
+            self.start_load()
+
+    def close(self) -> None:
+        logger.info(f'SpatialIndexManager: Closing')
+        self.postgresql_manager.close()
+
+    def index(self, relative_spatial_entry_iri: str) -> SampleSpatialIndex:
+        """The index of the samples of the target if it is current, otherwise None (and it is brought up to date)."""
+        if not self.enabled:
+            return None
+        generation: int = self.search_cache_manager.current_generation()
+        with index_lock:
+            if generation is not None and generation == index_generation:
+                return indexes.get(relative_spatial_entry_iri, SampleSpatialIndex([], [], []))
+        self.start_load()
+        return None
+
+    def select_samples(self, sample_uuids: List[str] = None) -> Dict[str, dict]:
+        """The samples (all, or those with the sample_uuids) keyed as 'index_samples' is, or None on failure."""
+        sql: str = f"SELECT relative_spatial_entry_iri, sample_uuid, id, sample_hubmap_id, sample_rui_location" \
+                   f" FROM {self.table}"
+        if sample_uuids is None:
+            rows: list = self.postgresql_manager.select_all(sql + ';')
+        else:
+            rows: list = self.postgresql_manager.select_all(sql + ' WHERE sample_uuid = ANY(%s);', (list(sample_uuids),))
+        if rows is None:
+            return None
+        samples: Dict[str, dict] = {}
+        for row in rows:
+            samples.setdefault(row[0], {})[row[1]] = (row[2], row[3], json.loads(row[4]))
+        return samples
+
+    def create_index(self, samples: dict) -> SampleSpatialIndex:
+        values: list = list(samples.values())
+        return SampleSpatialIndex([v[0] for v in values], [v[1] for v in values], [v[2] for v in values])
+
+    def start_load(self) -> None:
+        global loading
+        with index_lock:
+            if loading:
+                return
+            loading = True
+        thread = threading.Thread(target=self.load, name='Spatial Index Load Thread')
+        thread.daemon = True
+        thread.start()
+
+    def load(self) -> None:
+        """Read all of the samples and index them."""
+        global index_samples, indexes, index_generation, loading
+        try:
+            with build_lock:
+                # Read before the samples are, so that a write made while they are being read leaves it stale...
+                generation: int = self.search_cache_manager.select_generation()
+                with index_lock:
+                    if generation is None or generation == index_generation:
+                        return
+                samples: Dict[str, dict] = self.select_samples()
+                if samples is None:
+                    return
+                new_indexes: Dict[str, SampleSpatialIndex] = \
+                    {target: self.create_index(target_samples) for target, target_samples in samples.items()}
+                with index_lock:
+                    index_samples = samples
+                    indexes = new_indexes
+                    index_generation = generation
+                logger.info(f'SpatialIndexManager: indexed generation {generation}: '
+                            f'{ {target: len(index) for target, index in new_indexes.items()} }')
+        except Exception as e:
+            logger.error(f'SpatialIndexManager: load failed: {e.__class__.__name__}: {e}')
+        finally:
+            with index_lock:
+                loading = False
+
+    def update_samples(self, sample_uuids: List[str], generation: int) -> None:
+        """Call after the samples have been written (and the data generation advanced to 'generation') by this
+        process. Only those samples are read again, and only their cells of the indexes changed. The changes are
+        made in the order of their generations, waiting for any before them that are still being written.
+        """
+        if not self.enabled:
+            return
+        if generation is None:
+            self.start_load()
+            return
+        with build_lock:
+            pending_updates[generation] = list(sample_uuids)
+            while True:
+                with index_lock:
+                    current_generation: int = index_generation
+                if current_generation is None:
+                    # The indexes have not been built yet, and will include these when they are...
+                    pending_updates.clear()
+                    self.start_load()
+                    return
+                for pending_generation in [g for g in pending_updates.keys() if g <= current_generation]:
+                    del pending_updates[pending_generation]
+                next_sample_uuids: List[str] = pending_updates.pop(current_generation + 1, None)
+                if next_sample_uuids is None:
+                    # Either there's nothing more, or a generation before them is still being written here or was
+                    # made by another process (in which case the next search finds the indexes stale and loads them)...
+                    return
+                if not self.apply_update(next_sample_uuids, current_generation + 1):
+                    pending_updates.clear()
+                    self.start_load()
+                    return
+
+    def apply_update(self, sample_uuids: List[str], generation: int) -> bool:
+        """Change the indexes (of the generation before) to those of the generation. Call holding build_lock."""
+        global index_samples, indexes, index_generation
+        samples: Dict[str, dict] = self.select_samples(sample_uuids)
+        if samples is None:
+            return False
+        with index_lock:
+            current_samples: Dict[str, dict] = index_samples
+            current_indexes: Dict[str, SampleSpatialIndex] = indexes
+        updated_sample_uuids: set = set(sample_uuids)
+        targets: set = set(samples.keys()) | \
+            {target for target, target_samples in current_samples.items()
+             if not updated_sample_uuids.isdisjoint(target_samples)}
+        changed_samples: Dict[str, dict] = {}
+        changed_indexes: Dict[str, SampleSpatialIndex] = {}
+        for target in targets:
+            target_samples: dict = current_samples.get(target, {})
+            removed_ids: List[int] = [sample[0] for sample_uuid, sample in target_samples.items()
+                                      if sample_uuid in updated_sample_uuids]
+            added: List[tuple] = list(samples.get(target, {}).values())
+            target_samples = {sample_uuid: sample for sample_uuid, sample in target_samples.items()
+                              if sample_uuid not in updated_sample_uuids}
+            target_samples.update(samples.get(target, {}))
+            changed_samples[target] = target_samples
+            index: SampleSpatialIndex = current_indexes.get(target)
+            if index is None or index.removed() + len(removed_ids) > len(target_samples):
+                # Once it holds more samples that have been taken out than are left, it is built again...
+                changed_indexes[target] = self.create_index(target_samples)
+            else:
+                changed_indexes[target] = index.updated(removed_ids,
+                                                        [a[0] for a in added], [a[1] for a in added],
+                                                        [a[2] for a in added])
+        with index_lock:
+            index_samples = {**index_samples, **changed_samples}
+            indexes = {**indexes, **changed_indexes}
+            index_generation = generation
+        logger.info(f'SpatialIndexManager: reindexed {len(sample_uuids)} samples of {targets} at generation {generation}')
+        return True
+
+    def stats(self) -> dict:
+        with index_lock:
+            return {
+                'enabled': self.enabled,
+                'generation': index_generation,
+                'samples': {target: len(index) for target, index in indexes.items()}
+            }
@@ -1,15 +1,22 @@
 import logging
 from http import HTTPStatus
-from typing import List
+from typing import Dict, Iterator, List
 from flask import abort
 import json
 import configparser
 import copy
+import itertools
+from psycopg2 import Binary
 
+from spatialapi.manager.cell_type_search_manager import CellTypeSearchManager
+from spatialapi.manager.manager_owner import ManagerOwner
 from spatialapi.manager.neo4j_manager import Neo4jManager
-from spatialapi.manager.postgresql_manager import PostgresqlManager
+from spatialapi.manager.postgresql_manager import PostgresqlManager, PreparedStatement
+from spatialapi.manager.search_cache_manager import SearchCacheManager
+from spatialapi.manager.spatial_index_manager import SpatialIndexManager
 from spatialapi.manager.spatial_placement_manager import SpatialPlacementManager, adjust_placement_target_if_necessary
 from spatialapi.utils import json_error
+from spatialapi.utils.sample_geometry import create_geometries_ewkb
 
 logger = logging.getLogger(__name__)
 
@@ -26,23 +33,39 @@ def _donor_sex_to_target_iri(donor_sex: str) -> str:
     return target_iri
 
 
-class SpatialManager(object):
+class SpatialManager(ManagerOwner):
     # TODO: Nothing is being done with units.
 
-    def __init__(self, config):
-        self.neo4j_manager = Neo4jManager(config)
-        self.postgresql_manager = PostgresqlManager(config)
-        self.spatial_placement_manager = SpatialPlacementManager(config)
+    def __init__(self, config,
+                 neo4j_manager: Neo4jManager = None,
+                 postgresql_manager: PostgresqlManager = None,
+                 spatial_placement_manager: SpatialPlacementManager = None,
+                 search_cache_manager: SearchCacheManager = None,
+                 spatial_index_manager: SpatialIndexManager = None,
+                 cell_type_search_manager: CellTypeSearchManager = None):
+        self.neo4j_manager = self.shared_or_own(neo4j_manager, lambda: Neo4jManager(config))
+        self.postgresql_manager = self.shared_or_own(postgresql_manager, lambda: PostgresqlManager(config))
+        self.spatial_placement_manager = \
+            self.shared_or_own(spatial_placement_manager, lambda: SpatialPlacementManager(config))
+        self.search_cache_manager = self.shared_or_own(search_cache_manager, lambda: SearchCacheManager(config))
+        self.spatial_index_manager = self.shared_or_own(
+            spatial_index_manager, lambda: SpatialIndexManager(config, self.search_cache_manager))
+        self.cell_type_search_manager = self.shared_or_own(
+            cell_type_search_manager, lambda: CellTypeSearchManager(config, self.search_cache_manager))
 
         spatial_config = config['spatial']
         self.table = spatial_config.get('Table')
         logger.info(f'{self.__class__.__name__}: Table: {self.table}')
+        self.point_search_batch_max: int = spatial_config.getint('PointSearchBatchMax', fallback=1000)
+        self.nearest_search_max: int = spatial_config.getint('NearestSearchMax', fallback=100)
+        self.nearest_search_candidate_factor: int = spatial_config.getint('NearestSearchCandidateFactor', fallback=4)
+        self.search_limit_max: int = spatial_config.getint('SearchLimitMax', fallback=10000)
+        self.cell_types_max: int = spatial_config.getint('CellTypesMax', fallback=20)
+        self.create_prepared_statements()
 
     def close(self):
         logger.info(f'SpatialManager: Closing')
-        self.neo4j_manager.close()
-        self.postgresql_manager.close()
-        self.spatial_placement_manager.close()
+        self.close_owned_managers()
 
     # Example from https://postgis.net/docs/ST_IsClosed.html
     # There is a winding order for surfaces: inside->clockwise, outside -> counterclockwise.
@@ -111,6 +134,9 @@ class SpatialManager(object):
 
     # The PostGRIS geometry should be constructed with the centroid of the object being at POINT(0,0,0)
     def create_geom_with_dimension(self, x: float, y: float, z: float) -> str:
+        return f"'{self.create_geom_wkt_with_dimension(x, y, z)}'"
+
+    def create_geom_wkt_with_dimension(self, x: float, y: float, z: float) -> str:
         # https://postgis.net/workshops/postgis-intro/3d.html
         # PolyhedralSurface - A 3D figure made exclusively of Polygons
         # POLYHEDRALSURFACE - A PolyhedralSurface is a contiguous collection of polygons, which share common boundary segments
@@ -121,14 +147,14 @@ class SpatialManager(object):
         # To represent a mesh surface in Postgres, we should use POLYHEDRALSURFACE.
         # This geometry is also a collection of polygons: they have to be "adjacent to each other",
         # AND they all have to be all "outside surfaces."
-        return f"'POLYHEDRALSURFACE Z(" \
+        return f"POLYHEDRALSURFACE Z(" \
                f"{self.create_XY_plane_at_Z_Front(x/2, y/2, z/2)}" \
                f",{self.create_XY_plane_at_Z_Back(x/2, y/2, z/2)}" \
                f",{self.create_YZ_plane_at_X_Left(x/2, y/2, z/2)}" \
                f",{self.create_YZ_plane_at_X_Right(x/2, y/2, z/2)}" \
                f",{self.create_XZ_plane_at_Y_Top(x/2, y/2, z/2)}" \
                f",{self.create_XZ_plane_at_Y_Bottom(x/2, y/2, z/2)}" \
-               f" )'"
+               f" )"
 
     # TODO: We are doing NOTHING with '*_units' or 'rotation_order' here...
     # NOTE: When closed surfaces are created with WKT, they are treated as areal rather than solid.
@@ -147,43 +173,209 @@ class SpatialManager(object):
                f" {placement['x_scaling']}, {placement['y_scaling']}, {placement['z_scaling']})," \
                f" {placement['x_translation']}, {placement['y_translation']}, {placement['z_translation']})"
 
-    def create_sample_rec_sql_upsert(self, target_iri: str, rec: dict) -> str:
-        organ_uuid: str = rec['organ']['uuid']
-        organ_code: str = rec['organ']['code']
-        donor_uuid: str = rec['donor']['uuid']
-        donor_sex: str = rec['donor']['sex']
-        sample_uuid: str = rec['sample']['uuid']
-        sample_hubmap_id: str = rec['sample']['hubmap_id']
-        sample_sample_category: str = rec['sample']['sample_category']
-        sample_last_modified_timestamp: int = rec['sample']['last_modified_timestamp']
-        sample_rui_location: str = json.dumps(rec['sample']['rui_location'])
-        sample_geom: str = self.create_geometry(rec['sample']['rui_location'])
-        return f"INSERT INTO {self.table}" \
-               " (organ_uuid, organ_code, donor_uuid, donor_sex, relative_spatial_entry_iri, sample_uuid," \
-               " sample_hubmap_id, sample_sample_category, sample_rui_location," \
-               " sample_last_modified_timestamp, sample_geom)" \
-               " VALUES (" \
-               f"'{organ_uuid}', '{organ_code}', '{donor_uuid}', '{donor_sex}', '{target_iri}', '{sample_uuid}'," \
-               f" '{sample_hubmap_id}', '{sample_sample_category}', '{sample_rui_location}'," \
-               f" {sample_last_modified_timestamp}, {sample_geom}" \
-               ")" \
-               " ON CONFLICT ON CONSTRAINT sample_relative_spatial_entry_sample_uuid_key DO UPDATE SET" \
-               f" organ_uuid = '{organ_uuid}', organ_code = '{organ_code}', donor_uuid = '{donor_uuid}'," \
-               f" donor_sex = '{donor_sex}', sample_hubmap_id = '{sample_hubmap_id}'," \
-               f" sample_sample_category = '{sample_sample_category}', sample_rui_location = '{sample_rui_location}'," \
-               f" sample_geom = {sample_geom}" \
-               " RETURNING id;"
-    
-    def create_sample_rec_sql_upsert_placement_relative_to_body(self, rec: dict) -> str:
+    # The same geometry as create_geometry(), but built by spatialapi.utils.sample_geometry from one affine
+    # matrix per sample and passed as a binary EWKB query parameter, see create_geometries_values().
+    sample_geom_sql: str = "ST_MakeSolid(ST_GeomFromEWKB(%s))"
+
+    def create_geometries_values(self, rui_locations: List[dict]) -> List[tuple]:
+        return [(Binary(ewkb),) for ewkb in create_geometries_ewkb(rui_locations)]
+
+    def create_geometry_values(self, rui_location: dict) -> tuple:
+        return self.create_geometries_values([rui_location])[0]
+
+    sample_columns: str = \
+        "organ_uuid, organ_code, donor_uuid, donor_sex, relative_spatial_entry_iri, sample_uuid," \
+        " sample_hubmap_id, sample_sample_category, sample_rui_location," \
+        " sample_last_modified_timestamp, sample_geom"
+
+    # A row of the 'sample' table (in the order of 'sample_columns') except that in place of the 'sample_geom'
+    # it has the rui_location that it is built from, see create_sample_rows_values().
+    def create_sample_rec_values(self, target_iri: str, rec: dict) -> tuple:
+        return (rec['organ']['uuid'], rec['organ']['code'], rec['donor']['uuid'], rec['donor']['sex'],
+                target_iri, rec['sample']['uuid'], rec['sample']['hubmap_id'], rec['sample']['sample_category'],
+                json.dumps(rec['sample']['rui_location']), rec['sample']['last_modified_timestamp'],
+                rec['sample']['rui_location'])
+
+    # The rows from create_sample_rec_values() with their geometries built all at once.
+    def create_sample_rows_values(self, rows: List[tuple]) -> List[tuple]:
+        geometries_values: List[tuple] = self.create_geometries_values([row[10] for row in rows])
+        return [row[:10] + geometry_values for row, geometry_values in zip(rows, geometries_values)]
+
+    def create_sample_rec_values_placement_relative_to_body(self, rec: dict) -> tuple:
         target_iri = _donor_sex_to_target_iri(rec['donor']['sex'].lower())
-        logger.debug(f"Creating sql upsert placement relative to body with target_iri: {target_iri}")
-        
+        logger.debug(f"Creating values placement relative to body with target_iri: {target_iri}")
+
         rec_new = copy.deepcopy(rec)
         adjust_placement_target_if_necessary(rec_new)
         rec_new['sample']['rui_location']['placement'] = \
             self.spatial_placement_manager.placement_relative_to_target(target_iri, rec['sample']['rui_location'])
-        logger.debug(f"Creating sql upsert placement relative to body with placement: {rec_new}")
-        return self.create_sample_rec_sql_upsert(target_iri, rec_new)
+        return self.create_sample_rec_values(target_iri, rec_new)
+
+    def create_prepared_statements(self) -> None:
+        """The statements used to load and search the samples, which are prepared once on each connection."""
+        # To be used with PostgresqlManager.execute_prepared_batch() and the rows from create_sample_rows_values().
+        self.sample_upsert_statement = PreparedStatement(
+            f'{self.table}_upsert',
+            f"INSERT INTO {self.table} ({self.sample_columns})"
+            " VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, ST_MakeSolid(ST_GeomFromEWKB($11)))"
+            " ON CONFLICT ON CONSTRAINT sample_relative_spatial_entry_sample_uuid_key DO UPDATE SET"
+            " organ_uuid = EXCLUDED.organ_uuid, organ_code = EXCLUDED.organ_code,"
+            " donor_uuid = EXCLUDED.donor_uuid, donor_sex = EXCLUDED.donor_sex,"
+            " sample_hubmap_id = EXCLUDED.sample_hubmap_id, sample_sample_category = EXCLUDED.sample_sample_category,"
+            " sample_rui_location = EXCLUDED.sample_rui_location,"
+            " sample_last_modified_timestamp = EXCLUDED.sample_last_modified_timestamp,"
+            " sample_geom = EXCLUDED.sample_geom",
+            ['text', 'text', 'text', 'text', 'text', 'text', 'text', 'text', 'text', 'bigint', 'bytea'])
+        self.sample_delete_statement = PreparedStatement(
+            f'{self.table}_delete',
+            f"DELETE FROM {self.table} WHERE sample_uuid = ANY($1)",
+            ['text[]'])
+        # This also deletes the rows in 'cell_types' that contain 'sample_uuid' because
+        # of the REFERENCES sample (sample_uuid) ON DELETE CASCADE
+        self.cell_types_delete_statement = PreparedStatement(
+            'cell_types_delete',
+            "DELETE FROM cell_types WHERE sample_uuid = ANY($1)",
+            ['text[]'])
+
+        # The searches first narrow the samples to those whose 3D bounding boxes (&&&) are within the radius,
+        # which is answered by the N-D GiST indexes, and only then measure the actual distances.
+        self.point_search_statement = PreparedStatement(
+            f'{self.table}_point_search',
+            f"SELECT sample_hubmap_id FROM {self.table}"
+            " WHERE relative_spatial_entry_iri = $1"
+            " AND sample_geom &&& ST_Expand(ST_MakePoint($2, $3, $4), $5)"
+            " AND ST_3DDWithin(sample_geom, ST_MakePoint($2, $3, $4), $5)",
+            ['text', 'float8', 'float8', 'float8', 'float8'])
+        # Each element of the arrays is one probe (the ith of each array), and each is searched for as above...
+        self.points_search_statement = PreparedStatement(
+            f'{self.table}_points_search',
+            "SELECT probe.i, found.sample_hubmap_id"
+            " FROM unnest($1, $2, $3, $4, $5, $6) AS probe(i, target, x, y, z, radius)"
+            " CROSS JOIN LATERAL ("
+            f"SELECT sample_hubmap_id FROM {self.table}"
+            " WHERE relative_spatial_entry_iri = probe.target"
+            " AND sample_geom &&& ST_Expand(ST_MakePoint(probe.x, probe.y, probe.z), probe.radius)"
+            " AND ST_3DDWithin(sample_geom, ST_MakePoint(probe.x, probe.y, probe.z), probe.radius)"
+            ") AS found",
+            ['int[]', 'text[]', 'float8[]', 'float8[]', 'float8[]', 'float8[]'])
+        # The index (in the order of <<->>, the distance between the bounding boxes) finds the nearest candidates,
+        # more of them than are asked for, and only those are ordered by their actual distance from the point.
+        self.nearest_search_statement = PreparedStatement(
+            f'{self.table}_nearest_search',
+            "SELECT sample_hubmap_id, ST_3DDistance(sample_geom, ST_MakePoint($2, $3, $4)) AS distance"
+            " FROM ("
+            f"SELECT sample_hubmap_id, sample_geom FROM {self.table}"
+            " WHERE relative_spatial_entry_iri = $1 AND ($5::text IS NULL OR sample_hubmap_id <> $5)"
+            " ORDER BY sample_geom <<->> ST_MakePoint($2, $3, $4) LIMIT $7"
+            ") AS candidates"
+            " ORDER BY distance, sample_hubmap_id LIMIT $6",
+            ['text', 'float8', 'float8', 'float8', 'text', 'int', 'int'])
+        self.rui_location_statement = PreparedStatement(
+            f'{self.table}_rui_location',
+            f"SELECT sample_rui_location FROM {self.table} WHERE sample_hubmap_id = $1",
+            ['text'])
+        self.rui_location_target_statement = PreparedStatement(
+            f'{self.table}_rui_location_target',
+            f"SELECT sample_rui_location FROM {self.table}"
+            " WHERE sample_hubmap_id = $1 AND relative_spatial_entry_iri = $2",
+            ['text', 'text'])
+        # The searches from the centroid (the translation of its placement) of a reference sample, which is found by
+        # its hubmap_id ($1) and target ($2) in the same query. The LEFT JOIN returns a row of NULLs when the sample
+        # exists but nothing is found, and no rows at all when the sample does not exist, see search_reference().
+        reference_sql: str = \
+            "WITH reference AS (" \
+            "SELECT ST_MakePoint((placement->>'x_translation')::float8," \
+            " (placement->>'y_translation')::float8, (placement->>'z_translation')::float8) AS centroid" \
+            f" FROM (SELECT sample_rui_location::json->'placement' AS placement FROM {self.table}" \
+            " WHERE sample_hubmap_id = $1 AND relative_spatial_entry_iri = $2 LIMIT 1) AS reference_sample" \
+            ")"
+        within_radius_sql: str = \
+            f"{self.table}.sample_geom &&& ST_Expand(reference.centroid, $3)" \
+            f" AND ST_3DDWithin({self.table}.sample_geom, reference.centroid, $3)"
+        self.hubmap_id_search_statement = PreparedStatement(
+            f'{self.table}_hubmap_id_search',
+            reference_sql + f" SELECT {self.table}.id, {self.table}.sample_hubmap_id FROM reference"
+            f" LEFT JOIN {self.table} ON {self.table}.relative_spatial_entry_iri = $2 AND " + within_radius_sql,
+            ['text', 'text', 'float8'])
+        # The samples with the cell type ($4) are found in the materialized view of them (see CellTypeSearchManager),
+        # which is indexed on (cell_type_name, relative_spatial_entry_iri, sample_geom) rather than joined here...
+        view: str = self.cell_type_search_manager.view
+        self.cell_type_hubmap_id_search_statement = PreparedStatement(
+            f'{self.table}_cell_type_hubmap_id_search',
+            reference_sql + f" SELECT {view}.sample_id, {view}.sample_hubmap_id FROM reference"
+            f" LEFT JOIN {view} ON {view}.cell_type_name = $4 AND {view}.relative_spatial_entry_iri = $2"
+            f" AND {view}.sample_geom &&& ST_Expand(reference.centroid, $3)"
+            f" AND ST_3DDWithin({view}.sample_geom, reference.centroid, $3)",
+            ['text', 'text', 'float8', 'text'])
+        # The samples having each of the cell types ($4) with at least the count ($5) of each (see
+        # hubmap_id_search_query()), found in the materialized view of a row per sample with the ids of all of its
+        # cell types (in a GIN indexed int[]) and the count of each (jsonb, keyed by the id).
+        # Unless all of the cell types are known nothing is found.
+        summary_view: str = self.cell_type_search_manager.summary_view
+        self.cell_types_hubmap_id_search_statement = PreparedStatement(
+            f'{self.table}_cell_types_hubmap_id_search',
+            reference_sql +
+            ", predicate AS ("
+            "SELECT cell_annotation_details.id, wanted.min_count"
+            " FROM unnest($4, $5) AS wanted(cell_type_name, min_count)"
+            " INNER JOIN cell_annotation_details ON cell_annotation_details.cell_type_name = wanted.cell_type_name"
+            "), predicates AS ("
+            "SELECT array_agg(id) AS ids, count(*) AS known FROM predicate"
+            ")"
+            f" SELECT {summary_view}.sample_id, {summary_view}.sample_hubmap_id FROM reference CROSS JOIN predicates"
+            f" LEFT JOIN {summary_view} ON predicates.known = cardinality($4)"
+            f" AND {summary_view}.cell_type_ids @> predicates.ids"
+            f" AND {summary_view}.relative_spatial_entry_iri = $2"
+            f" AND {summary_view}.sample_geom &&& ST_Expand(reference.centroid, $3)"
+            f" AND ST_3DDWithin({summary_view}.sample_geom, reference.centroid, $3)"
+            " AND NOT EXISTS (SELECT 1 FROM predicate"
+            f" WHERE COALESCE(({summary_view}.cell_type_counts->>predicate.id::text)::bigint, 0) < predicate.min_count)",
+            ['text', 'text', 'float8', 'text[]', 'bigint[]'])
+        self.any_target_hubmap_id_search_statement = PreparedStatement(
+            f'{self.table}_any_target_hubmap_id_search',
+            reference_sql + f" SELECT {self.table}.id, {self.table}.sample_hubmap_id FROM reference"
+            f" LEFT JOIN {self.table} ON " + within_radius_sql,
+            ['text', 'text', 'float8'])
+        # The keyset paged versions of the searches (see create_paged_statement()) keyed by the name of the search...
+        self.paged_statements: Dict[str, PreparedStatement] = {
+            statement.name: self.create_paged_statement(statement, id_column) for statement, id_column in (
+                (self.point_search_statement, f'{self.table}.id'),
+                (self.hubmap_id_search_statement, f'{self.table}.id'),
+                (self.cell_type_hubmap_id_search_statement, f'{view}.sample_id'),
+                (self.cell_types_hubmap_id_search_statement, f'{summary_view}.sample_id'),
+                (self.any_target_hubmap_id_search_statement, f'{self.table}.id'))
+        }
+
+    def create_paged_statement(self, statement: PreparedStatement, id_column: str) -> PreparedStatement:
+        """The search statement ("SELECT sample_hubmap_id FROM ... WHERE ...", or one that already selects
+        (id, sample_hubmap_id) and ends with the conditions on them) returning (id, sample_hubmap_id) in the order of
+        the (sample) id_column, only those with an id greater than the next parameter, and no more than the one after
+        that.
+        Each page starts where the last one ended (by the primary key) so no rows are skipped over as with OFFSET.
+        """
+        n: int = len(statement.types)
+        return PreparedStatement(
+            f'{statement.name}_page',
+            statement.sql.replace('SELECT sample_hubmap_id', f'SELECT {self.table}.id, sample_hubmap_id', 1) +
+            f" AND {id_column} > ${n + 1} ORDER BY {id_column} LIMIT ${n + 2}",
+            statement.types + ['int', 'int'])
+
+    def search_page(self, statement: PreparedStatement, vars: tuple, limit: int, after_id: int,
+                    reference: bool = False) -> tuple:
+        """At most 'limit' of the hubmap_ids found by the statement with a sample id after 'after_id', and the
+        id to continue from (None if there are no more), or None if the search failed.
+        A 'reference' statement is a search from a reference sample, see search_reference().
+        """
+        # One more than the limit is asked for to know if there is another page...
+        rows: list = self.postgresql_manager.select_all_prepared(
+            self.paged_statements[statement.name], tuple(vars) + (int(after_id), int(limit) + 1))
+        if rows is None:
+            return None
+        if reference:
+            rows = self.reference_rows(rows, vars)
+        if len(rows) <= limit:
+            return [row[1] for row in rows], None
+        return [row[1] for row in rows[:limit]], rows[limit - 1][0]
 
     # Used by: "POST /point-search
     def find_relative_to_spatial_entry_iri_within_radius_from_point(self,
@@ -191,78 +383,222 @@ class SpatialManager(object):
                                                                     radius: float,
                                                                     x: float, y: float, z: float
                                                                     ) -> List[int]:
-        sql: str =\
-            f"""SELECT sample_hubmap_id FROM {self.table}
-            WHERE relative_spatial_entry_iri = %(spatial_entry_iri)s
-            AND ST_3DDWithin(sample_geom, ST_GeomFromText('POINTZ(%(x)s %(y)s %(z)s)'), %(radius)s);
-            """
-        return self.postgresql_manager.select(sql, {
-            'spatial_entry_iri': spatial_entry_iri,
-            'radius': radius,
-            'x': x, 'y': y, 'z': z
-        })
+        vars: tuple = (spatial_entry_iri, float(x), float(y), float(z), float(radius))
+        return self.search_cache_manager.search(
+            ('point_search',) + vars,
+            lambda: self.point_search(vars))
+
+    def point_search(self, vars: tuple) -> List[str]:
+        """The point search (of the point_search_statement vars) by the spatial index if it is current, otherwise by PostGIS."""
+        index = self.spatial_index_manager.index(vars[0])
+        if index is not None:
+            hubmap_ids: List[str] = index.within_radius(*vars[1:])
+            if hubmap_ids is not None:
+                return hubmap_ids
+        return self.postgresql_manager.select_prepared(self.point_search_statement, vars)
+
+    def stream_relative_to_spatial_entry_iri_within_radius_from_point(self,
+                                                                      spatial_entry_iri: str,
+                                                                      radius: float,
+                                                                      x: float, y: float, z: float
+                                                                      ) -> Iterator[str]:
+        """Like find_relative_to_spatial_entry_iri_within_radius_from_point() but yields the hubmap_ids."""
+        vars: tuple = (spatial_entry_iri, float(x), float(y), float(z), float(radius))
+        return (row[0] for row in self.postgresql_manager.iter_prepared(self.point_search_statement, vars))
+
+    def find_relative_to_spatial_entry_iri_within_radius_from_point_page(self,
+                                                                         spatial_entry_iri: str,
+                                                                         radius: float,
+                                                                         x: float, y: float, z: float,
+                                                                         limit: int,
+                                                                         after_id: int = 0
+                                                                         ) -> tuple:
+        """Like find_relative_to_spatial_entry_iri_within_radius_from_point() but a page, see search_page()."""
+        vars: tuple = (spatial_entry_iri, float(x), float(y), float(z), float(radius))
+        return self.search_page(self.point_search_statement, vars, limit, after_id)
+
+    # Used by: "POST /point-search/batch"
+    def find_relative_to_spatial_entry_iri_within_radius_from_points(self, probes: List[dict]) -> Dict[int, List[str]]:
+        """The hubmap_ids found for each of the probes ({'target', 'radius', 'x', 'y', 'z'}) keyed by its index."""
+        rows: list = self.postgresql_manager.select_all_prepared(self.points_search_statement, (
+            list(range(len(probes))),
+            [probe['target'] for probe in probes],
+            [float(probe['x']) for probe in probes],
+            [float(probe['y']) for probe in probes],
+            [float(probe['z']) for probe in probes],
+            [float(probe['radius']) for probe in probes]
+        ))
+        if rows is None:
+            return None
+        results: Dict[int, List[str]] = {i: [] for i in range(len(probes))}
+        for row in rows:
+            results[row[0]].append(row[1])
+        return results
+
+    # Used by: "POST /nearest-search"
+    def find_nearest_to_point(self,
+                              relative_spatial_entry_iri: str,
+                              k: int,
+                              x: float, y: float, z: float,
+                              exclude_hubmap_id: str = None
+                              ) -> List[dict]:
+        """The k samples nearest to the point as [{'hubmap_id', 'distance'}, ...] nearest first."""
+        vars: tuple = (relative_spatial_entry_iri, float(x), float(y), float(z), exclude_hubmap_id,
+                       int(k), int(k) * self.nearest_search_candidate_factor)
+        return self.search_cache_manager.search(
+            ('nearest_search',) + vars,
+            lambda: self.search_nearest_to_point(vars))
+
+    def search_nearest_to_point(self, vars: tuple) -> List[dict]:
+        rows: list = self.postgresql_manager.select_all_prepared(self.nearest_search_statement, vars)
+        if rows is None:
+            return None
+        return [{'hubmap_id': row[0], 'distance': row[1]} for row in rows]
+
+    # Used by: "POST /nearest-search"
+    def find_nearest_to_hubmap_id(self,
+                                  relative_spatial_entry_iri: str,
+                                  k: int,
+                                  hubmap_id: str
+                                  ) -> List[dict]:
+        """The k samples (other than itself) nearest to the centroid of the sample."""
+        x, y, z = self.hubmap_id_sample_location(hubmap_id, relative_spatial_entry_iri)[1]
+        return self.find_nearest_to_point(relative_spatial_entry_iri, k, x, y, z, hubmap_id)
 
     def hubmap_id_sample_rui_location(self,
                                       sample_hubmap_id: str,
                                       relative_spatial_entry_iri=None
                                       ) -> dict:
-        sql: str =\
-            f"""SELECT sample_rui_location FROM {self.table}
-            WHERE sample_hubmap_id = %(sample_hubmap_id)s
-            """
-        if relative_spatial_entry_iri is not None:
-            sql += " AND relative_spatial_entry_iri = %(relative_spatial_entry_iri)s"
-        sql += ';'
-        recs: List[str] = self.postgresql_manager.select(sql, {
-            'sample_hubmap_id': sample_hubmap_id,
-            'relative_spatial_entry_iri': relative_spatial_entry_iri
-        })
+        return self.hubmap_id_sample_location(sample_hubmap_id, relative_spatial_entry_iri)[0]
+
+    def hubmap_id_sample_location(self,
+                                  sample_hubmap_id: str,
+                                  relative_spatial_entry_iri=None
+                                  ) -> tuple:
+        """The (rui_location, centroid) of the sample, from the lookup cache when it has been looked up before
+        (including when it wasn't found), since the searches from a hubmap_id begin with this.
+        """
+        location: tuple = self.search_cache_manager.lookup(
+            ('sample_location', sample_hubmap_id, relative_spatial_entry_iri),
+            lambda: self.select_sample_location(sample_hubmap_id, relative_spatial_entry_iri))
+        if location is None:
+            self.abort_sample_not_found(sample_hubmap_id, relative_spatial_entry_iri)
+        return location
+
+    def select_sample_location(self,
+                               sample_hubmap_id: str,
+                               relative_spatial_entry_iri=None
+                               ) -> tuple:
+        """The (rui_location, centroid) of the sample, or None if there is no such sample."""
+        if relative_spatial_entry_iri is None:
+            recs: List[str] = \
+                self.postgresql_manager.select_prepared(self.rui_location_statement, (sample_hubmap_id,))
+        else:
+            recs: List[str] = \
+                self.postgresql_manager.select_prepared(self.rui_location_target_statement,
+                                                        (sample_hubmap_id, relative_spatial_entry_iri))
+        if recs is None:
+            abort(json_error(f'The sample_rui_location of hubmap_id: {sample_hubmap_id} could not be read',
+                             HTTPStatus.INTERNAL_SERVER_ERROR))
         if len(recs) == 0:
-            abort(json_error(f'The attributes hubmap_id: {sample_hubmap_id}, with'
-                             f' relative_spatial_entri_iri: {relative_spatial_entry_iri}'
-                             ' has no sample_rui_location geom data',
-                             HTTPStatus.NOT_FOUND))
+            return None
         if len(recs) != 1:
             logger.error(f'Query against a single sample_hubmap_id={sample_hubmap_id} returned multiple rows')
-        return json.loads(recs[0])
+        rui_location: dict = json.loads(recs[0])
+        # Since the sample is created with its centroid at <0, 0, 0> the centroid is its translation.
+        placement: dict = rui_location['placement']
+        return rui_location, (placement['x_translation'], placement['y_translation'], placement['z_translation'])
+
+    def abort_sample_not_found(self, sample_hubmap_id: str, relative_spatial_entry_iri=None) -> None:
+        abort(json_error(f'The attributes hubmap_id: {sample_hubmap_id}, with'
+                         f' relative_spatial_entri_iri: {relative_spatial_entry_iri}'
+                         ' has no sample_rui_location geom data',
+                         HTTPStatus.NOT_FOUND))
+
+    def reference_rows(self, rows: list, vars: tuple) -> list:
+        """The (id, sample_hubmap_id) rows found by a search from a reference sample (the hubmap_id and target of
+        which are the first two vars), without the row of NULLs returned when nothing is.
+        No rows at all means that there is no reference sample, and that is NOT FOUND.
+        """
+        if len(rows) == 0:
+            self.abort_sample_not_found(vars[0], vars[1])
+        return [row for row in rows if row[0] is not None]
+
+    def search_reference(self, statement: PreparedStatement, vars: tuple) -> List[str]:
+        rows: list = self.postgresql_manager.select_all_prepared(statement, vars)
+        if rows is None:
+            return None
+        return [row[1] for row in self.reference_rows(rows, vars)]
+
+    def stream_reference(self, statement: PreparedStatement, vars: tuple) -> Iterator[str]:
+        rows: Iterator[tuple] = self.postgresql_manager.iter_prepared(statement, vars)
+        # The first row is read now, so that a missing reference sample is NOT FOUND before the response begins...
+        first_row: tuple = next(rows, None)
+        if first_row is None:
+            rows.close()
+            self.abort_sample_not_found(vars[0], vars[1])
+        return (row[1] for row in itertools.chain([first_row], rows) if row[0] is not None)
 
     # Used by: "POST /spatial-search/hubmap_id"
     def find_relative_to_spatial_entry_iri_within_radius_from_hubmap_id(self,
                                                                         relative_spatial_entry_iri: str,
                                                                         radius: float,
                                                                         hubmap_id: str,
-                                                                        cell_type_name=None
+                                                                        cell_type_name=None,
+                                                                        cell_type_predicates: List[dict] = None
                                                                         ) -> List[int]:
-        sample_rui_location: dict = self.hubmap_id_sample_rui_location(hubmap_id, relative_spatial_entry_iri)
-        sql: str =\
-            f"""SELECT sample_hubmap_id
-                FROM {self.table}
-            """
+        """The samples within the radius of the sample, optionally having the cell type (cell_type_name),
+        or having all of the cell types in the cell_type_predicates ([{'cell_type', 'min_count'}, ...]) each
+        with at least the min_count (1 if it is not given) of them.
+        """
+        statement, vars = self.hubmap_id_search_query(
+            relative_spatial_entry_iri, radius, hubmap_id, cell_type_name, cell_type_predicates)
+        return self.search_cache_manager.search(
+            ('hubmap_id_search', statement.name) + tuple(tuple(v) if isinstance(v, list) else v for v in vars),
+            lambda: self.search_reference(statement, vars))
+
+    def stream_relative_to_spatial_entry_iri_within_radius_from_hubmap_id(self,
+                                                                          relative_spatial_entry_iri: str,
+                                                                          radius: float,
+                                                                          hubmap_id: str,
+                                                                          cell_type_name=None,
+                                                                          cell_type_predicates: List[dict] = None
+                                                                          ) -> Iterator[str]:
+        """Like find_relative_to_spatial_entry_iri_within_radius_from_hubmap_id() but yields the hubmap_ids."""
+        return self.stream_reference(*self.hubmap_id_search_query(
+            relative_spatial_entry_iri, radius, hubmap_id, cell_type_name, cell_type_predicates))
+
+    def find_relative_to_spatial_entry_iri_within_radius_from_hubmap_id_page(self,
+                                                                             relative_spatial_entry_iri: str,
+                                                                             radius: float,
+                                                                             hubmap_id: str,
+                                                                             cell_type_name=None,
+                                                                             cell_type_predicates: List[dict] = None,
+                                                                             limit: int = None,
+                                                                             after_id: int = 0
+                                                                             ) -> tuple:
+        """Like find_relative_to_spatial_entry_iri_within_radius_from_hubmap_id() but a page, see search_page()."""
+        statement, vars = self.hubmap_id_search_query(
+            relative_spatial_entry_iri, radius, hubmap_id, cell_type_name, cell_type_predicates)
+        return self.search_page(statement, vars, limit or self.search_limit_max, after_id, reference=True)
+
+    def hubmap_id_search_query(self,
+                               relative_spatial_entry_iri: str,
+                               radius: float,
+                               hubmap_id: str,
+                               cell_type_name=None,
+                               cell_type_predicates: List[dict] = None
+                               ) -> tuple:
+        """The statement and vars of the search from the centroid of the sample (in a single query)."""
+        if cell_type_predicates is not None:
+            return self.cell_types_hubmap_id_search_statement, (
+                hubmap_id, relative_spatial_entry_iri, float(radius),
+                [predicate['cell_type'] for predicate in cell_type_predicates],
+                [int(predicate.get('min_count', 1)) for predicate in cell_type_predicates])
         if cell_type_name is None:
-            sql += "WHERE"
-        else:
-            sql +=\
-                f"""INNER JOIN cell_types
-                    ON {self.table}.sample_uuid = cell_types.sample_uuid
-                    INNER JOIN cell_annotation_details
-                    ON cell_annotation_details.id = cell_types.cell_annotation_details_id
-                    WHERE
-                    cell_annotation_details.cell_type_name = %(cell_type_name)s
-                    AND"""
-        sql +=\
-            f""" {self.table}.relative_spatial_entry_iri = %(relative_spatial_entry_iri)s
-                AND ST_3DDWithin(sample_geom, ST_GeomFromText('POINTZ(%(x)s %(y)s %(z)s)'), %(radius)s);
-            """
-        logger.debug(f"find_relative_to_spatial_entry_iri_within_radius_from_hubmap_id({relative_spatial_entry_iri}, "
-                     f"{radius}, {hubmap_id}, {cell_type_name}): sample_rui_location: {sample_rui_location}; sql: {sql}")
-        return self.postgresql_manager.select(sql, {
-            'cell_type_name': cell_type_name,
-            'relative_spatial_entry_iri': relative_spatial_entry_iri,
-            'x': sample_rui_location['x_dimension'],
-            'y': sample_rui_location['y_dimension'],
-            'z': sample_rui_location['z_dimension'],
-            'radius': radius
-        })
+            return self.hubmap_id_search_statement, (hubmap_id, relative_spatial_entry_iri, float(radius))
+        return self.cell_type_hubmap_id_search_statement, \
+            (hubmap_id, relative_spatial_entry_iri, float(radius), cell_type_name)
 
     # Used by "GET /search/hubmap_id/<id>/radius/<r>/target/<t>"
     def find_within_radius_at_sample_hubmap_id_and_target(self,
@@ -270,18 +606,49 @@ class SpatialManager(object):
                                                           hubmap_id: str,
                                                           relative_spatial_entry_iri: str
                                                           ) -> List[str]:
-        sample_rui_location: dict = \
-            self.hubmap_id_sample_rui_location(hubmap_id, relative_spatial_entry_iri)
-        sql: str =\
-            f"""SELECT sample_hubmap_id FROM {self.table}
-            WHERE ST_3DDWithin(sample_geom, ST_GeomFromText('POINTZ(%(x)s %(y)s %(z)s)'), %(radius)s);
-            """
-        return self.postgresql_manager.select(sql, {
-            'radius': radius,
-            'x': sample_rui_location['x_dimension'],
-            'y': sample_rui_location['y_dimension'],
-            'z': sample_rui_location['z_dimension']
-        })
+        return self.search_cache_manager.search(
+            ('hubmap_id_target_search', float(radius), hubmap_id, relative_spatial_entry_iri),
+            lambda: self.search_reference(*self.hubmap_id_target_search_query(
+                radius, hubmap_id, relative_spatial_entry_iri)))
+
+    def stream_within_radius_at_sample_hubmap_id_and_target(self,
+                                                            radius: float,
+                                                            hubmap_id: str,
+                                                            relative_spatial_entry_iri: str
+                                                            ) -> Iterator[str]:
+        """Like find_within_radius_at_sample_hubmap_id_and_target() but yields the hubmap_ids."""
+        return self.stream_reference(*self.hubmap_id_target_search_query(
+            radius, hubmap_id, relative_spatial_entry_iri))
+
+    def find_within_radius_at_sample_hubmap_id_and_target_page(self,
+                                                               radius: float,
+                                                               hubmap_id: str,
+                                                               relative_spatial_entry_iri: str,
+                                                               limit: int,
+                                                               after_id: int = 0
+                                                               ) -> tuple:
+        """Like find_within_radius_at_sample_hubmap_id_and_target() but a page, see search_page()."""
+        statement, vars = self.hubmap_id_target_search_query(radius, hubmap_id, relative_spatial_entry_iri)
+        return self.search_page(statement, vars, limit, after_id, reference=True)
+
+    def hubmap_id_target_search_query(self,
+                                      radius: float,
+                                      hubmap_id: str,
+                                      relative_spatial_entry_iri: str
+                                      ) -> tuple:
+        """The statement and vars of the search from the centroid of the sample (of the target) for the samples
+        of any target (in a single query).
+        """
+        return self.any_target_hubmap_id_search_statement, (hubmap_id, relative_spatial_entry_iri, float(radius))
+
+    def explain_find_relative_to_spatial_entry_iri_within_radius_from_point(self,
+                                                                            spatial_entry_iri: str,
+                                                                            radius: float,
+                                                                            x: float, y: float, z: float,
+                                                                            analyze: bool = False
+                                                                            ) -> List[str]:
+        return self.postgresql_manager.explain_prepared(self.point_search_statement,
+                                                        (spatial_entry_iri, x, y, z, radius), analyze)
 
 
 # NOTE: When running in a local docker container the tables are created automatically.
@@ -303,6 +670,11 @@ if __name__ == '__main__':
     parser.add_argument('-p', '--polyhedralsurface', type=str,
                         help='output a closed POLYHEDRALSURFACE from the three x y z dimensions given and exit')
     # $ (cd server; export PYTHONPATH=.; python3 ./spatialapi/manager/spatial_manager.py -p '10 10 10')
+    parser.add_argument('-e', '--explain', type=str,
+                        help='output the query plan of a point search for the target, radius, and x y z given and exit')
+    # $ (cd server; export PYTHONPATH=.; python3 ./spatialapi/manager/spatial_manager.py -e 'VHMale 100 23 18 5')
+    parser.add_argument('-a', '--analyze', action="store_true",
+                        help='with --explain, also run the query and show the actual times (EXPLAIN ANALYZE)')
 
     args = parser.parse_args()
 
@@ -326,6 +698,17 @@ if __name__ == '__main__':
             logger.info(f'Dimensions given are x: {x}, y: {y}, z: {z}')
             print(manager.create_geom_with_dimension(x, y, z))
 
+        elif args.explain is not None:
+            explain_args: List[str] = args.explain.split()
+            if len(explain_args) != 5:
+                logger.error(f"You must specify a target, radius, and x y z: 'VHMale 100 23 18 5'")
+                exit(1)
+            plan: List[str] = manager.explain_find_relative_to_spatial_entry_iri_within_radius_from_point(
+                explain_args[0], float(explain_args[1]),
+                float(explain_args[2]), float(explain_args[3]), float(explain_args[4]),
+                args.analyze)
+            print('\n'.join(plan))
+
     finally:
         manager.close()
         logger.info('Done!')
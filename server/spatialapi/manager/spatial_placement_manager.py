@@ -1,9 +1,29 @@
 import logging
 import requests
 import json
+import threading
+import hashlib
+import copy
+import psycopg2
+
+from spatialapi.manager.postgresql_manager import PostgresqlManager
+from spatialapi.utils.lru_cache import LruCache
 
 logger = logging.getLogger(__name__)
 
+# The placements most recently used by this process (keyed by placement_cache_key())...
+placement_lru: LruCache = None
+placement_lru_lock = threading.Lock()
+# The service versions whose stale 'spatial_placement_cache' rows this process has already removed...
+placement_cache_purged_versions: set = set()
+
+
+def placement_cache_key(target_iri: str, sample_rui_location: dict) -> str:
+    """A stable hash of the target and the rui_location (independent of key order and formatting)."""
+    normalized: str = json.dumps({'target_iri': target_iri, 'rui_location': sample_rui_location},
+                                 sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
 
 # With patch to fix RUI 0.5 Kidney and Spleen Placements found at:
 # https://github.com/hubmapconsortium/ccf-ui/blob/main/projects/ccf-database/src/lib/hubmap/hubmap-data.ts#L447-L462
@@ -36,16 +56,102 @@ class SpatialPlacementManager(object):
     def __init__(self, config):
         spatial_config = config['spatialPlacement']
         self.server = spatial_config.get('Server')
-        logger.info(f'SpatialPlacementManager: Server: {self.server}')
+        # Change this when the placement service is upgraded, so that placements it made before are not reused.
+        self.cache_version: str = spatial_config.get('CacheVersion', fallback=self.server)
+        logger.info(f'SpatialPlacementManager: Server: {self.server}; CacheVersion: {self.cache_version}')
+
+        global placement_lru
+        with placement_lru_lock:
+            if placement_lru is None:
+                placement_lru = LruCache(spatial_config.getint('CacheSize', fallback=20000))
+        self.postgresql_manager = PostgresqlManager(config)
+        # A requests.Session per thread so that repeated calls reuse the (keep-alive) connection...
+        self.local = threading.local()
+
+    @property
+    def session(self) -> requests.Session:
+        session: requests.Session = getattr(self.local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            self.local.session = session
+        return session
 
     def close(self):
         logger.info(f'SpatialPlacementManager: Closing')
+        self.postgresql_manager.close()
+
+    def purge_stale_cached_placements(self) -> None:
+        with placement_lru_lock:
+            if self.cache_version in placement_cache_purged_versions:
+                return
+            placement_cache_purged_versions.add(self.cache_version)
+        with self.postgresql_manager.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("DELETE FROM spatial_placement_cache WHERE service_version <> %(service_version)s;",
+                               {'service_version': self.cache_version})
+                logger.info(f'SpatialPlacementManager: removed {cursor.rowcount} placements'
+                            f' not made by service version {self.cache_version}')
+                conn.commit()
+            finally:
+                cursor.close()
+
+    def select_cached_placement(self, key: str) -> dict:
+        self.purge_stale_cached_placements()
+        placements: list = self.postgresql_manager.select(
+            "SELECT placement FROM spatial_placement_cache"
+            " WHERE placement_key = %(placement_key)s AND service_version = %(service_version)s;",
+            {'placement_key': key, 'service_version': self.cache_version})
+        if placements is None or len(placements) == 0:
+            return None
+        return json.loads(placements[0])
+
+    def insert_cached_placement(self, key: str, target_iri: str, placement: dict) -> None:
+        with self.postgresql_manager.connection() as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute(
+                    "INSERT INTO spatial_placement_cache (placement_key, service_version, target_iri, placement)"
+                    " VALUES (%(placement_key)s, %(service_version)s, %(target_iri)s, %(placement)s)"
+                    " ON CONFLICT (placement_key) DO UPDATE SET"
+                    " service_version = EXCLUDED.service_version, placement = EXCLUDED.placement,"
+                    " created_timestamp = now();",
+                    {'placement_key': key, 'service_version': self.cache_version,
+                     'target_iri': target_iri, 'placement': json.dumps(placement)})
+                conn.commit()
+            finally:
+                cursor.close()
+
+    def cache_stats(self) -> dict:
+        return placement_lru.stats()
 
-    # https://ccf-api--staging.herokuapp.com/#/operations/get-spatial-placement
     def placement_relative_to_target(self, target: str,  sample_rui_location: dict) -> dict:
+        """The placement is looked for in the in process LRU, then in the 'spatial_placement_cache' table,
+        and only if neither has it is the placement service asked (and the answer saved in both).
+        """
         target_iri: str = f"http://purl.org/ccf/latest/ccf.owl#{target}"
+        key: str = placement_cache_key(target_iri, sample_rui_location)
+        placement = placement_lru.get(key)
+        if placement is not LruCache.MISSING:
+            return copy.deepcopy(placement)
+        try:
+            placement = self.select_cached_placement(key)
+        except (Exception, psycopg2.DatabaseError) as e:
+            placement = None
+            logger.error(f'SpatialPlacementManager: cache lookup failed: {e.__class__.__name__}: {e}')
+        if placement is None:
+            placement = self.request_placement_relative_to_target(target_iri, sample_rui_location)
+            try:
+                self.insert_cached_placement(key, target_iri, placement)
+            except (Exception, psycopg2.DatabaseError) as e:
+                logger.error(f'SpatialPlacementManager: cache insert failed: {e.__class__.__name__}: {e}')
+        placement_lru.put(key, placement)
+        return copy.deepcopy(placement)
+
+    # https://ccf-api--staging.herokuapp.com/#/operations/get-spatial-placement
+    def request_placement_relative_to_target(self, target_iri: str, sample_rui_location: dict) -> dict:
         logger.info(f'request: target_iri: {target_iri}; sample_rui_location: {json.dumps(sample_rui_location)}')
-        resp = requests.post(self.server,
+        resp = self.session.post(self.server,
             headers={
                 "Content-Type": "application/json"
             },
@@ -0,0 +1,60 @@
+from flask import Blueprint, request, abort, jsonify, make_response
+from http import HTTPStatus
+import logging
+
+from spatialapi.manager.managers import get_managers
+from spatialapi.manager.spatial_manager import SpatialManager
+from spatialapi.utils import json_error
+
+logger = logging.getLogger(__name__)
+
+nearest_search_blueprint = Blueprint('nearest_search_blueprint', __name__)
+
+
+@nearest_search_blueprint.route('/nearest-search', methods=['POST'])
+def nearest_search():
+    request_dict: dict = request.get_json()
+    logger.info(f'nearest_search: POST /nearest-search {request_dict}')
+
+    spatial_manager: SpatialManager = get_managers().spatial_manager
+    request_validation(request_dict, spatial_manager.nearest_search_max)
+
+    if 'hubmap_id' in request_dict:
+        results = spatial_manager.find_nearest_to_hubmap_id(
+            request_dict['target'],
+            request_dict['k'],
+            request_dict['hubmap_id'])
+    else:
+        results = spatial_manager.find_nearest_to_point(
+            request_dict['target'],
+            request_dict['k'],
+            request_dict['x'], request_dict['y'], request_dict['z'])
+    if results is None:
+        abort(json_error("The nearest search failed", HTTPStatus.INTERNAL_SERVER_ERROR))
+
+    response = make_response(jsonify(samples=results), HTTPStatus.OK)
+    response.headers["Content-Type"] = "application/json"
+    return response
+
+
+def request_validation(request_dict: dict, k_max: int) -> None:
+    point_keys: tuple = ('x', 'y', 'z')
+    all_request_keys: tuple = ('target', 'k', 'hubmap_id') + point_keys
+    target_values: list = ['VHMale', 'VHFemale']
+    if not isinstance(request_dict, dict):
+        abort(json_error(f"Request Body: must be an object", HTTPStatus.BAD_REQUEST))
+    for k in request_dict.keys():
+        if k not in all_request_keys:
+            abort(json_error(f"Request Body: can only have the following attributes {all_request_keys}",
+                             HTTPStatus.BAD_REQUEST))
+    if not all(key in request_dict for key in ('target', 'k')):
+        abort(json_error(f"Request Body: must have the following required attributes ('target', 'k')", HTTPStatus.BAD_REQUEST))
+    has_point: bool = all(key in request_dict for key in point_keys)
+    if has_point == ('hubmap_id' in request_dict) or (not has_point and any(key in request_dict for key in point_keys)):
+        abort(json_error(f"Request Body: must have either the attribute 'hubmap_id' or all of the attributes {point_keys}", HTTPStatus.BAD_REQUEST))
+    if has_point and not all(isinstance(request_dict[key], (int, float)) for key in point_keys):
+        abort(json_error(f"Request Body: these attributes must have numeric values (int or float): {point_keys}", HTTPStatus.BAD_REQUEST))
+    if not isinstance(request_dict['k'], int) or isinstance(request_dict['k'], bool) or not 1 <= request_dict['k'] <= k_max:
+        abort(json_error(f"Request Body: the attribute 'k' must be an integer from 1 to {k_max}", HTTPStatus.BAD_REQUEST))
+    if not request_dict['target'] in target_values:
+        abort(json_error(f"Request Body: the attribute 'target' must be one of: {', '.join(target_values)}", HTTPStatus.BAD_REQUEST))
@@ -1,10 +1,10 @@
 from flask import Blueprint, request, abort, jsonify, make_response
-import configparser
 from http import HTTPStatus
 import logging
 
+from spatialapi.manager.managers import get_managers
 from spatialapi.manager.spatial_manager import SpatialManager
-from spatialapi.utils import json_error
+from spatialapi.utils import json_error, ndjson_requested, ndjson_response, page_request, page_response
 
 logger = logging.getLogger(__name__)
 
@@ -17,11 +17,24 @@ def point_search():
     logger.info(f'point_search: POST /point-search {request_dict}')
     request_validation(request_dict)
 
-    config = configparser.ConfigParser()
-    app_properties: str = 'resources/app.properties'
-    logger.info(f'point_search: Reading properties file: {app_properties}')
-    config.read(app_properties)
-    spatial_manager = SpatialManager(config)
+    spatial_manager: SpatialManager = get_managers().spatial_manager
+
+    if 'limit' in request_dict or 'page_token' in request_dict:
+        query: tuple = ('point-search', request_dict['target'], request_dict['radius'],
+                        request_dict['x'], request_dict['y'], request_dict['z'])
+        limit, after_id = page_request(request_dict.get('limit'), request_dict.get('page_token'),
+                                       spatial_manager.search_limit_max, query)
+        return page_response(spatial_manager.find_relative_to_spatial_entry_iri_within_radius_from_point_page(
+            request_dict['target'],
+            request_dict['radius'],
+            request_dict['x'], request_dict['y'], request_dict['z'],
+            limit, after_id), query)
+
+    if ndjson_requested():
+        return ndjson_response(spatial_manager.stream_relative_to_spatial_entry_iri_within_radius_from_point(
+            request_dict['target'],
+            request_dict['radius'],
+            request_dict['x'], request_dict['y'], request_dict['z']))
 
     results = spatial_manager.find_relative_to_spatial_entry_iri_within_radius_from_point(
         request_dict['target'],
@@ -33,6 +46,37 @@ def point_search():
     return response
 
 
+@point_search_blueprint.route('/point-search/batch', methods=['POST'])
+def point_search_batch():
+    """Answer many point searches (each as for POST /point-search) with a single query."""
+    probes: list = request.get_json()
+    logger.info(f'point_search_batch: POST /point-search/batch with {len(probes) if isinstance(probes, list) else 0} probes')
+
+    spatial_manager: SpatialManager = get_managers().spatial_manager
+    batch_request_validation(probes, spatial_manager.point_search_batch_max)
+
+    results: dict = spatial_manager.find_relative_to_spatial_entry_iri_within_radius_from_points(probes)
+    if results is None:
+        abort(json_error("The point search failed", HTTPStatus.INTERNAL_SERVER_ERROR))
+
+    # The hubmap_ids found for each probe keyed by its index in the request...
+    response = make_response(jsonify(hubmap_ids={str(i): hubmap_ids for i, hubmap_ids in results.items()}),
+                             HTTPStatus.OK)
+    response.headers["Content-Type"] = "application/json"
+    return response
+
+
+def batch_request_validation(probes: list, batch_max: int) -> None:
+    if not isinstance(probes, list) or len(probes) == 0:
+        abort(json_error("Request Body: must be a non empty array of point searches", HTTPStatus.BAD_REQUEST))
+    if len(probes) > batch_max:
+        abort(json_error(f"Request Body: must have no more than {batch_max} point searches", HTTPStatus.BAD_REQUEST))
+    for probe in probes:
+        if not isinstance(probe, dict):
+            abort(json_error("Request Body: each point search must be an object", HTTPStatus.BAD_REQUEST))
+        request_validation(probe)
+
+
 def request_validation(request_dict: dict) -> None:
     numeric_instances_keys: tuple = ('radius', 'x', 'y', 'z')
     required_request_keys: tuple = numeric_instances_keys + ('target',)
@@ -1,8 +1,8 @@
 from flask import Blueprint, make_response, request, abort
-import configparser
 import logging
 
 from spatialapi.manager.cell_annotation_manager import CellAnnotationManager
+from spatialapi.manager.managers import get_managers
 
 logger = logging.getLogger(__name__)
 
@@ -13,13 +13,13 @@ rebuild_annotation_details_blueprint = Blueprint('Rebuild the annotation details
 def rebuild_annotation_details():
     logger.info(f'rebuild_annotation_details: PUT /rebuild-annotation-details')
 
-    config = configparser.ConfigParser()
-    app_properties: str = 'resources/app.properties'
-    logger.info(f'Reading properties file: {app_properties}')
-    config.read(app_properties)
-
-    cell_annotation_manager: CellAnnotationManager = CellAnnotationManager(config)
+    cell_annotation_manager: CellAnnotationManager = get_managers().cell_annotation_manager
 
     cell_annotation_manager.load_annotation_details()
 
+    # This is the explicit rebuild, so also download the cell type name mapping again...
+    get_managers().cell_type_count_manager.refresh_cell_type_name_mapping()
+    get_managers().search_cache_manager.bump_generation()
+    get_managers().cell_type_count_manager.cell_type_search_manager.request_refresh()
+
     return make_response("Done", 200)
@@ -1,9 +1,10 @@
-from flask import Blueprint, request, abort, Response
-import configparser
+from flask import Blueprint, request, abort, Response, jsonify
 from http import HTTPStatus
 import logging
 
 from spatialapi.manager.cell_type_count_manager import CellTypeCountManager
+from spatialapi.manager.managers import get_managers
+from spatialapi.utils import json_error
 
 logger = logging.getLogger(__name__)
 
@@ -17,16 +18,30 @@ samples_cell_type_counts_blueprint =\
 def samples_cell_type_counts():
     logger.info(f'samples_cell_type_counts: finish_sample_update_uuid: PUT /samples/cell-type-counts')
 
-    config = configparser.ConfigParser()
-    app_properties: str = 'resources/app.properties'
-    logger.info(f'samples_cell_type_counts: Reading properties file: {app_properties}')
-    config.read(app_properties)
-
-    cell_type_count_manager = CellTypeCountManager(config)
+    cell_type_count_manager: CellTypeCountManager = get_managers().cell_type_count_manager
 
     sample_uuid: str = request.json['sample_uuid']
     cell_type_counts: dict = request.json['cell_type_counts']
 
-    cell_type_count_manager.sample_extracted_cell_type_counts_from_secondary_analysis_files(sample_uuid, cell_type_counts)
+    # Saved in the background (with any others that arrive at about the same time) so that this returns at once...
+    cell_type_count_manager.enqueue_cell_type_counts(sample_uuid, cell_type_counts)
 
     return Response("Processing has been initiated", HTTPStatus.ACCEPTED)
+
+
+# The cell_type_counts that ingest-api has been asked for and has not yet returned, oldest first
+@samples_cell_type_counts_blueprint.route('/samples/cell-type-counts/pending', methods=['GET'])
+def samples_cell_type_counts_pending():
+    logger.info(f'samples_cell_type_counts_pending: GET /samples/cell-type-counts/pending')
+
+    cell_type_count_manager: CellTypeCountManager = get_managers().cell_type_count_manager
+
+    pending: list = cell_type_count_manager.cell_type_count_request_manager.pending()
+    if pending is None:
+        abort(json_error('Unable to read the pending cell_type_count requests', HTTPStatus.INTERNAL_SERVER_ERROR))
+
+    return jsonify({
+        'timeout_hours': cell_type_count_manager.cell_type_count_request_manager.timeout_hours,
+        'pending': len(pending),
+        'requests': pending
+    })
@@ -1,10 +1,10 @@
-from flask import Blueprint, abort, jsonify, make_response
-import configparser
+from flask import Blueprint, abort, jsonify, make_response, request
 from typing import List
-from spatialapi.utils import json_error
+from spatialapi.utils import json_error, ndjson_requested, ndjson_response, page_request, page_response
 from http import HTTPStatus
 import logging
 
+from spatialapi.manager.managers import get_managers
 from spatialapi.manager.spatial_manager import SpatialManager
 
 logger = logging.getLogger(__name__)
@@ -23,11 +23,18 @@ def search_hubmap_id_to_radius(id, r, t):
     #     #return redirect(url_for('login.login'))
     #     redirect_url = current_app.config['FLASK_APP_BASE_URI'].rstrip('/') + '/login'
     #     return redirect(redirect_url)
-    config = configparser.ConfigParser()
-    app_properties: str = 'resources/app.properties'
-    logger.info(f'search_hubmap_id_to_radius: Reading properties file: {app_properties}')
-    config.read(app_properties)
-    spatial_manager = SpatialManager(config)
+    spatial_manager: SpatialManager = get_managers().spatial_manager
+
+    # ?limit=<n>&page_token=<next_page_token> for a page of the results...
+    if 'limit' in request.args or 'page_token' in request.args:
+        query: tuple = ('search/hubmap-id', id, r, t)
+        limit, after_id = page_request(request.args.get('limit'), request.args.get('page_token'),
+                                       spatial_manager.search_limit_max, query)
+        return page_response(
+            spatial_manager.find_within_radius_at_sample_hubmap_id_and_target_page(r, id, t, limit, after_id), query)
+
+    if ndjson_requested():
+        return ndjson_response(spatial_manager.stream_within_radius_at_sample_hubmap_id_and_target(r, id, t))
 
     results: List[str] = spatial_manager.find_within_radius_at_sample_hubmap_id_and_target(r, id, t)
     logger.info(f'search_hubmap_id_to_radius; find_within_radius_at_hubmap_id({id},{r}, {t}): {results}')
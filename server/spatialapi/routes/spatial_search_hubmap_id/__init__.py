@@ -1,10 +1,10 @@
 from flask import Blueprint, request, abort, jsonify, make_response
-import configparser
 from http import HTTPStatus
 import logging
 
+from spatialapi.manager.managers import get_managers
 from spatialapi.manager.spatial_manager import SpatialManager
-from spatialapi.utils import json_error
+from spatialapi.utils import json_error, ndjson_requested, ndjson_response, page_request, page_response
 
 logger = logging.getLogger(__name__)
 
@@ -15,23 +15,42 @@ spatial_search_hubmap_id_blueprint = Blueprint('spatial_search_hubmap_id_bluepri
 def spatial_search_hubmap_id():
     request_dict: dict = request.get_json()
     logger.info(f'spatial_search_hubmap_id: POST /spatial-search/hubmap-id {request_dict}')
-    request_validation(request_dict)
-
-    config = configparser.ConfigParser()
-    app_properties: str = 'resources/app.properties'
-    logger.info(f'spatial_search: Reading properties file: {app_properties}')
-    config.read(app_properties)
-    spatial_manager = SpatialManager(config)
+    spatial_manager: SpatialManager = get_managers().spatial_manager
+    request_validation(request_dict, spatial_manager.cell_types_max)
 
     cell_type_name: str = None
     if 'cell_type' in request_dict:
         cell_type_name = request_dict['cell_type']
+    cell_type_predicates: list = request_dict.get('cell_types')
+
+    if 'limit' in request_dict or 'page_token' in request_dict:
+        query: tuple = ('spatial-search/hubmap-id', request_dict['target'], request_dict['radius'],
+                        request_dict['hubmap_id'], cell_type_name, cell_type_predicates)
+        limit, after_id = page_request(request_dict.get('limit'), request_dict.get('page_token'),
+                                       spatial_manager.search_limit_max, query)
+        return page_response(spatial_manager.find_relative_to_spatial_entry_iri_within_radius_from_hubmap_id_page(
+            request_dict['target'],
+            request_dict['radius'],
+            request_dict['hubmap_id'],
+            cell_type_name,
+            cell_type_predicates,
+            limit, after_id), query)
+
+    if ndjson_requested():
+        return ndjson_response(spatial_manager.stream_relative_to_spatial_entry_iri_within_radius_from_hubmap_id(
+            request_dict['target'],
+            request_dict['radius'],
+            request_dict['hubmap_id'],
+            cell_type_name,
+            cell_type_predicates
+        ))
 
     results = spatial_manager.find_relative_to_spatial_entry_iri_within_radius_from_hubmap_id(
         request_dict['target'],
         request_dict['radius'],
         request_dict['hubmap_id'],
-        cell_type_name
+        cell_type_name,
+        cell_type_predicates
     )
 
     response = make_response(jsonify(hubmap_ids=results), HTTPStatus.OK)
@@ -39,10 +58,10 @@ def spatial_search_hubmap_id():
     return response
 
 
-def request_validation(request_dict: dict) -> None:
+def request_validation(request_dict: dict, cell_types_max: int) -> None:
     int_instances_keys: tuple = ("radius", )
     required_request_keys: tuple = int_instances_keys + ("target", "hubmap_id")
-    optional_request_keys: tuple = ("cell_type", )
+    optional_request_keys: tuple = ("cell_type", "cell_types", "limit", "page_token")
     all_request_keys: tuple = required_request_keys + optional_request_keys
     for k in request_dict.keys():
         if k not in all_request_keys:
@@ -55,3 +74,22 @@ def request_validation(request_dict: dict) -> None:
     target_values: list = ['VHMale', 'VHFemale']
     if not request_dict['target'] in target_values:
         abort(json_error(f"Request Body: the attribute 'target' must be one of: {', '.join(target_values)}", HTTPStatus.BAD_REQUEST))
+    if 'cell_type' in request_dict and 'cell_types' in request_dict:
+        abort(json_error("Request Body: can have either the attribute 'cell_type' or 'cell_types', not both", HTTPStatus.BAD_REQUEST))
+    if 'cell_types' in request_dict:
+        cell_types_validation(request_dict['cell_types'], cell_types_max)
+
+
+def cell_types_validation(cell_types: list, cell_types_max: int) -> None:
+    if not isinstance(cell_types, list) or len(cell_types) == 0 or len(cell_types) > cell_types_max:
+        abort(json_error(f"Request Body: the attribute 'cell_types' must be an array of 1 to {cell_types_max}"
+                         " {'cell_type', 'min_count'} objects", HTTPStatus.BAD_REQUEST))
+    for predicate in cell_types:
+        if not isinstance(predicate, dict) or not isinstance(predicate.get('cell_type'), str) or \
+                not all(k in ('cell_type', 'min_count') for k in predicate.keys()):
+            abort(json_error("Request Body: each of the 'cell_types' must be an object with a 'cell_type' string"
+                             " and optionally a 'min_count'", HTTPStatus.BAD_REQUEST))
+        min_count = predicate.get('min_count', 1)
+        if isinstance(min_count, bool) or not isinstance(min_count, int) or min_count < 1:
+            abort(json_error("Request Body: the 'min_count' of each of the 'cell_types' must be a positive integer",
+                             HTTPStatus.BAD_REQUEST))
@@ -1,33 +1,58 @@
 from flask import Blueprint, jsonify
 from pathlib import Path
-import configparser
 import logging
 
+from spatialapi.manager.cell_type_count_manager import cell_type_count_queue_stats
+from spatialapi.manager.managers import get_managers
 from spatialapi.manager.postgresql_manager import PostgresqlManager
 
 status_blueprint = Blueprint('status', __name__)
 logger = logging.getLogger(__name__)
 
 
-def test_postgresql_manager_connection() -> bool:
-    config = configparser.ConfigParser()
-    app_properties: str = 'resources/app.properties'
-    logger.info(f'Reading properties file: {app_properties}')
-    config.read(app_properties)
+def get_postgresql_manager() -> PostgresqlManager:
     try:
-        postgresql_manager = PostgresqlManager(config)
-        postgresql_manager.close()
-        return True
+        return get_managers().postgresql_manager
+    except:
+        # The pool could not make its initial connections...
+        return None
+
+
+def get_search_cache_stats() -> dict:
+    try:
+        return get_managers().search_cache_manager.stats()
+    except:
+        return None
+
+
+def get_spatial_index_stats() -> dict:
+    try:
+        return get_managers().spatial_manager.spatial_index_manager.stats()
+    except:
+        return None
+
+
+def test_postgresql_manager_connection(postgresql_manager: PostgresqlManager) -> bool:
+    # Borrows a pooled connection rather than opening a new one just to see if the database is there.
+    if postgresql_manager is None:
+        return False
+    try:
+        return postgresql_manager.check_connection()
     except:
         return False
 
 
 @status_blueprint.route('/status', methods=['GET'])
 def get_status():
+    postgresql_manager: PostgresqlManager = get_postgresql_manager()
     status_data = {
         # Use strip() to remove leading and trailing spaces, newlines, and tabs
         'version': (Path(__file__).absolute().parent.parent.parent.parent / 'VERSION').read_text().strip(),
         'build': (Path(__file__).absolute().parent.parent.parent.parent / 'BUILD').read_text().strip(),
-        'database_connection': test_postgresql_manager_connection()
+        'database_connection': test_postgresql_manager_connection(postgresql_manager),
+        'database_pool': postgresql_manager.pool_stats() if postgresql_manager is not None else None,
+        'search_cache': get_search_cache_stats(),
+        'spatial_index': get_spatial_index_stats(),
+        'cell_type_count_queue': cell_type_count_queue_stats()
     }
     return jsonify(status_data)
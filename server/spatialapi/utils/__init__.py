@@ -1,4 +1,9 @@
-from flask import make_response, jsonify, abort
+from flask import make_response, jsonify, abort, request, Response
+from typing import Iterable, Iterator, List
+import base64
+import binascii
+import hashlib
+import json
 import string
 from http import HTTPStatus
 import logging
@@ -16,3 +21,81 @@ def sample_uuid_validation(uuid: str) -> None:
         abort(json_error(f"The 'sample-uuid' ({uuid}) must contain only hex digits", HTTPStatus.BAD_REQUEST))
     if len(uuid) != 32:
         abort(json_error(f"The 'sample-uuid' ({uuid}) must contain exactly 32 hex digits", HTTPStatus.BAD_REQUEST))
+
+
+NDJSON_MIMETYPE: str = 'application/x-ndjson'
+
+
+def ndjson_requested() -> bool:
+    """True if the client would rather have the results streamed as newline delimited JSON (by its Accept header)."""
+    return request.accept_mimetypes.best_match(['application/json', NDJSON_MIMETYPE]) == NDJSON_MIMETYPE
+
+
+def ndjson_response(hubmap_ids: Iterable[str], lines_per_chunk: int = 500) -> Response:
+    """Stream a {"hubmap_id": ...} line for each of the hubmap_ids as they are read from the database."""
+    def generate() -> Iterator[str]:
+        lines: list = []
+        for hubmap_id in hubmap_ids:
+            lines.append(json.dumps({'hubmap_id': hubmap_id}) + '\n')
+            if len(lines) >= lines_per_chunk:
+                yield ''.join(lines)
+                lines = []
+        if len(lines) > 0:
+            yield ''.join(lines)
+    return Response(generate(), status=HTTPStatus.OK, mimetype=NDJSON_MIMETYPE)
+
+
+def page_token_query_digest(query: tuple) -> str:
+    return hashlib.sha256(json.dumps(list(query), default=str).encode('utf-8')).hexdigest()[:16]
+
+
+def encode_page_token(after_id: int, query: tuple) -> str:
+    """An opaque token for continuing the search (the query) after the sample with the id 'after_id'."""
+    token: dict = {'after': after_id, 'query': page_token_query_digest(query)}
+    return base64.urlsafe_b64encode(json.dumps(token).encode('utf-8')).decode('ascii')
+
+
+def decode_page_token(page_token: str, query: tuple) -> int:
+    """The sample id that the search continues after, if the token was given for this same search (the query)."""
+    try:
+        token: dict = json.loads(base64.urlsafe_b64decode(page_token.encode('ascii')))
+        after_id: int = token['after']
+        token_query_digest: str = token['query']
+    except (binascii.Error, UnicodeError, ValueError, KeyError, TypeError):
+        abort(json_error("The 'page_token' is not valid", HTTPStatus.BAD_REQUEST))
+    if not isinstance(after_id, int) or token_query_digest != page_token_query_digest(query):
+        abort(json_error("The 'page_token' was not returned by this search", HTTPStatus.BAD_REQUEST))
+    return after_id
+
+
+def page_request(limit, page_token, limit_max: int, query: tuple) -> tuple:
+    """The (limit, after_id) of the page of the search (the query) that is asked for by the 'limit' and 'page_token'.
+    If only the 'page_token' is given the 'limit' is 'limit_max'.
+    """
+    if limit is None:
+        limit = limit_max
+    elif isinstance(limit, str):
+        try:
+            limit = int(limit)
+        except ValueError:
+            abort(json_error("The 'limit' must be an integer", HTTPStatus.BAD_REQUEST))
+    if isinstance(limit, bool) or not isinstance(limit, int) or limit < 1 or limit > limit_max:
+        abort(json_error(f"The 'limit' must be an integer from 1 to {limit_max}", HTTPStatus.BAD_REQUEST))
+    if page_token is None:
+        return limit, 0
+    if not isinstance(page_token, str):
+        abort(json_error("The 'page_token' must be a string", HTTPStatus.BAD_REQUEST))
+    return limit, decode_page_token(page_token, query)
+
+
+def page_response(page: tuple, query: tuple) -> Response:
+    """The hubmap_ids of the page (from SpatialManager.search_page()) and the 'next_page_token' to continue the
+    search (the query) with, which is null on the last page.
+    """
+    if page is None:
+        abort(json_error("The search failed", HTTPStatus.INTERNAL_SERVER_ERROR))
+    hubmap_ids: List[str] = page[0]
+    next_page_token: str = None if page[1] is None else encode_page_token(page[1], query)
+    response = make_response(jsonify(hubmap_ids=hubmap_ids, next_page_token=next_page_token), HTTPStatus.OK)
+    response.headers["Content-Type"] = "application/json"
+    return response
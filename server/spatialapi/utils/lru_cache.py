@@ -0,0 +1,63 @@
+from collections import OrderedDict
+import threading
+import time
+
+
+class LruCache(object):
+    """A thread safe least recently used cache of at most 'max_size' entries.
+    If 'ttl_seconds' is given, entries older than that are treated as missing.
+    The hit and miss counts are kept so that they can be reported (see stats()).
+    """
+
+    # Returned by get() when there is no entry, so that None can be cached...
+    MISSING = object()
+
+    def __init__(self, max_size: int, ttl_seconds: float = None):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.entries: OrderedDict = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                value, stored_time = entry
+                if self.ttl_seconds is None or time.time() - stored_time < self.ttl_seconds:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self.entries[key]
+            self.misses += 1
+            return LruCache.MISSING
+
+    def put(self, key, value) -> None:
+        if self.max_size <= 0:
+            return
+        with self.lock:
+            self.entries[key] = (value, time.time())
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key) -> None:
+        with self.lock:
+            self.entries.pop(key, None)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                'size': len(self.entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions
+            }
@@ -0,0 +1,166 @@
+import numpy as np
+from typing import List
+
+# Builds the sample geometries on the client as EWKB, the same geometry as SpatialManager.create_geometry() builds in
+# PostGIS with ST_Translate(ST_Scale(ST_RotateZ(ST_RotateY(ST_RotateX(ST_MakeSolid(...)))))).
+# Rather than five transformations applied one after another to every point, the five are composed into one 4x4 matrix
+# per sample (M = Translate * Scale * RotateZ * RotateY * RotateX), and the matrices of a whole batch of samples
+# are applied to all of their vertices at once.
+#
+# NOTE: Like create_geometry() the rotations are passed to the same math that ST_RotateX/Y/Z use, so they are
+# treated as radians, and nothing is being done with the '*_units' or 'rotation_order' here either.
+
+# The faces of the cuboid (centred on POINT(0,0,0)) as the signs of the half dimensions of each of their points.
+# These are in the same order, and wound the same way, as the create_*_plane_* methods of SpatialManager.
+FACE_SIGNS: np.ndarray = np.array([
+    # XY plane at Z Front
+    [[-1, -1, 1], [1, -1, 1], [1, 1, 1], [-1, 1, 1], [-1, -1, 1]],
+    # XY plane at Z Back
+    [[-1, -1, -1], [-1, 1, -1], [1, 1, -1], [1, -1, -1], [-1, -1, -1]],
+    # YZ plane at X Left
+    [[-1, -1, -1], [-1, -1, 1], [-1, 1, 1], [-1, 1, -1], [-1, -1, -1]],
+    # YZ plane at X Right
+    [[1, -1, -1], [1, 1, -1], [1, 1, 1], [1, -1, 1], [1, -1, -1]],
+    # XZ plane at Y Top
+    [[-1, 1, -1], [-1, 1, 1], [1, 1, 1], [1, 1, -1], [-1, 1, -1]],
+    # XZ plane at Y Bottom
+    [[-1, -1, -1], [1, -1, -1], [1, -1, 1], [-1, -1, 1], [-1, -1, -1]]
+], dtype=np.float64)
+
+# The eight distinct corners of the cuboid.
+CORNER_SIGNS: np.ndarray = np.array(
+    [[x, y, z] for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)], dtype=np.float64)
+
+# EWKB (little endian) with the Z flag set and no SRID, see https://libgeos.org/specifications/wkb/
+EWKB_Z_FLAG: int = 0x80000000
+WKB_POLYGON: int = 3
+WKB_POLYHEDRALSURFACE: int = 15
+FACES: int = 6
+POINTS_PER_FACE: int = 5
+# byte order, type, number of polygons
+EWKB_HEADER_BYTES: int = 1 + 4 + 4
+# byte order, type, number of rings, number of points, and then the points
+EWKB_FACE_HEADER_BYTES: int = 1 + 4 + 4 + 4
+EWKB_FACE_BYTES: int = EWKB_FACE_HEADER_BYTES + POINTS_PER_FACE * 3 * 8
+EWKB_BYTES: int = EWKB_HEADER_BYTES + FACES * EWKB_FACE_BYTES
+
+
+def ewkb_template() -> np.ndarray:
+    """The bytes of a POLYHEDRALSURFACE Z of six single ring pentagon faces with the coordinates left as zero."""
+    template: bytearray = bytearray()
+    template += b'\x01' + np.array([WKB_POLYHEDRALSURFACE | EWKB_Z_FLAG, FACES], dtype='<u4').tobytes()
+    for _ in range(FACES):
+        template += b'\x01' + np.array([WKB_POLYGON | EWKB_Z_FLAG, 1, POINTS_PER_FACE], dtype='<u4').tobytes()
+        template += bytes(POINTS_PER_FACE * 3 * 8)
+    return np.frombuffer(bytes(template), dtype=np.uint8)
+
+
+EWKB_TEMPLATE: np.ndarray = ewkb_template()
+
+
+def rui_location_arrays(rui_locations: List[dict]) -> tuple:
+    """The dimensions, rotations, scalings, and translations of the rui_locations, each an (N, 3) array."""
+    dimensions = np.array([[r['x_dimension'], r['y_dimension'], r['z_dimension']] for r in rui_locations],
+                          dtype=np.float64).reshape(-1, 3)
+    placements: List[dict] = [r['placement'] for r in rui_locations]
+    rotations = np.array([[p['x_rotation'], p['y_rotation'], p['z_rotation']] for p in placements],
+                         dtype=np.float64).reshape(-1, 3)
+    scalings = np.array([[p['x_scaling'], p['y_scaling'], p['z_scaling']] for p in placements],
+                        dtype=np.float64).reshape(-1, 3)
+    translations = np.array([[p['x_translation'], p['y_translation'], p['z_translation']] for p in placements],
+                            dtype=np.float64).reshape(-1, 3)
+    return dimensions, rotations, scalings, translations
+
+
+def affine_matrices(rotations: np.ndarray, scalings: np.ndarray, translations: np.ndarray) -> np.ndarray:
+    """The (N, 4, 4) matrices Translate * Scale * RotateZ * RotateY * RotateX, built from (N, 3) arrays.
+    The rotation matrices are those used by ST_RotateX, ST_RotateY, and ST_RotateZ (https://postgis.net/docs/ST_Affine.html).
+    """
+    n: int = rotations.shape[0]
+    cos = np.cos(rotations)
+    sin = np.sin(rotations)
+    rx = np.zeros((n, 3, 3))
+    rx[:, 0, 0] = 1
+    rx[:, 1, 1], rx[:, 1, 2] = cos[:, 0], -sin[:, 0]
+    rx[:, 2, 1], rx[:, 2, 2] = sin[:, 0], cos[:, 0]
+    ry = np.zeros((n, 3, 3))
+    ry[:, 1, 1] = 1
+    ry[:, 0, 0], ry[:, 0, 2] = cos[:, 1], sin[:, 1]
+    ry[:, 2, 0], ry[:, 2, 2] = -sin[:, 1], cos[:, 1]
+    rz = np.zeros((n, 3, 3))
+    rz[:, 2, 2] = 1
+    rz[:, 0, 0], rz[:, 0, 1] = cos[:, 2], -sin[:, 2]
+    rz[:, 1, 0], rz[:, 1, 1] = sin[:, 2], cos[:, 2]
+    matrices = np.zeros((n, 4, 4))
+    # Scaling multiplies the rows of the rotation...
+    matrices[:, :3, :3] = scalings[:, :, np.newaxis] * (rz @ ry @ rx)
+    matrices[:, :3, 3] = translations
+    matrices[:, 3, 3] = 1
+    return matrices
+
+
+def transform(matrices: np.ndarray, points: np.ndarray) -> np.ndarray:
+    """Apply each (4, 4) matrix to the (N, ..., 3) points of the same sample."""
+    n: int = points.shape[0]
+    flat = points.reshape(n, -1, 3)
+    transformed = flat @ matrices[:, :3, :3].transpose(0, 2, 1) + matrices[:, np.newaxis, :3, 3]
+    return transformed.reshape(points.shape)
+
+
+def sample_face_points(rui_locations: List[dict]) -> np.ndarray:
+    """The (N, 6, 5, 3) points of the faces of each of the placed samples."""
+    dimensions, rotations, scalings, translations = rui_location_arrays(rui_locations)
+    points = FACE_SIGNS[np.newaxis, :, :, :] * (dimensions / 2)[:, np.newaxis, np.newaxis, :]
+    return transform(affine_matrices(rotations, scalings, translations), points)
+
+
+def sample_corner_points(rui_locations: List[dict]) -> np.ndarray:
+    """The (N, 8, 3) corners of each of the placed samples."""
+    dimensions, rotations, scalings, translations = rui_location_arrays(rui_locations)
+    points = CORNER_SIGNS[np.newaxis, :, :] * (dimensions / 2)[:, np.newaxis, :]
+    return transform(affine_matrices(rotations, scalings, translations), points)
+
+
+def create_geometries_ewkb(rui_locations: List[dict]) -> List[bytes]:
+    """The EWKB of each of the placed samples. These are surfaces, in PostGIS use ST_MakeSolid(ST_GeomFromEWKB(...))."""
+    n: int = len(rui_locations)
+    if n == 0:
+        return []
+    points = np.ascontiguousarray(sample_face_points(rui_locations), dtype='<f8')
+    point_bytes = points.view(np.uint8).reshape(n, FACES, POINTS_PER_FACE * 3 * 8)
+    ewkb = np.tile(EWKB_TEMPLATE, (n, 1))
+    for face in range(FACES):
+        start: int = EWKB_HEADER_BYTES + face * EWKB_FACE_BYTES + EWKB_FACE_HEADER_BYTES
+        ewkb[:, start:start + POINTS_PER_FACE * 3 * 8] = point_bytes[:, face]
+    return [row.tobytes() for row in ewkb]
+
+
+def create_geometry_ewkb(rui_location: dict) -> bytes:
+    return create_geometries_ewkb([rui_location])[0]
+
+
+def sample_oriented_boxes(rui_locations: List[dict], tolerance: float = 1e-9) -> tuple:
+    """The oriented boxes of the placed samples as their (N, 3) centres, (N, 3, 3) unit axes (the columns),
+    (N, 3) half extents along those axes, and an (N,) mask of those that really are boxes.
+    A sample scaled unevenly after being rotated is sheared (a parallelepiped rather than a box), and is not.
+    """
+    dimensions, rotations, scalings, translations = rui_location_arrays(rui_locations)
+    linear = affine_matrices(rotations, scalings, translations)[:, :3, :3]
+    lengths = np.linalg.norm(linear, axis=1)
+    axes = linear / np.where(lengths == 0, 1, lengths)[:, np.newaxis, :]
+    gram = axes.transpose(0, 2, 1) @ axes
+    is_box = np.all(np.abs(gram - np.eye(3)) <= tolerance, axis=(1, 2))
+    return translations, axes, lengths * np.abs(dimensions) / 2, is_box
+
+
+def oriented_box_distances(centres: np.ndarray, axes: np.ndarray, half_extents: np.ndarray,
+                           point: np.ndarray) -> np.ndarray:
+    """The (N,) distances from the point to each of the (solid) boxes, zero for those that it is inside of."""
+    local = np.einsum('nji,nj->ni', axes, point[np.newaxis, :] - centres)
+    return np.linalg.norm(np.maximum(np.abs(local) - half_extents, 0), axis=1)
+
+
+def oriented_box_aabbs(centres: np.ndarray, axes: np.ndarray, half_extents: np.ndarray) -> tuple:
+    """The (N, 3) minimum and maximum corners of the axis aligned bounding boxes of the boxes."""
+    extents = np.einsum('nji,ni->nj', np.abs(axes), half_extents)
+    return centres - extents, centres + extents
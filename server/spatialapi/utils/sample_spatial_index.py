@@ -0,0 +1,129 @@
+import copy
+import numpy as np
+from typing import Dict, List, Tuple
+
+from spatialapi.utils.sample_geometry import sample_oriented_boxes, oriented_box_distances, oriented_box_aabbs
+
+# An in memory index of the samples of one target (relative_spatial_entry_iri), answering the same radius searches
+# as SpatialManager.point_search_statement without going to PostGIS.
+# Each sample is the oriented box that its rui_location places, and the axis aligned bounding boxes of those are
+# bucketed in a uniform grid. A search looks only in the cells that the bounding box of its sphere covers, and then
+# measures the (vectorized) distance from the point to each of the oriented boxes found there.
+# When samples change, updated() makes a copy in which only the cells of those samples are changed. The samples taken
+# out are left in place but no longer 'live', until the index is next built from scratch.
+
+# Samples that would cover more cells than this are not put in the grid, but are always looked at.
+MAX_SAMPLE_CELLS: int = 512
+
+
+class SampleSpatialIndex(object):
+
+    def __init__(self, ids: List[int], hubmap_ids: List[str], rui_locations: List[dict]):
+        self.ids = np.array(ids, dtype=np.int64)
+        self.hubmap_ids: List[str] = list(hubmap_ids)
+        self.centres, self.axes, self.half_extents, self.is_box = sample_oriented_boxes(rui_locations)
+        self.aabb_min, self.aabb_max = oriented_box_aabbs(self.centres, self.axes, self.half_extents)
+        self.live = np.ones(len(self.ids), dtype=bool)
+        self.grid: Dict[tuple, np.ndarray] = {}
+        self.large = np.empty(0, dtype=np.int64)
+        self.cell_size: float = 1.0
+        if len(self.ids) > 0:
+            self.build_grid()
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.live))
+
+    def removed(self) -> int:
+        """The number of samples taken out by updated() that are still held."""
+        return len(self.ids) - len(self)
+
+    def build_grid(self) -> None:
+        # About one sample per cell along its longest side...
+        self.cell_size = max(float(np.median(np.max(self.aabb_max - self.aabb_min, axis=1))), 1e-6)
+        self.grid, self.large = self.place(np.arange(len(self.ids)))
+
+    def place(self, indexes: np.ndarray) -> Tuple[Dict[tuple, np.ndarray], np.ndarray]:
+        """The grid cells of the samples, and those of them that would cover too many cells to be put in the grid."""
+        low = np.floor(self.aabb_min[indexes] / self.cell_size).astype(np.int64)
+        high = np.floor(self.aabb_max[indexes] / self.cell_size).astype(np.int64)
+        spans = np.prod((high - low + 1).astype(np.float64), axis=1)
+        cells: Dict[tuple, List[int]] = {}
+        for j in np.flatnonzero(spans <= MAX_SAMPLE_CELLS):
+            for cx in range(low[j, 0], high[j, 0] + 1):
+                for cy in range(low[j, 1], high[j, 1] + 1):
+                    for cz in range(low[j, 2], high[j, 2] + 1):
+                        cells.setdefault((cx, cy, cz), []).append(indexes[j])
+        return {cell: np.array(found, dtype=np.int64) for cell, found in cells.items()}, \
+            indexes[spans > MAX_SAMPLE_CELLS]
+
+    def updated(self, removed_ids: List[int],
+                ids: List[int], hubmap_ids: List[str], rui_locations: List[dict]) -> 'SampleSpatialIndex':
+        """A copy of this index without the samples of the removed_ids, and with the samples given. Only the grid
+        cells of those samples are changed (this index is left as it was, as it may still be being searched).
+        """
+        if len(self) == 0:
+            return SampleSpatialIndex(ids, hubmap_ids, rui_locations)
+        index: SampleSpatialIndex = copy.copy(self)
+        removed = np.flatnonzero(np.isin(self.ids, np.array(removed_ids, dtype=np.int64)) & self.live)
+        if len(ids) > 0:
+            centres, axes, half_extents, is_box = sample_oriented_boxes(rui_locations)
+            aabb_min, aabb_max = oriented_box_aabbs(centres, axes, half_extents)
+            index.ids = np.concatenate([self.ids, np.array(ids, dtype=np.int64)])
+            index.hubmap_ids = self.hubmap_ids + list(hubmap_ids)
+            index.centres = np.concatenate([self.centres, centres])
+            index.axes = np.concatenate([self.axes, axes])
+            index.half_extents = np.concatenate([self.half_extents, half_extents])
+            index.is_box = np.concatenate([self.is_box, is_box])
+            index.aabb_min = np.concatenate([self.aabb_min, aabb_min])
+            index.aabb_max = np.concatenate([self.aabb_max, aabb_max])
+        index.live = np.concatenate([self.live, np.ones(len(index.ids) - len(self.ids), dtype=bool)])
+        index.live[removed] = False
+        index.grid = dict(self.grid)
+        removed_cells, removed_large = self.place(removed)
+        for cell in removed_cells.keys():
+            remaining = index.grid[cell][~np.isin(index.grid[cell], removed)]
+            if len(remaining) > 0:
+                index.grid[cell] = remaining
+            else:
+                del index.grid[cell]
+        added_cells, added_large = index.place(np.arange(len(self.ids), len(index.ids)))
+        for cell, found in added_cells.items():
+            index.grid[cell] = np.concatenate([index.grid[cell], found]) if cell in index.grid else found
+        index.large = np.concatenate([np.setdiff1d(self.large, removed_large), added_large])
+        return index
+
+    def candidates(self, point: np.ndarray, radius: float) -> np.ndarray:
+        """The indexes of the samples whose bounding boxes are within the bounding box of the sphere."""
+        low = np.floor((point - radius) / self.cell_size).astype(np.int64)
+        high = np.floor((point + radius) / self.cell_size).astype(np.int64)
+        if np.prod((high - low + 1).astype(np.float64)) <= len(self.grid):
+            found: List[np.ndarray] = [self.large] + [
+                self.grid[cell] for cell in
+                ((cx, cy, cz)
+                 for cx in range(low[0], high[0] + 1)
+                 for cy in range(low[1], high[1] + 1)
+                 for cz in range(low[2], high[2] + 1))
+                if cell in self.grid]
+            # (Samples taken out by updated() are no longer in the grid)...
+            indexes = np.unique(np.concatenate(found))
+        else:
+            # The sphere covers more cells than are occupied, so it's quicker to look at all of the samples...
+            indexes = np.flatnonzero(self.live)
+        overlaps = np.all((self.aabb_min[indexes] <= point + radius) & (self.aabb_max[indexes] >= point - radius),
+                          axis=1)
+        return indexes[overlaps]
+
+    def within_radius(self, x: float, y: float, z: float, radius: float) -> List[str]:
+        """The hubmap_ids of the samples within the radius of the point in id order, or None if any of the samples
+        that might be are not boxes (see sample_oriented_boxes()) and the search must be made by PostGIS.
+        """
+        if len(self) == 0:
+            return []
+        point = np.array([x, y, z], dtype=np.float64)
+        indexes = self.candidates(point, float(radius))
+        if not np.all(self.is_box[indexes]):
+            return None
+        distances = oriented_box_distances(
+            self.centres[indexes], self.axes[indexes], self.half_extents[indexes], point)
+        found = indexes[distances <= radius]
+        return [self.hubmap_ids[i] for i in found[np.argsort(self.ids[found], kind='stable')]]
@@ -0,0 +1,119 @@
+import logging
+from typing import List
+from spatialapi.manager.cell_annotation_manager import CellAnnotationManager, AZIMUTH_ANNOTATION_TABLES
+import configparser
+import psycopg2
+import json
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class AnnotationDetailsBenchmark(object):
+    """Compares the time taken by the ways of loading the Azimuth annotation details:
+    'per_row' the page is downloaded and parsed for each of the tables, and each row is then added with
+    create_annotation_details_sp (as CellAnnotationManager.load_annotation_details once did), and
+    'bulk' the page is downloaded and parsed once, and all of the rows added with
+    PostgresqlManager.insert_annotation_details.
+    The rows are loaded into emptied tables, in a transaction that is then rolled back, so the database is left as it
+    was (but the tables are locked while it runs).
+    """
+
+    def __init__(self, config):
+        self.cell_annotation_manager = CellAnnotationManager(config)
+        self.postgresql_manager = self.cell_annotation_manager.postgresql_manager
+
+    def close(self) -> None:
+        self.cell_annotation_manager.close()
+
+    def fetch_per_row(self) -> List[tuple]:
+        details: List[tuple] = []
+        for url_table_summary, first_label_entry in AZIMUTH_ANNOTATION_TABLES:
+            rows = self.cell_annotation_manager.find_rows_in_azimuth_uri_table(url_table_summary, first_label_entry)
+            details.extend(self.cell_annotation_manager.annotation_details_of_rows(rows))
+        return details
+
+    def fetch_bulk(self) -> List[tuple]:
+        return self.cell_annotation_manager.azimuth_annotation_details()
+
+    def load_per_row(self, cursor, details: List[tuple]) -> None:
+        for cell_type_name, obo_ontology_id_uri, ontology_id, markers in details:
+            # Each row was its own transaction, and those of names already loaded failed...
+            cursor.execute('SAVEPOINT annotation_detail;')
+            try:
+                cursor.execute('CALL create_annotation_details_sp(%s, %s, %s, %s, %s)',
+                               (cell_type_name, obo_ontology_id_uri, ontology_id, markers, 0))
+                cursor.execute('RELEASE SAVEPOINT annotation_detail;')
+            except psycopg2.errors.UniqueViolation:
+                cursor.execute('ROLLBACK TO SAVEPOINT annotation_detail;')
+
+    def load_bulk(self, cursor, details: List[tuple]) -> None:
+        self.postgresql_manager.insert_annotation_details(cursor, details)
+
+    def run(self, mode: str) -> dict:
+        start_time: float = time.perf_counter()
+        details: List[tuple] = getattr(self, f'fetch_{mode}')()
+        fetch_seconds: float = time.perf_counter() - start_time
+        cursor = self.postgresql_manager.new_cursor()
+        try:
+            cursor.execute('DELETE FROM cell_types;')
+            cursor.execute('DELETE FROM cell_annotation_details_marker;')
+            cursor.execute('DELETE FROM cell_marker;')
+            cursor.execute('DELETE FROM cell_annotation_details;')
+            start_time = time.perf_counter()
+            getattr(self, f'load_{mode}')(cursor, details)
+            load_seconds: float = time.perf_counter() - start_time
+            cursor.execute('SELECT (SELECT count(*) FROM cell_annotation_details),'
+                           ' (SELECT count(*) FROM cell_marker), (SELECT count(*) FROM cell_annotation_details_marker);')
+            loaded: tuple = cursor.fetchone()
+        finally:
+            cursor.close()
+            self.postgresql_manager.rollback()
+        seconds: dict = {'fetch': round(fetch_seconds, 3), 'load': round(load_seconds, 3)}
+        logger.info(f'{mode}: {seconds}')
+        return {
+            'seconds': seconds,
+            'rows': {'cell_annotation_details': loaded[0], 'cell_marker': loaded[1],
+                     'cell_annotation_details_marker': loaded[2]}
+        }
+
+
+# (cd server; export PYTHONPATH=.; python3 ./tests/annotation_details_benchmark.py -h)
+if __name__ == '__main__':
+    import argparse
+
+    class RawTextArgumentDefaultsHelpFormatter(
+        argparse.ArgumentDefaultsHelpFormatter,
+        argparse.RawTextHelpFormatter
+    ):
+        pass
+
+    # https://docs.python.org/3/howto/argparse.html
+    parser = argparse.ArgumentParser(
+        description='''
+Timing benchmark of loading the Azimuth annotation details (of the [cellAnnotation] Azimuth reference).
+
+Each of the --modes given fetches the tables and loads them into emptied tables, reporting the time taken by each
+along with the rows loaded. Everything is rolled back afterwards.''',
+        formatter_class=RawTextArgumentDefaultsHelpFormatter)
+    parser.add_argument("-C", '--config', type=str, default='resources/app.local.properties',
+                        help='config file to use for processing')
+    parser.add_argument('-m', '--modes', type=str, default='per_row,bulk',
+                        help='comma separated list of: per_row, bulk')
+    args = parser.parse_args()
+
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    benchmark = AnnotationDetailsBenchmark(config)
+
+    try:
+        runs: dict = {mode: benchmark.run(mode) for mode in args.modes.split(',')}
+        all_rows: List[dict] = [run['rows'] for run in runs.values()]
+        print(json.dumps({
+            'seconds': {mode: run['seconds'] for mode, run in runs.items()},
+            'rows': {mode: run['rows'] for mode, run in runs.items()},
+            'rows_agree': all(rows == all_rows[0] for rows in all_rows)
+        }))
+    finally:
+        benchmark.close()
+        logger.info('Done!')
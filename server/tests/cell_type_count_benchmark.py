@@ -0,0 +1,174 @@
+import logging
+import random
+from typing import Dict, List
+from spatialapi.manager.cell_type_count_manager import CellTypeCountManager
+import configparser
+import json
+import time
+
+logger = logging.getLogger(__name__)
+
+# The cell_annotation_details rows (and the sample) made for the benchmark are named after these, and deleted after.
+CELL_TYPE_NAME_PREFIX: str = 'benchmark cell type '
+SAMPLE_UUID: str = 'benchmark-cell-type-count-sample'
+
+
+class CellTypeCountBenchmark(object):
+    """Compares the latency of the ways of saving the cell type counts of a sample:
+    'per_row' each name is looked up, then all of the rows deleted and each inserted again with add_cell_type_count_sp
+    (as CellTypeCountManager.sample_extracted_cell_type_counts_from_secondary_analysis_files once did), and
+    'bulk' all of the names are looked up at once and only the rows that changed are written
+    (CellTypeCountManager.verify_cell_type_counts and write_cell_type_counts), and
+    'bulk_sp' all of the counts are given by name to add_cell_type_counts_bulk_sp
+    (PostgresqlManager.add_cell_type_counts) in a single call.
+    """
+
+    def __init__(self, config):
+        self.cell_type_count_manager = CellTypeCountManager(config)
+        self.postgresql_manager = self.cell_type_count_manager.postgresql_manager
+
+    def close(self) -> None:
+        self.cell_type_count_manager.close()
+
+    def setup(self, cell_types: int) -> None:
+        self.teardown()
+        cursor = self.postgresql_manager.new_cursor()
+        try:
+            cursor.execute('INSERT INTO cell_annotation_details (cell_type_name, obo_ontology_id_uri, ontology_id)'
+                           " SELECT %s || i, '', '' FROM generate_series(1, %s) AS i;",
+                           (CELL_TYPE_NAME_PREFIX, cell_types))
+            self.postgresql_manager.commit()
+        finally:
+            cursor.close()
+
+    def teardown(self) -> None:
+        cursor = self.postgresql_manager.new_cursor()
+        try:
+            cursor.execute('DELETE FROM cell_types WHERE sample_uuid = %s;', (SAMPLE_UUID,))
+            cursor.execute("DELETE FROM cell_annotation_details WHERE cell_type_name LIKE %s || '%%';",
+                           (CELL_TYPE_NAME_PREFIX,))
+            self.postgresql_manager.commit()
+        finally:
+            cursor.close()
+
+    def save_per_row(self, cell_type_counts: Dict[str, int]) -> None:
+        cursor = self.postgresql_manager.new_cursor()
+        try:
+            verified_cell_type: dict = {}
+            for cell_type_name, cell_type_count in cell_type_counts.items():
+                cursor.execute("SELECT * FROM cell_annotation_details WHERE cell_type_name = %(cell_type_name)s",
+                               {'cell_type_name': cell_type_name})
+                if cursor.fetchone() is not None:
+                    verified_cell_type[cell_type_name] = cell_type_count
+            cursor.execute("DELETE FROM cell_types WHERE sample_uuid = %(sample_uuid)s", {'sample_uuid': SAMPLE_UUID})
+            for cell_type_name, cell_type_count in verified_cell_type.items():
+                cursor.execute('CALL add_cell_type_count_sp(%s, %s, %s)',
+                               (SAMPLE_UUID, cell_type_name, cell_type_count))
+            self.postgresql_manager.commit()
+        finally:
+            cursor.close()
+
+    def save_bulk(self, cell_type_counts: Dict[str, int]) -> None:
+        cursor = self.postgresql_manager.new_cursor()
+        try:
+            counts: Dict[int, int] = self.cell_type_count_manager.verify_cell_type_counts(cursor, cell_type_counts)
+            self.cell_type_count_manager.write_cell_type_counts(cursor, SAMPLE_UUID, counts)
+            self.postgresql_manager.commit()
+        finally:
+            cursor.close()
+
+    def save_bulk_sp(self, cell_type_counts: Dict[str, int]) -> None:
+        self.postgresql_manager.add_cell_type_counts(
+            SAMPLE_UUID, list(cell_type_counts.keys()), list(cell_type_counts.values()))
+
+    def saved_counts(self) -> Dict[str, int]:
+        return {row[0]: row[1] for row in self.postgresql_manager.select_all(
+            'SELECT cad.cell_type_name, ct.cell_type_count'
+            ' FROM cell_types AS ct JOIN cell_annotation_details AS cad ON cad.id = ct.cell_annotation_details_id'
+            ' WHERE ct.sample_uuid = %s;', (SAMPLE_UUID,))}
+
+    def run(self, mode: str, updates: List[Dict[str, int]]) -> dict:
+        save = getattr(self, f'save_{mode}')
+        cursor = self.postgresql_manager.new_cursor()
+        try:
+            cursor.execute('DELETE FROM cell_types WHERE sample_uuid = %s;', (SAMPLE_UUID,))
+            self.postgresql_manager.commit()
+        finally:
+            cursor.close()
+        # The first save is of all new rows, so it's not timed (and prepares the statements on the connection)...
+        save(updates[0])
+        milliseconds: List[float] = []
+        for cell_type_counts in updates[1:]:
+            start_time: float = time.perf_counter()
+            save(cell_type_counts)
+            milliseconds.append((time.perf_counter() - start_time) * 1000)
+        milliseconds.sort()
+        latency: dict = {
+            'mean_ms': round(sum(milliseconds) / len(milliseconds), 3),
+            'p50_ms': round(milliseconds[len(milliseconds) // 2], 3),
+            'p95_ms': round(milliseconds[int(len(milliseconds) * 0.95)], 3)
+        }
+        logger.info(f'{mode}: {len(milliseconds)} saves: {latency}')
+        return {'latency': latency, 'counts': self.saved_counts()}
+
+
+def make_updates(cell_types: int, saves: int, changed: float) -> List[Dict[str, int]]:
+    """The cell type counts of each save, each with about 'changed' of the counts of the one before changed."""
+    random.seed(0)
+    cell_type_counts: Dict[str, int] = \
+        {f'{CELL_TYPE_NAME_PREFIX}{i}': random.randint(1, 10000) for i in range(1, cell_types + 1)}
+    updates: List[Dict[str, int]] = [dict(cell_type_counts)]
+    for _ in range(saves):
+        for cell_type_name in random.sample(list(cell_type_counts.keys()), max(1, int(cell_types * changed))):
+            cell_type_counts[cell_type_name] = random.randint(1, 10000)
+        updates.append(dict(cell_type_counts))
+    return updates
+
+
+# (cd server; export PYTHONPATH=.; python3 ./tests/cell_type_count_benchmark.py -h)
+if __name__ == '__main__':
+    import argparse
+
+    class RawTextArgumentDefaultsHelpFormatter(
+        argparse.ArgumentDefaultsHelpFormatter,
+        argparse.RawTextHelpFormatter
+    ):
+        pass
+
+    # https://docs.python.org/3/howto/argparse.html
+    parser = argparse.ArgumentParser(
+        description='''
+Latency benchmark of saving the cell type counts of a sample.
+
+--cell_types cell types are made, and the counts of a sample saved --saves times with each of the --modes given,
+each save changing --changed of the counts. The latencies of each are reported along with whether the counts
+saved agree. The cell types and sample made are deleted afterwards.''',
+        formatter_class=RawTextArgumentDefaultsHelpFormatter)
+    parser.add_argument("-C", '--config', type=str, default='resources/app.local.properties',
+                        help='config file to use for processing')
+    parser.add_argument('-t', '--cell_types', type=int, default=500,
+                        help='number of cell types the sample has')
+    parser.add_argument('-n', '--saves', type=int, default=50,
+                        help='number of times the counts are saved')
+    parser.add_argument('-c', '--changed', type=float, default=0.1,
+                        help='fraction of the counts changed by each save')
+    parser.add_argument('-m', '--modes', type=str, default='per_row,bulk,bulk_sp',
+                        help='comma separated list of: per_row, bulk, bulk_sp')
+    args = parser.parse_args()
+
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    benchmark = CellTypeCountBenchmark(config)
+
+    try:
+        benchmark.setup(args.cell_types)
+        updates: List[Dict[str, int]] = make_updates(args.cell_types, args.saves, args.changed)
+        runs: dict = {mode: benchmark.run(mode, updates) for mode in args.modes.split(',')}
+        print(json.dumps({
+            'latency': {mode: run['latency'] for mode, run in runs.items()},
+            'counts_agree': all(run['counts'] == updates[-1] for run in runs.values())
+        }))
+    finally:
+        benchmark.teardown()
+        benchmark.close()
+        logger.info('Done!')
@@ -2,10 +2,14 @@ import logging
 from typing import List
 from spatialapi.manager.postgresql_manager import PostgresqlManager
 from spatialapi.manager.spatial_manager import SpatialManager
+from spatialapi.utils.sample_geometry import sample_face_points
+from spatialapi.utils.sample_spatial_index import SampleSpatialIndex
 import configparser
+import random
 import math
 import json
 import re
+import numpy as np
 
 logger = logging.getLogger(__name__)
 
@@ -94,6 +98,66 @@ class Geom(object):
                 logger.error(f'The sample_geom for sample_hubmap_id: {sample_hubmap_id};'
                              ' ST_3DArea should return 0 for solids!')
 
+    def ewkb_check(self, tolerance: float = 1e-9) -> None:
+        logger.info(f'Determine if the geometries built as EWKB match those built by PostGIS from create_geometry()...')
+        rows: list = self.postgresql_manager.select_all(f'SELECT sample_hubmap_id, sample_rui_location FROM {self.table};')
+        rui_locations: List[dict] = [json.loads(row[1]) for row in rows]
+        points = sample_face_points(rui_locations)
+        geometries_values: List[tuple] = self.spatial_manager.create_geometries_values(rui_locations)
+        logger.info(f'Checking {len(rows)} geometries!')
+        mismatches: int = 0
+        for row, rui_location, sample_points, geometry_values in zip(rows, rui_locations, points, geometries_values):
+            sample_hubmap_id: str = row[0]
+            # The geometry built by PostGIS, and the EWKB geometry as it is read back by PostGIS...
+            result: list = self.postgresql_manager.select_all(
+                f'SELECT ST_AsText({self.spatial_manager.create_geometry(rui_location)}),'
+                f' ST_AsText({self.spatial_manager.sample_geom_sql}),'
+                f' ST_Volume({self.spatial_manager.sample_geom_sql});',
+                geometry_values + geometry_values)
+            sql_points = np.array([float(n) for n in re.findall(r'-?[\d.]+(?:e[-+]?\d+)?', result[0][0])])
+            ewkb_points = np.array([float(n) for n in re.findall(r'-?[\d.]+(?:e[-+]?\d+)?', result[0][1])])
+            if not np.allclose(sql_points, sample_points.reshape(-1), rtol=0, atol=tolerance) or \
+                    not np.allclose(sql_points, ewkb_points, rtol=0, atol=tolerance):
+                mismatches += 1
+                logger.error(f'The EWKB geometry for sample_hubmap_id: {sample_hubmap_id};'
+                             f' DOES NOT MATCH the PostGIS geometry: {result[0][0]}')
+            elif round(float(result[0][2]), 0) == 0:
+                mismatches += 1
+                logger.error(f'The EWKB geometry for sample_hubmap_id: {sample_hubmap_id}; IS NOT A SOLID!')
+        logger.info(f'{mismatches} of {len(rows)} geometries did not match.')
+
+    def index_check(self, relative_spatial_entry_iri: str, radius: float, searches: int = 1000) -> None:
+        logger.info(f'Determine if the in memory spatial index finds the same samples as PostGIS...')
+        samples: dict = \
+            self.spatial_manager.spatial_index_manager.select_samples().get(relative_spatial_entry_iri, {})
+        index: SampleSpatialIndex = self.spatial_manager.spatial_index_manager.create_index(samples)
+        rui_locations: List[dict] = [sample[2] for sample in samples.values()]
+        if len(rui_locations) == 0:
+            logger.error(f'There are no samples relative to {relative_spatial_entry_iri}')
+            return
+        logger.info(f'Checking {searches} searches of {len(index)} samples!')
+        mismatches: int = 0
+        for _ in range(searches):
+            # Points near (inside, on, and outside of) the samples, with radii up to the one given...
+            rui_location: dict = random.choice(rui_locations)
+            placement: dict = rui_location['placement']
+            spread: float = max(rui_location['x_dimension'], rui_location['y_dimension'], rui_location['z_dimension'])
+            x: float = placement['x_translation'] + random.uniform(-spread, spread)
+            y: float = placement['y_translation'] + random.uniform(-spread, spread)
+            z: float = placement['z_translation'] + random.uniform(-spread, spread)
+            r: float = random.uniform(0, radius)
+            index_hubmap_ids: List[str] = index.within_radius(x, y, z, r)
+            postgis_hubmap_ids: List[str] = self.postgresql_manager.select_prepared(
+                self.spatial_manager.point_search_statement, (relative_spatial_entry_iri, x, y, z, r))
+            if index_hubmap_ids is None:
+                logger.info(f'The index could not search from POINT({x} {y} {z}) radius {r}')
+            elif set(index_hubmap_ids) != set(postgis_hubmap_ids):
+                mismatches += 1
+                logger.error(f'The search from POINT({x} {y} {z}) radius {r} DOES NOT MATCH;'
+                             f' index only: {set(index_hubmap_ids) - set(postgis_hubmap_ids)};'
+                             f' PostGIS only: {set(postgis_hubmap_ids) - set(index_hubmap_ids)}')
+        logger.info(f'{mismatches} of {searches} searches did not match.')
+
     # Since the object is created with its centroid at <0, 0, 0> the only location data that matters is the translation.
     def centroid_from_sample_rui_location(self,
                                           sample_rui_location: dict
@@ -231,6 +295,11 @@ Finally, compare the lists returned. ''',
                         help='radius to search within the centroid of the hubmap_id given')
     parser.add_argument("-c", '--geom_check', action="store_true",
                         help='ONLY Determine if ALL geometries are: closed, solids, and have the correct volume...')
+    parser.add_argument("-w", '--ewkb_check', action="store_true",
+                        help='ONLY Determine if ALL geometries built as EWKB match those built by PostGIS')
+    parser.add_argument("-x", '--index_check', action="store_true",
+                        help='ONLY Determine if the in memory spatial index finds the same samples as PostGIS,'
+                             ' for random points near the samples of the --relative_spatial_entry_iri within --radius')
     args = parser.parse_args()
 
     config = configparser.ConfigParser()
@@ -240,6 +309,10 @@ Finally, compare the lists returned. ''',
     try:
         if args.geom_check:
             manager.geom_check()
+        elif args.ewkb_check:
+            manager.ewkb_check()
+        elif args.index_check:
+            manager.index_check(args.relative_spatial_entry_iri, args.radius)
         else:
             manager.distance_check(args.relative_spatial_entry_iri, args.radius)
     finally:
@@ -0,0 +1,155 @@
+import logging
+from typing import List
+from psycopg2.extras import execute_values
+from spatialapi.manager.sample_load_manager import SampleLoadManager
+import configparser
+import random
+import json
+import time
+
+logger = logging.getLogger(__name__)
+
+# The rows are all written relative to this target so that they can be told apart from (and removed without
+# touching) the real samples...
+BENCHMARK_TARGET: str = 'benchmark'
+
+
+def benchmark_recs(n: int) -> List[dict]:
+    recs: List[dict] = []
+    for i in range(n):
+        recs.append({
+            'organ': {'uuid': f'benchmark-organ-{i % 10}', 'code': 'BM'},
+            'donor': {'uuid': f'benchmark-donor-{i % 10}', 'sex': 'Female'},
+            'sample': {
+                'uuid': f'benchmark-sample-{i}',
+                'hubmap_id': f"HBM{i}.BENCH.O'K",
+                'sample_category': 'block',
+                'last_modified_timestamp': 1600000000000 + i,
+                'rui_location': {
+                    'x_dimension': random.uniform(1, 30),
+                    'y_dimension': random.uniform(1, 30),
+                    'z_dimension': random.uniform(1, 30),
+                    'placement': {
+                        'x_rotation': random.uniform(-3, 3),
+                        'y_rotation': random.uniform(-3, 3),
+                        'z_rotation': random.uniform(-3, 3),
+                        'x_scaling': 1, 'y_scaling': 1, 'z_scaling': 1,
+                        'x_translation': random.uniform(0, 200),
+                        'y_translation': random.uniform(0, 200),
+                        'z_translation': random.uniform(0, 200)
+                    }
+                }
+            }
+        })
+    return recs
+
+
+class IngestBenchmark(object):
+    """Compares the ways of writing the 'sample' rows:
+    'inline' one statement per row with the values (and the PostGIS transformations) written into the SQL text,
+    'values' one multi row parameterized statement per batch (psycopg2.extras.execute_values), and
+    'prepared' the upsert prepared once per connection and EXECUTEd for each row (SampleLoadManager).
+    """
+
+    def __init__(self, config):
+        self.sample_load_manager = SampleLoadManager(config)
+        self.spatial_manager = self.sample_load_manager.spatial_manager
+        self.postgresql_manager = self.sample_load_manager.postgresql_manager
+        self.table = self.spatial_manager.table
+
+    def close(self) -> None:
+        self.delete_benchmark_rows()
+        self.sample_load_manager.close()
+
+    def delete_benchmark_rows(self) -> None:
+        cursor = self.postgresql_manager.new_cursor()
+        try:
+            cursor.execute(f'DELETE FROM {self.table} WHERE relative_spatial_entry_iri = %s;', (BENCHMARK_TARGET,))
+            self.postgresql_manager.commit()
+        finally:
+            cursor.close()
+
+    def write_inline(self, cursor, rows: List[tuple]) -> None:
+        for row in rows:
+            values: str = ', '.join(["'" + str(v).replace("'", "''") + "'" for v in row[:9]])
+            geom: str = self.spatial_manager.create_geometry(row[10])
+            cursor.execute(
+                f"INSERT INTO {self.table} ({self.spatial_manager.sample_columns})"
+                f" VALUES ({values}, {row[9]}, {geom})"
+                " ON CONFLICT ON CONSTRAINT sample_relative_spatial_entry_sample_uuid_key DO UPDATE SET"
+                f" sample_geom = {geom};")
+
+    def write_values(self, cursor, rows: List[tuple]) -> None:
+        values: List[tuple] = self.spatial_manager.create_sample_rows_values(rows)
+        execute_values(
+            cursor,
+            f"INSERT INTO {self.table} ({self.spatial_manager.sample_columns}) VALUES %s"
+            " ON CONFLICT ON CONSTRAINT sample_relative_spatial_entry_sample_uuid_key DO UPDATE SET"
+            " sample_geom = EXCLUDED.sample_geom",
+            values,
+            template=f"(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, {self.spatial_manager.sample_geom_sql})",
+            page_size=len(values))
+
+    def write_prepared(self, cursor, rows: List[tuple]) -> None:
+        sample_uuids: List[str] = list({row[5] for row in rows})
+        self.sample_load_manager.upsert_sample_rows(cursor, sample_uuids, rows)
+
+    def run(self, mode: str, recs: List[dict], batch_size: int) -> float:
+        write = getattr(self, f'write_{mode}')
+        rows: List[tuple] = [self.spatial_manager.create_sample_rec_values(BENCHMARK_TARGET, rec) for rec in recs]
+        self.delete_benchmark_rows()
+        start_time: float = time.time()
+        for i in range(0, len(rows), batch_size):
+            cursor = self.postgresql_manager.new_cursor()
+            try:
+                write(cursor, rows[i:i + batch_size])
+                self.postgresql_manager.commit()
+            except Exception:
+                self.postgresql_manager.rollback()
+                raise
+            finally:
+                cursor.close()
+        seconds: float = time.time() - start_time
+        logger.info(f'{mode}: {len(rows)} rows in {seconds:.3f} seconds; {len(rows) / seconds:.1f} rows/second')
+        return seconds
+
+
+# (cd server; export PYTHONPATH=.; python3 ./tests/ingest_benchmark.py -h)
+if __name__ == '__main__':
+    import argparse
+
+    class RawTextArgumentDefaultsHelpFormatter(
+        argparse.ArgumentDefaultsHelpFormatter,
+        argparse.RawTextHelpFormatter
+    ):
+        pass
+
+    # https://docs.python.org/3/howto/argparse.html
+    parser = argparse.ArgumentParser(
+        description='''
+Micro-benchmark of writing 'sample' rows.
+
+Synthetic samples are written relative to the target 'benchmark' (and removed afterwards) with each of the --modes
+given, --batch_size rows per transaction, and the rows/second of each is reported.''',
+        formatter_class=RawTextArgumentDefaultsHelpFormatter)
+    parser.add_argument("-C", '--config', type=str, default='resources/app.local.properties',
+                        help='config file to use for processing')
+    parser.add_argument('-n', '--samples', type=int, default=2000,
+                        help='number of synthetic samples to write')
+    parser.add_argument('-b', '--batch_size', type=int, default=100,
+                        help='rows written per transaction')
+    parser.add_argument('-m', '--modes', type=str, default='inline,values,prepared',
+                        help='comma separated list of: inline, values, prepared')
+    args = parser.parse_args()
+
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    benchmark = IngestBenchmark(config)
+
+    try:
+        recs: List[dict] = benchmark_recs(args.samples)
+        results: dict = {mode: benchmark.run(mode, recs, args.batch_size) for mode in args.modes.split(',')}
+        print(json.dumps({mode: round(args.samples / seconds, 1) for mode, seconds in results.items()}))
+    finally:
+        benchmark.close()
+        logger.info('Done!')
@@ -0,0 +1,106 @@
+import logging
+from typing import List
+from spatialapi.manager.spatial_manager import SpatialManager
+import configparser
+import json
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SearchBenchmark(object):
+    """Compares the latency of the ways of searching from a hubmap_id:
+    'two_queries' the rui_location of the sample is read (and parsed) and then searched from as a point, and
+    'one_query' the sample is found and searched from in the same query (SpatialManager.hubmap_id_search_statement).
+    Neither uses the search cache.
+    """
+
+    def __init__(self, config):
+        self.spatial_manager = SpatialManager(config)
+        self.postgresql_manager = self.spatial_manager.postgresql_manager
+
+    def close(self) -> None:
+        self.spatial_manager.close()
+
+    def search_two_queries(self, target: str, radius: float, hubmap_id: str) -> List[str]:
+        recs: List[str] = self.postgresql_manager.select_prepared(
+            self.spatial_manager.rui_location_target_statement, (hubmap_id, target))
+        placement: dict = json.loads(recs[0])['placement']
+        return self.postgresql_manager.select_prepared(
+            self.spatial_manager.point_search_statement,
+            (target, placement['x_translation'], placement['y_translation'], placement['z_translation'], radius))
+
+    def search_one_query(self, target: str, radius: float, hubmap_id: str) -> List[str]:
+        return self.spatial_manager.search_reference(*self.spatial_manager.hubmap_id_search_query(
+            target, radius, hubmap_id))
+
+    def run(self, mode: str, target: str, radius: float, hubmap_ids: List[str], repeat: int) -> dict:
+        search = getattr(self, f'search_{mode}')
+        # Once first so that the statements are prepared on the connection...
+        results: dict = {hubmap_id: sorted(search(target, radius, hubmap_id)) for hubmap_id in hubmap_ids}
+        milliseconds: List[float] = []
+        for _ in range(repeat):
+            for hubmap_id in hubmap_ids:
+                start_time: float = time.perf_counter()
+                search(target, radius, hubmap_id)
+                milliseconds.append((time.perf_counter() - start_time) * 1000)
+        milliseconds.sort()
+        latency: dict = {
+            'mean_ms': round(sum(milliseconds) / len(milliseconds), 3),
+            'p50_ms': round(milliseconds[len(milliseconds) // 2], 3),
+            'p95_ms': round(milliseconds[int(len(milliseconds) * 0.95)], 3)
+        }
+        logger.info(f'{mode}: {len(milliseconds)} searches: {latency}')
+        return {'latency': latency, 'results': results}
+
+
+# (cd server; export PYTHONPATH=.; python3 ./tests/search_benchmark.py -h)
+if __name__ == '__main__':
+    import argparse
+
+    class RawTextArgumentDefaultsHelpFormatter(
+        argparse.ArgumentDefaultsHelpFormatter,
+        argparse.RawTextHelpFormatter
+    ):
+        pass
+
+    # https://docs.python.org/3/howto/argparse.html
+    parser = argparse.ArgumentParser(
+        description='''
+Latency benchmark of the searches from a hubmap_id.
+
+The first --samples samples of the --target are each searched from (within --radius) --repeat times with each of the
+--modes given, and the latencies of each are reported along with whether their results agree.''',
+        formatter_class=RawTextArgumentDefaultsHelpFormatter)
+    parser.add_argument("-C", '--config', type=str, default='resources/app.local.properties',
+                        help='config file to use for processing')
+    parser.add_argument("-s", "--target", type=str, default='VHMale',
+                        help='the target (relative_spatial_entry_iri) of the samples')
+    parser.add_argument('-r', '--radius', type=float, default=100.0,
+                        help='radius to search within')
+    parser.add_argument('-n', '--samples', type=int, default=20,
+                        help='number of samples to search from')
+    parser.add_argument('-R', '--repeat', type=int, default=10,
+                        help='times to search from each sample')
+    parser.add_argument('-m', '--modes', type=str, default='two_queries,one_query',
+                        help='comma separated list of: two_queries, one_query')
+    args = parser.parse_args()
+
+    config = configparser.ConfigParser()
+    config.read(args.config)
+    benchmark = SearchBenchmark(config)
+
+    try:
+        sample_hubmap_ids: List[str] = [row[0] for row in benchmark.postgresql_manager.select_all(
+            f'SELECT sample_hubmap_id FROM {benchmark.spatial_manager.table}'
+            ' WHERE relative_spatial_entry_iri = %s ORDER BY id LIMIT %s;', (args.target, args.samples))]
+        runs: dict = {mode: benchmark.run(mode, args.target, args.radius, sample_hubmap_ids, args.repeat)
+                      for mode in args.modes.split(',')}
+        all_results: List[dict] = [run['results'] for run in runs.values()]
+        print(json.dumps({
+            'latency': {mode: run['latency'] for mode, run in runs.items()},
+            'results_agree': all(results == all_results[0] for results in all_results)
+        }))
+    finally:
+        benchmark.close()
+        logger.info('Done!')